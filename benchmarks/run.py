@@ -0,0 +1,443 @@
+"""
+Benchmark beban dan latensi untuk layanan Python (yolo, ocr, voice).
+
+Setiap skenario (satu payload sintetis pada satu tingkat konkurensi) dijalankan
+lewat salah satu driver:
+  - inprocess: aplikasi Flask di-import di subprocess terpisah dan dipanggil lewat
+    test client dari N thread (tanpa jaringan; CPU klien ikut terhitung).
+  - gunicorn: server dijalankan seperti di Dockerfile (gthread, --preload) dan dibebani
+    lewat HTTP keep-alive dari N thread; CPU/RSS diukur dari seluruh pohon proses server.
+
+Hasil (p50/p95/p99, throughput, CPU, peak RSS) ditulis sebagai JSON dan dapat
+dibandingkan dengan baseline; exit code 1 jika ada regresi di atas toleransi.
+
+Contoh:
+    python -m benchmarks.run --services yolo --driver gunicorn --concurrency 1 4 --output bench.json
+    python -m benchmarks.run --services ocr --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import collections
+import http.client
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+import numpy as np
+
+from benchmarks.synthetic import AUDIO_SPECS, IMAGE_SPECS, make_audio, make_image
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ENV = {
+    # Payload yang sama diulang; tanpa ini hampir semua request hanya mengukur cache.
+    'RESULT_CACHE_ENABLED': 'false',
+    'OTEL_SDK_DISABLED': 'true',
+    'SELF_TEST_INTERVAL_SECONDS': '3600',
+}
+
+
+class Service(NamedTuple):
+    directory: str
+    path: str
+    field: str
+
+
+SERVICES = {
+    'yolo': Service('yolo_detector', '/detect', 'image'),
+    'ocr': Service('ocr_service', '/scan', 'image'),
+    'voice': Service('voice_transcriber', '/transcribe', 'audio'),
+}
+
+# Arah perbandingan terhadap baseline: 1 = lebih besar lebih buruk, -1 = lebih kecil lebih buruk.
+COMPARED_METRICS = {'p50': 1, 'p95': 1, 'p99': 1, 'throughputRps': -1, 'peakRssMb': 1}
+
+
+def build_payloads(service_key, seed=0):
+    """Daftar (nama skenario, filename, content type, bytes) untuk satu layanan."""
+    if service_key == 'voice':
+        return [(spec.name, f"{spec.name}.wav", 'audio/wav', make_audio(spec, seed)) for spec in AUDIO_SPECS]
+    payloads = []
+    for spec in IMAGE_SPECS[service_key]:
+        ext, mime = ('png', 'image/png') if spec.fmt == 'PNG' else ('jpg', 'image/jpeg')
+        payloads.append((spec.name, f"{spec.name}.{ext}", mime, make_image(spec, seed)))
+    return payloads
+
+
+def _proc_tree(root_pid):
+    children = collections.defaultdict(list)
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def tree_usage(root_pid):
+    """(detik CPU, RSS byte) dijumlah untuk proses dan seluruh turunannya (Linux /proc)."""
+    ticks = os.sysconf('SC_CLK_TCK')
+    page = os.sysconf('SC_PAGE_SIZE')
+    cpu, rss = 0.0, 0
+    for pid in _proc_tree(root_pid):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            # utime, stime, cutime, cstime (field 14-17), rss (field 24)
+            cpu += sum(int(v) for v in fields[11:15]) / ticks
+            rss += int(fields[21]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpu, rss
+
+
+class _UsageSampler:
+    """Mencatat RSS puncak pohon proses selama beban berjalan (sampling berkala)."""
+
+    def __init__(self, root_pid, interval=0.1):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, tree_usage(self.root_pid)[1])
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.cpu_start = tree_usage(self.root_pid)[0]
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.wall = time.perf_counter() - self.started
+        cpu_end, rss = tree_usage(self.root_pid)
+        self.cpu_seconds = cpu_end - self.cpu_start
+        self.peak_rss = max(self.peak_rss, rss)
+
+
+def run_load(send, concurrency, requests, warmup=0):
+    """
+    Menjalankan `requests` pemanggilan `send()` (mengembalikan status HTTP) dari
+    `concurrency` thread setelah `warmup` pemanggilan yang tidak diukur.
+    Mengembalikan list (latensi detik, status) per request.
+    """
+    for _ in range(warmup):
+        try:
+            send()
+        except Exception:
+            pass
+
+    samples = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status = send()
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append((elapsed, status))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, wall, cpu_seconds, peak_rss):
+    """Ringkasan satu skenario; persentil latensi (ms) hanya dari request yang berhasil (2xx)."""
+    statuses = collections.Counter(status for _, status in samples)
+    values = np.array([
+        seconds for seconds, status in samples if isinstance(status, int) and 200 <= status < 300
+    ]) * 1000.0
+    ok = len(values)
+    summary = {
+        "requests": len(samples),
+        "errors": len(samples) - ok,
+        "statusCounts": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "wallSeconds": round(wall, 3),
+        "throughputRps": round(ok / wall, 3) if wall > 0 else 0.0,
+        "cpuSeconds": round(cpu_seconds, 3),
+        "cpuUtilization": round(cpu_seconds / wall, 3) if wall > 0 else 0.0,
+        "peakRssMb": round(peak_rss / (1024 * 1024), 1),
+    }
+    if len(values):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary.update(p50=round(p50, 2), p95=round(p95, 2), p99=round(p99, 2),
+                       meanMs=round(float(values.mean()), 2), maxMs=round(float(values.max()), 2))
+    return summary
+
+
+def _inprocess_child(service_key, env, payloads, concurrency_levels, requests, warmup, result_queue):
+    try:
+        os.environ.update(env)
+        service = SERVICES[service_key]
+        sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, service.directory)]
+        app = importlib.import_module(f"{service.directory}.app").app
+        local = threading.local()
+
+        results = {}
+        for name, filename, content_type, data in payloads:
+            def send():
+                client = getattr(local, 'client', None)
+                if client is None:
+                    client = local.client = app.test_client()
+                response = client.post(
+                    service.path, content_type='multipart/form-data',
+                    data={service.field: (io.BytesIO(data), filename, content_type)}
+                )
+                response.get_data()
+                return response.status_code
+
+            for concurrency in concurrency_levels:
+                with _UsageSampler(os.getpid()) as usage:
+                    samples = run_load(send, concurrency, requests, warmup)
+                results[(name, concurrency)] = summarize(samples, usage.wall, usage.cpu_seconds, usage.peak_rss)
+        result_queue.put({"ok": True, "results": results})
+    except Exception as e:
+        result_queue.put({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+def run_inprocess(service_key, env, payloads, concurrency_levels, requests, warmup):
+    """Driver in-process: satu subprocess (spawn) per layanan agar model dan memori terisolasi."""
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(
+        target=_inprocess_child,
+        args=(service_key, env, payloads, concurrency_levels, requests, warmup, result_queue)
+    )
+    process.start()
+    message = result_queue.get()
+    process.join()
+    if not message["ok"]:
+        raise RuntimeError(f"In-process benchmark for '{service_key}' failed: {message['error']}")
+    return message["results"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _multipart(field, filename, content_type, data):
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    return head + data + f"\r\n--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def run_gunicorn(service_key, env, payloads, concurrency_levels, requests, warmup,
+                 workers=2, threads=8, startup_timeout=300.0):
+    """Driver gunicorn: konfigurasi sama dengan Dockerfile.python-service, dibebani lewat HTTP."""
+    service = SERVICES[service_key]
+    port = _free_port()
+    process_env = dict(os.environ, **env)
+    process_env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_DIR, process_env.get('PYTHONPATH')]))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--threads', str(threads), '--worker-class', 'gthread', '--timeout', '300', '--preload', 'app:app'],
+        cwd=os.path.join(ROOT_DIR, service.directory), env=process_env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn for '{service_key}' exited during startup (code {process.returncode})")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/livez')
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn for '{service_key}' did not start within {startup_timeout:.0f}s")
+            time.sleep(0.5)
+
+        local = threading.local()
+        results = {}
+        for name, filename, content_type, data in payloads:
+            body, multipart_type = _multipart(service.field, filename, content_type, data)
+
+            def send():
+                for attempt in range(2):
+                    connection = getattr(local, 'connection', None)
+                    reused = connection is not None
+                    if connection is None:
+                        connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+                    try:
+                        connection.request('POST', service.path, body=body, headers={'Content-Type': multipart_type})
+                        response = connection.getresponse()
+                        response.read()
+                        if response.will_close:
+                            connection.close()
+                            local.connection = None
+                        return response.status
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        local.connection = None
+                        # Koneksi keep-alive lama bisa sudah ditutup server; ulangi sekali dengan koneksi baru.
+                        if not reused:
+                            raise
+
+            for concurrency in concurrency_levels:
+                with _UsageSampler(process.pid) as usage:
+                    samples = run_load(send, concurrency, requests, warmup)
+                results[(name, concurrency)] = summarize(samples, usage.wall, usage.cpu_seconds, usage.peak_rss)
+        return results
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def result_key(service_key, scenario, driver, concurrency):
+    return f"{service_key}/{scenario}/{driver}/c{concurrency}"
+
+
+def compare_results(current, baseline, tolerance=0.10, min_delta_ms=2.0):
+    """
+    Membandingkan hasil dengan baseline untuk skenario yang ada di keduanya.
+    Mengembalikan list baris {key, metric, baseline, current, change, regression}.
+    """
+    rows = []
+    for key, result in sorted(current.items()):
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            before, after = reference.get(metric), result.get(metric)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / before
+            regression = change * direction > tolerance
+            if regression and metric.startswith('p') and abs(after - before) < min_delta_ms:
+                regression = False
+            rows.append({
+                "key": key, "metric": metric, "baseline": before, "current": after,
+                "change": round(change, 4), "regression": regression,
+            })
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark beban/latensi layanan Python TemanDifa.")
+    parser.add_argument('--services', nargs='+', choices=sorted(SERVICES), default=['yolo', 'ocr', 'voice'])
+    parser.add_argument('--driver', nargs='+', choices=['inprocess', 'gunicorn'], default=['inprocess'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=50, help="Jumlah request terukur per skenario")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--scenarios', nargs='*', help="Hanya jalankan skenario dengan nama ini")
+    parser.add_argument('--gunicorn-workers', type=int, default=2)
+    parser.add_argument('--gunicorn-threads', type=int, default=8)
+    parser.add_argument('--env', nargs='*', default=[], metavar='KEY=VALUE', help="Env tambahan untuk layanan")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Tulis hasil JSON ke file ini")
+    parser.add_argument('--baseline', help="File hasil sebelumnya untuk perbandingan regresi")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Ambang regresi relatif (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    env = dict(DEFAULT_ENV, **dict(item.split('=', 1) for item in args.env))
+    results = {}
+    for service_key in args.services:
+        payloads = [p for p in build_payloads(service_key, args.seed) if not args.scenarios or p[0] in args.scenarios]
+        if not payloads:
+            continue
+        for driver in args.driver:
+            print(f"[{service_key}] {driver}: {len(payloads)} scenario(s) x concurrency {args.concurrency}", file=sys.stderr)
+            if driver == 'gunicorn':
+                service_results = run_gunicorn(
+                    service_key, env, payloads, args.concurrency, args.requests, args.warmup,
+                    workers=args.gunicorn_workers, threads=args.gunicorn_threads
+                )
+            else:
+                service_results = run_inprocess(service_key, env, payloads, args.concurrency, args.requests, args.warmup)
+            for (scenario, concurrency), summary in service_results.items():
+                results[result_key(service_key, scenario, driver, concurrency)] = summary
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "args": vars(args),
+            "env": env,
+        },
+        "results": results,
+    }
+
+    print(f"{'scenario':<58} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8} {'err':>5} {'cpu%':>6} {'rssMB':>8}")
+    for key, r in results.items():
+        print(f"{key:<58} {r.get('p50', 0):>9.1f} {r.get('p95', 0):>9.1f} {r.get('p99', 0):>9.1f} "
+              f"{r['throughputRps']:>8.2f} {r['errors']:>5} {r['cpuUtilization'] * 100:>6.0f} {r['peakRssMb']:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        rows = compare_results(results, baseline, tolerance=args.tolerance)
+        report["comparison"] = rows
+        regressions = [row for row in rows if row["regression"]]
+        for row in regressions:
+            print(f"REGRESSION {row['key']} {row['metric']}: {row['baseline']} -> {row['current']} "
+                  f"({row['change'] * 100:+.1f}%)")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(f"{len(rows)} metric(s) compared, {len(regressions)} regression(s) above {args.tolerance:.0%}.")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Generator data uji sintetis (offline, deterministik dari seed) untuk benchmark:
+gambar dengan berbagai resolusi dan kepadatan teks, serta klip audio dengan berbagai
+durasi dan rasio hening.
+"""
+import io
+import wave
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+SAMPLE_RATE = 16000
+_WORDS = (
+    "teman difa membaca teks dari kamera untuk membantu pengguna tunanetra mengenali "
+    "objek jalan pintu meja kursi botol obat uang kertas label harga nomor bus"
+).split()
+
+
+class ImageSpec(NamedTuple):
+    name: str
+    width: int
+    height: int
+    text_density: float  # 0 = tanpa teks, 1 = halaman penuh
+    fmt: str = 'JPEG'
+
+
+class AudioSpec(NamedTuple):
+    name: str
+    seconds: float
+    silence_ratio: float
+
+
+IMAGE_SPECS = {
+    'yolo': [
+        ImageSpec('photo-320x240', 320, 240, 0.0),
+        ImageSpec('photo-640x480', 640, 480, 0.05),
+        ImageSpec('photo-1920x1080', 1920, 1080, 0.05),
+    ],
+    'ocr': [
+        ImageSpec('label-640x480-sparse', 640, 480, 0.15, 'PNG'),
+        ImageSpec('page-1240x1754-dense', 1240, 1754, 0.9, 'PNG'),
+        ImageSpec('photo-1080x1440-medium', 1080, 1440, 0.5),
+    ],
+}
+
+AUDIO_SPECS = [
+    AudioSpec('clip-5s-20pct-silence', 5, 0.2),
+    AudioSpec('clip-30s-50pct-silence', 30, 0.5),
+    AudioSpec('clip-90s-30pct-silence', 90, 0.3),
+]
+
+
+def make_image(spec, seed=0):
+    """Gambar berisi bentuk acak (objek) dan baris teks sesuai kepadatan; dikembalikan sebagai byte terenkode."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(90, 200, spec.width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (spec.height, spec.width, 3)).astype(np.float32)
+    image = Image.fromarray(np.clip(gradient + noise, 0, 255).astype(np.uint8), 'RGB')
+    draw = ImageDraw.Draw(image)
+
+    for _ in range(int(rng.integers(3, 9))):
+        w = int(rng.integers(spec.width // 10, spec.width // 3))
+        h = int(rng.integers(spec.height // 10, spec.height // 3))
+        x, y = int(rng.integers(0, spec.width - w)), int(rng.integers(0, spec.height - h))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        if rng.random() < 0.5:
+            draw.rectangle([x, y, x + w, y + h], fill=color)
+        else:
+            draw.ellipse([x, y, x + w, y + h], fill=color)
+
+    if spec.text_density > 0:
+        line_height = 14
+        margin = spec.width // 12
+        lines = int(spec.height * spec.text_density / line_height)
+        top = (spec.height - lines * line_height) // 2
+        for i in range(lines):
+            words = rng.choice(_WORDS, size=max(1, (spec.width - 2 * margin) // 45))
+            draw.rectangle(
+                [margin - 4, top + i * line_height - 2, spec.width - margin, top + (i + 1) * line_height - 2],
+                fill=(245, 245, 240)
+            )
+            draw.text((margin, top + i * line_height), " ".join(words), fill=(20, 20, 20))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=spec.fmt, **({'quality': 90} if spec.fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+
+def make_audio(spec, seed=0):
+    """
+    WAV 16 kHz mono: "suku kata" harmonik dengan pitch bervariasi (mirip ucapan untuk VAD)
+    diselingi jeda hening sehingga total hening mendekati `silence_ratio`.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(spec.seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 0.002, total).astype(np.float32)
+
+    silence_total = int(total * spec.silence_ratio)
+    gaps = max(1, int(spec.seconds / 4))
+    gap_lengths = rng.dirichlet(np.ones(gaps)) * silence_total
+    voiced_length = (total - silence_total) / gaps
+
+    position = 0
+    for gap in gap_lengths:
+        position += int(gap)
+        end = min(total, position + int(voiced_length))
+        t = np.arange(end - position) / SAMPLE_RATE
+        pitch = 110 + 60 * np.sin(2 * np.pi * 0.7 * t + rng.random() * 6)
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+        syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t - np.pi / 2))
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6)) * syllables * 0.2
+        audio[position:end] += voiced.astype(np.float32)
+        position = end
+
+    pcm = (np.clip(audio, -1, 1) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
@@ -0,0 +1,36 @@
+import io
+import wave
+
+from PIL import Image
+
+from benchmarks.run import compare_results, run_load, summarize
+from benchmarks.synthetic import AudioSpec, ImageSpec, make_audio, make_image
+
+
+def test_synthetic_payloads_are_deterministic_and_sized():
+    spec = ImageSpec('page', 320, 400, 0.8, 'PNG')
+    data = make_image(spec, seed=1)
+    assert data == make_image(spec, seed=1)
+    assert Image.open(io.BytesIO(data)).size == (320, 400)
+
+    audio = make_audio(AudioSpec('clip', 4, 0.5), seed=1)
+    with wave.open(io.BytesIO(audio)) as wav:
+        assert wav.getframerate() == 16000
+        assert wav.getnframes() == 4 * 16000
+
+
+def test_summary_percentiles_ignore_errors_and_compare_flags_regressions():
+    responses = iter([200] * 9 + [503])
+    samples = run_load(lambda: next(responses), concurrency=3, requests=10)
+    summary = summarize([(0.010 * (i + 1), status) for i, (_, status) in enumerate(samples)], 1.0, 0.5, 0)
+    assert summary["requests"] == 10
+    assert summary["errors"] == 1
+    assert summary["statusCounts"] == {"200": 9, "503": 1}
+    assert summary["throughputRps"] == 9
+
+    baseline = {"yolo/a/inprocess/c1": {"p50": 100.0, "p95": 200.0, "throughputRps": 10.0}}
+    current = {"yolo/a/inprocess/c1": {"p50": 101.0, "p95": 260.0, "throughputRps": 8.0}}
+    rows = {row["metric"]: row for row in compare_results(current, baseline, tolerance=0.1)}
+    assert not rows["p50"]["regression"]
+    assert rows["p95"]["regression"]
+    assert rows["throughputRps"]["regression"]
@@ -0,0 +1,186 @@
+import collections
+import logging
+import math
+import os
+import threading
+import time
+
+from flask import g, request
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+from common.jobs import wants_async
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+
+def _admission_metrics(registry):
+    """Membuat (sekali per registry) metrik admission control untuk semua endpoint."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'in_flight': Gauge(
+                    'admission_in_flight', 'Jumlah request yang sedang diproses (sudah lolos admission)',
+                    ['endpoint'], registry=registry
+                ),
+                'queue_depth': Gauge(
+                    'admission_queue_depth', 'Jumlah request yang menunggu slot pemrosesan',
+                    ['endpoint'], registry=registry
+                ),
+                'rejections': Counter(
+                    'admission_rejections_total', 'Jumlah request yang ditolak oleh admission control',
+                    ['endpoint', 'reason'], registry=registry
+                ),
+                'wait': Histogram(
+                    'admission_wait_seconds', 'Waktu tunggu di antrean admission sebelum diproses',
+                    ['endpoint'], registry=registry,
+                    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+class AdmissionLimiter:
+    """
+    Batas konkurensi satu endpoint dengan antrean tunggu FIFO yang terbatas.
+
+    Request yang datang saat semua slot terpakai menunggu di antrean; jika antrean
+    penuh, request langsung ditolak (429), dan jika slot tidak didapat sebelum
+    `queue_timeout` habis, request ditolak (503). Keduanya menyertakan perkiraan
+    Retry-After dari rata-rata durasi pemrosesan terakhir.
+    """
+
+    def __init__(self, endpoint, max_concurrent, max_queue, queue_timeout, metrics=None):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be >= 1")
+        self.endpoint = endpoint
+        self.max_concurrent = int(max_concurrent)
+        self.max_queue = int(max_queue)
+        self.queue_timeout = float(queue_timeout)
+        self.avg_service_seconds = 1.0
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = collections.deque()
+        self._metrics = metrics or _admission_metrics(REGISTRY)
+
+    def retry_after(self):
+        """Perkiraan detik sampai slot tersedia, dibulatkan ke atas (1-60)."""
+        backlog = len(self._waiters) + 1
+        estimate = self.avg_service_seconds * backlog / self.max_concurrent
+        return int(min(60, max(1, math.ceil(estimate))))
+
+    def _reject(self, reason):
+        self._metrics['rejections'].labels(endpoint=self.endpoint, reason=reason).inc()
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Admission rejected request to [{self.endpoint}] ({reason}); "
+            f"in_flight={self._active}, queued={len(self._waiters)}, retry_after={retry_after}s"
+        )
+        if reason == 'queue_full':
+            raise TooManyRequests(
+                f"Server is busy ({self.endpoint}); please retry later.", retry_after=retry_after
+            )
+        raise ServiceUnavailable(
+            f"Request waited too long for capacity ({self.endpoint}); please retry later.", retry_after=retry_after
+        )
+
+    def acquire(self):
+        """Mengambil satu slot atau melempar TooManyRequests/ServiceUnavailable."""
+        started = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._update_gauges()
+                self._metrics['wait'].labels(endpoint=self.endpoint).observe(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._reject('queue_full')
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self._update_gauges()
+
+        granted = waiter.wait(self.queue_timeout)
+        with self._lock:
+            if not granted and not waiter.is_set():
+                self._waiters.remove(waiter)
+                self._update_gauges()
+                self._reject('timeout')
+            # Slot sudah dialihkan oleh release() ke waiter ini.
+        self._metrics['wait'].labels(endpoint=self.endpoint).observe(time.monotonic() - started)
+
+    def in_flight(self):
+        """Jumlah request yang sedang diproses ditambah yang menunggu di antrean."""
+        with self._lock:
+            return self._active + len(self._waiters)
+
+    def release(self, service_seconds=None):
+        """Mengembalikan slot; langsung diberikan ke request terdepan di antrean jika ada."""
+        with self._lock:
+            if service_seconds is not None:
+                self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * service_seconds
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._active -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        self._metrics['in_flight'].labels(endpoint=self.endpoint).set(self._active)
+        self._metrics['queue_depth'].labels(endpoint=self.endpoint).set(len(self._waiters))
+
+
+def register_admission_control(app, metrics, limits):
+    """
+    Memasang admission control pada endpoint Flask tertentu.
+    Args:
+        limits (dict): nama endpoint -> {"max_concurrent", "max_queue", "queue_timeout"}.
+            Setiap nilai dapat ditimpa lewat env ADMISSION_<ENDPOINT>_MAX_CONCURRENT,
+            ..._MAX_QUEUE dan ..._QUEUE_TIMEOUT_SECONDS (nama endpoint dalam huruf besar).
+    Returns:
+        dict: nama endpoint -> AdmissionLimiter.
+    """
+    if os.environ.get('ADMISSION_ENABLED', 'true').lower() != 'true':
+        logger.info("Admission control disabled (ADMISSION_ENABLED=false).")
+        return {}
+
+    admission_metrics = _admission_metrics(metrics.registry)
+    limiters = {}
+    for endpoint, spec in limits.items():
+        prefix = f"ADMISSION_{endpoint.upper()}"
+        limiters[endpoint] = AdmissionLimiter(
+            endpoint,
+            max_concurrent=int(os.environ.get(f"{prefix}_MAX_CONCURRENT", spec.get('max_concurrent', 1))),
+            max_queue=int(os.environ.get(f"{prefix}_MAX_QUEUE", spec.get('max_queue', 4))),
+            queue_timeout=float(os.environ.get(f"{prefix}_QUEUE_TIMEOUT_SECONDS", spec.get('queue_timeout', 30))),
+            metrics=admission_metrics,
+        )
+        limiter = limiters[endpoint]
+        logger.info(
+            f"Admission control for [{endpoint}]: max_concurrent={limiter.max_concurrent}, "
+            f"max_queue={limiter.max_queue}, queue_timeout={limiter.queue_timeout:.1f}s"
+        )
+
+    @app.before_request
+    def admit_request():
+        limiter = limiters.get(request.endpoint)
+        if limiter is None or wants_async():
+            # Submit job asinkron murah; pemrosesannya dibatasi oleh jumlah worker job.
+            return
+        limiter.acquire()
+        g.admission = (limiter, time.monotonic())
+
+    @app.teardown_request
+    def release_admission(exc=None):
+        # Untuk respons streaming, teardown berjalan setelah stream selesai sehingga slot tetap dipegang.
+        admission = g.pop('admission', None)
+        if admission is not None:
+            limiter, started = admission
+            limiter.release(time.monotonic() - started)
+
+    app.extensions['admission_limiters'] = limiters
+    return limiters
@@ -1,21 +1,37 @@
 import logging
 import os
+import time
 from flask import Flask, jsonify, request
-from werkzeug.exceptions import BadRequest, InternalServerError, UnsupportedMediaType
+from werkzeug.exceptions import (
+    BadRequest, Conflict, Forbidden, InternalServerError, NotFound, RequestEntityTooLarge, ServiceUnavailable,
+    TooManyRequests, UnsupportedMediaType
+)
 from prometheus_flask_exporter import PrometheusMetrics
 
 from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPTraceExporter
 from opentelemetry.instrumentation.flask import FlaskInstrumentor
 
+from common.admission import register_admission_control
+from common.health import SelfTestMonitor
+from common.serialization import install_json_provider
+from common.startup import StartupTimer, process_uptime
+from common.uploads import register_upload_limits
+from common.structured_logging import configure_logging
+
 logger = logging.getLogger(__name__)
 
 def setup_tracing(app_name):
     """Mengkonfigurasi OpenTelemetry untuk layanan ini."""
+    if os.environ.get("OTEL_SDK_DISABLED", "false").lower() == "true":
+        logger.info(f"OpenTelemetry SDK disabled; tracing is not configured for [{app_name}]")
+        return
     try:
+        # Import di sini: SDK + exporter gRPC cukup berat dan tidak diperlukan jika tracing dimatikan.
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
         resource = Resource(attributes={
             "service.name": app_name
         })
@@ -25,7 +41,7 @@ def setup_tracing(app_name):
 
         otlp_endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
         
-        exporter = OTLPTraceExporter(endpoint=otlp_endpoint, insecure=True)
+        exporter = OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True)
         processor = BatchSpanProcessor(exporter)
         provider.add_span_processor(processor)
 
@@ -53,6 +69,42 @@ def register_error_handlers(app):
         response.status_code = 415
         return response
 
+    @app.errorhandler(RequestEntityTooLarge)
+    def handle_request_entity_too_large(error):
+        logger.warning(f"Request Entity Too Large: {request.content_length} bytes (Path: {request.path})")
+        response = jsonify(message=error.description or "Request Entity Too Large")
+        response.status_code = 413
+        return response
+
+    @app.errorhandler(Forbidden)
+    def handle_forbidden(error):
+        logger.warning(f"Forbidden: {error.description} (Path: {request.path})")
+        response = jsonify(message=error.description or "Forbidden")
+        response.status_code = 403
+        return response
+
+    @app.errorhandler(Conflict)
+    def handle_conflict(error):
+        logger.warning(f"Conflict: {error.description} (Path: {request.path})")
+        response = jsonify(message=error.description or "Conflict")
+        response.status_code = 409
+        return response
+
+    @app.errorhandler(NotFound)
+    def handle_not_found(error):
+        response = jsonify(message=error.description or "Not Found")
+        response.status_code = 404
+        return response
+
+    @app.errorhandler(TooManyRequests)
+    @app.errorhandler(ServiceUnavailable)
+    def handle_overload(error):
+        response = jsonify(message=error.description or "Service is overloaded")
+        response.status_code = error.code
+        if error.retry_after is not None:
+            response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
     @app.errorhandler(InternalServerError)
     def handle_internal_server_error(error):
         original_exception = getattr(error, "original_exception", error)
@@ -64,7 +116,8 @@ def register_error_handlers(app):
 
     @app.errorhandler(Exception)
     def handle_generic_exception(error):
-        if isinstance(error, (BadRequest, UnsupportedMediaType, InternalServerError)):
+        if isinstance(error, (BadRequest, UnsupportedMediaType, RequestEntityTooLarge, InternalServerError, NotFound,
+                              Forbidden, Conflict, TooManyRequests, ServiceUnavailable)):
              return error
 
         error_message = str(error)
@@ -73,20 +126,93 @@ def register_error_handlers(app):
         response.status_code = 500
         return response
 
-def create_app(app_name):
+def register_health_endpoints(app, metrics, monitor):
+    """
+    Mendaftarkan endpoint probe yang dijawab seketika dari state yang di-cache:
+    /livez (proses hidup), /readyz (hasil dan umur self-test terakhir), dan /health
+    (kompatibilitas, setara dengan /readyz).
+    """
+
+    @app.before_request
+    def start_self_test_monitor():
+        monitor.ensure_started()
+
+    @app.route('/livez', methods=['GET'])
+    @metrics.do_not_track()
+    def liveness():
+        return jsonify({"status": "alive"}), 200
+
+    @app.route('/readyz', methods=['GET'])
+    @metrics.do_not_track()
+    def readiness():
+        ready, detail = monitor.status()
+        return jsonify({"status": "ready" if ready else "not_ready", "selfTest": detail}), 200 if ready else 503
+
+    @app.route('/health', methods=['GET'])
+    @metrics.do_not_track()
+    def health_check():
+        ready, detail = monitor.status()
+        if ready:
+            return jsonify({"status": "healthy"}), 200
+        reason = detail.get("error") or detail.get("reason") or "Self-test failed"
+        return jsonify({"status": "unhealthy", "reason": reason}), 503
+
+def register_self_test(app, check_fn):
+    """
+    Mendaftarkan fungsi self-test layanan (inferensi nyata pada input dummy).
+    Fungsi harus melempar exception jika layanan tidak siap.
+    Self-test dijalankan di background saat worker mulai (sekaligus warm-up model)
+    dan secara berkala setiap SELF_TEST_INTERVAL_SECONDS.
+    """
+    monitor = app.extensions['self_test_monitor']
+    monitor.set_check(check_fn)
+    return monitor
+
+def create_app(app_name, service_name=None, admission_limits=None, upload_limits=None):
     """
     Factory untuk membuat instance aplikasi Flask dengan konfigurasi umum.
+    `service_name` (mis. 'yolo-detector') dipakai di log JSON, tracing, dan label startup/self-test;
+    di bawah gunicorn `__name__` modul ketiga layanan sama-sama 'app', jadi harus diberikan eksplisit.
+    `admission_limits` (nama endpoint -> batas konkurensi/antrean) mengaktifkan
+    admission control untuk endpoint inferensi; lihat common.admission.
+    `upload_limits` (nama endpoint -> batas ukuran dan jenis file) mengaktifkan
+    penerimaan upload dengan penolakan dini; lihat common.uploads.
+    Fase startup dicatat oleh `app.extensions['startup']` (lihat common.startup).
     """
+    imports_seconds = process_uptime()
+    factory_started = time.monotonic()
+    service_name = service_name or app_name.split('.')[-1]
+    configure_logging(service_name)
+
     app = Flask(app_name)
     app.url_map.strict_slashes = False
+    install_json_provider(app)
 
-    setup_tracing(app_name.split('.')[-1])
+    setup_tracing(service_name)
     FlaskInstrumentor().instrument_app(app)
 
     metrics = PrometheusMetrics(app, group_by='endpoint')
+    startup = StartupTimer(service_name, registry=metrics.registry)
+    app.extensions['startup'] = startup
 
     register_error_handlers(app)
 
-    logger.info(f"Flask app '{app_name}' created with common factory (metrics, error handlers, tracing).")
+    monitor = SelfTestMonitor(
+        service_name,
+        registry=metrics.registry,
+        interval_seconds=float(os.environ.get('SELF_TEST_INTERVAL_SECONDS', 60)),
+        max_age_seconds=float(os.environ.get('SELF_TEST_MAX_AGE_SECONDS', 0)) or None,
+        startup=startup
+    )
+    app.extensions['self_test_monitor'] = monitor
+    register_health_endpoints(app, metrics, monitor)
+    if upload_limits:
+        # Sebelum admission control: upload yang jelas terlalu besar tidak ikut mengantre.
+        register_upload_limits(app, upload_limits)
+    register_admission_control(app, metrics, admission_limits or {})
+
+    startup.record('imports', imports_seconds)
+    startup.record('app_factory', time.monotonic() - factory_started)
+    logger.info(f"Flask app '{service_name}' created with common factory (metrics, error handlers, tracing, structured logging, health probes, admission control).")
     
     return app, metrics
\ No newline at end of file
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+
+def _self_test_metrics(registry):
+    """Membuat (sekali per registry Prometheus) gauge self-test, berlabel nama layanan."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'success': Gauge(
+                    'self_test_success', 'Hasil self-test terakhir (1 = berhasil, 0 = gagal)',
+                    ['service'], registry=registry
+                ),
+                'duration': Gauge(
+                    'self_test_duration_seconds', 'Durasi self-test terakhir', ['service'], registry=registry
+                ),
+                'timestamp': Gauge(
+                    'self_test_last_run_timestamp_seconds', 'Waktu (unix) self-test terakhir dijalankan',
+                    ['service'], registry=registry
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+class SelfTestMonitor:
+    """
+    Menjalankan self-test (inferensi nyata pada input dummy) di background thread
+    secara berkala dan menyimpan hasil terakhirnya, sehingga probe liveness/readiness
+    dapat dijawab seketika dari state yang di-cache.
+
+    Self-test pertama berfungsi sebagai warm-up model. Thread dimulai secara lazy di
+    setiap proses worker (pada request pertama, biasanya probe), sehingga inferensi
+    tidak pernah dijalankan di proses master gunicorn --preload sebelum fork.
+    """
+
+    def __init__(self, service_name, registry=None, interval_seconds=60, max_age_seconds=None, startup=None):
+        self.service_name = service_name
+        self.startup = startup
+        self.interval_seconds = float(interval_seconds)
+        self.max_age_seconds = float(max_age_seconds or self.interval_seconds * 3)
+        self.check_fn = None
+
+        self._lock = threading.Lock()
+        self._state = {"ok": None, "last_run": None, "duration": None, "error": None}
+        self._thread = None
+        self._pid = None
+
+        gauges = _self_test_metrics(registry or REGISTRY)
+        self._success_gauge = gauges['success'].labels(service=service_name)
+        self._duration_gauge = gauges['duration'].labels(service=service_name)
+        self._timestamp_gauge = gauges['timestamp'].labels(service=service_name)
+
+    def set_check(self, check_fn):
+        """Mendaftarkan fungsi self-test; fungsi harus melempar exception jika gagal."""
+        self.check_fn = check_fn
+
+    def ensure_started(self):
+        """Memulai background thread self-test jika belum berjalan di proses ini."""
+        if self.check_fn is None:
+            return
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name=f"self-test-{self.service_name}", daemon=True
+            )
+            self._thread.start()
+
+    def run_once(self):
+        """Menjalankan self-test sekali secara sinkron dan memperbarui state."""
+        started = time.monotonic()
+        ok, error = True, None
+        try:
+            self.check_fn()
+        except Exception as e:
+            ok, error = False, str(e)
+            logger.error(f"Self-test failed for [{self.service_name}]: {e}", exc_info=True)
+        duration = time.monotonic() - started
+
+        with self._lock:
+            self._state = {"ok": ok, "last_run": time.time(), "duration": duration, "error": error}
+        self._success_gauge.set(1 if ok else 0)
+        self._duration_gauge.set(duration)
+        self._timestamp_gauge.set_to_current_time()
+        if ok and self.startup is not None:
+            # Self-test pertama yang berhasil = warm-up selesai (lihat common.startup).
+            self.startup.mark_warm(duration)
+        logger.debug(f"Self-test for [{self.service_name}] finished: ok={ok}, duration={duration:.3f}s")
+        return ok
+
+    def _run(self):
+        while True:
+            ok = self.run_once()
+            # Setelah gagal, coba lagi lebih cepat agar pemulihan cepat terdeteksi.
+            time.sleep(self.interval_seconds if ok else min(self.interval_seconds, 10.0))
+
+    def status(self):
+        """Mengembalikan (ready, detail) berdasarkan hasil self-test terakhir."""
+        with self._lock:
+            state = dict(self._state)
+
+        if state["last_run"] is None:
+            return False, {"ok": None, "reason": "Self-test has not completed yet"}
+
+        age = time.time() - state["last_run"]
+        detail = {
+            "ok": state["ok"],
+            "lastRunAt": state["last_run"],
+            "ageSeconds": round(age, 3),
+            "durationSeconds": round(state["duration"], 3),
+        }
+        if state["error"]:
+            detail["error"] = state["error"]
+
+        if not state["ok"]:
+            return False, detail
+        if age > self.max_age_seconds:
+            detail["reason"] = f"Last self-test is stale ({age:.0f}s old)"
+            return False, detail
+        return True, detail
@@ -0,0 +1,112 @@
+import io
+import logging
+import math
+import os
+from typing import NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from common.uploads import BufferReader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000))
+
+
+class InvalidImageError(ValueError):
+    """Gambar tidak dapat dikenali, rusak, atau formatnya tidak diizinkan."""
+
+
+class ImageTooLargeError(InvalidImageError):
+    """Jumlah piksel gambar melebihi batas (perlindungan decompression bomb)."""
+
+
+class IngestedImage(NamedTuple):
+    image: Image.Image
+    original_size: Tuple[int, int]
+    scale: Tuple[float, float]
+    format: Optional[str]
+
+
+def _reduction_target(size, max_side):
+    """Ukuran minimum (w, h) yang harus dipertahankan agar sisi terpanjang tetap >= max_side."""
+    width, height = size
+    longest = max(width, height)
+    ratio = max_side / float(longest)
+    return max(1, math.ceil(width * ratio)), max(1, math.ceil(height * ratio))
+
+
+def ingest_image(data, max_side=None, mode='RGB', allowed_formats=None, max_pixels=None) -> IngestedImage:
+    """
+    Memvalidasi dan men-decode gambar dalam satu kali jalan.
+
+    Header dibaca terlebih dahulu sehingga format dan jumlah piksel dapat diperiksa
+    sebelum data piksel di-decode. Untuk JPEG, mode draft dipakai agar decoder langsung
+    menghasilkan resolusi yang dibutuhkan konsumen (skala 1/2, 1/4, 1/8); format lain
+    diperkecil dengan `Image.reduce` setelah decode. Sisi terpanjang hasil tidak pernah
+    lebih kecil dari `max_side`.
+
+    Args:
+        data (bytes | memoryview | file-like): Isi file gambar.
+        max_side (int, optional): Sisi terpanjang minimum yang dibutuhkan konsumen.
+            None berarti gambar di-decode pada resolusi penuh.
+        mode (str, optional): Mode PIL hasil akhir (mis. 'RGB' atau 'L'). None = apa adanya.
+        allowed_formats (set, optional): Format PIL yang diizinkan (mis. {'JPEG', 'PNG'}).
+        max_pixels (int, optional): Batas jumlah piksel; default dari IMAGE_MAX_PIXELS.
+    Returns:
+        IngestedImage: Gambar hasil decode, ukuran asli, faktor skala (decoded / asli), dan format.
+    Raises:
+        ImageTooLargeError: Jika jumlah piksel melebihi batas.
+        InvalidImageError: Jika gambar tidak valid, rusak, atau formatnya tidak diizinkan.
+    """
+    if isinstance(data, memoryview):
+        # Buffer upload (lihat common.uploads) dibaca langsung tanpa disalin ke BytesIO.
+        data = BufferReader(data)
+    elif isinstance(data, (bytes, bytearray)):
+        data = io.BytesIO(data)
+    max_pixels = max_pixels or DEFAULT_MAX_PIXELS
+
+    try:
+        img = Image.open(data)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    except (IOError, SyntaxError, ValueError) as e:
+        raise InvalidImageError(f"Cannot identify image file: {e}") from e
+
+    image_format = img.format
+    if allowed_formats is not None and image_format not in allowed_formats:
+        raise InvalidImageError(f"Unsupported image format: '{image_format}'")
+
+    original_size = img.size
+    width, height = original_size
+    if width <= 0 or height <= 0:
+        raise InvalidImageError(f"Invalid image dimensions: {width}x{height}")
+    if width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image too large: {width}x{height} ({width * height} pixels) exceeds limit of {max_pixels} pixels"
+        )
+
+    try:
+        if max_side and max(original_size) > max_side:
+            img.draft(mode if mode in ('RGB', 'L') else None, _reduction_target(original_size, max_side))
+        elif mode == 'L':
+            img.draft('L', None)
+        img.load()
+
+        if max_side and max(img.size) > max_side:
+            factor = int(max(img.size) // max_side)
+            if factor > 1:
+                img = img.reduce(factor)
+
+        if mode and img.mode != mode:
+            img = img.convert(mode)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    except (IOError, SyntaxError, ValueError) as e:
+        raise InvalidImageError(f"Invalid or corrupted image file: {e}") from e
+
+    scale = (img.size[0] / float(width), img.size[1] / float(height))
+    if img.size != original_size:
+        logger.debug(f"Image decoded at reduced size {img.size} from {original_size} (scale={scale[0]:.3f}).")
+
+    return IngestedImage(image=img, original_size=original_size, scale=scale, format=image_format)
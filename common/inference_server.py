@@ -0,0 +1,316 @@
+"""
+Mode inference-server: satu proses model per container.
+
+Proses server memuat model sekali dan memiliki seluruh thread CPU untuk inferensi;
+worker HTTP gunicorn hanya mengirim input yang sudah di-decode lewat Unix domain
+socket. Payload array (gambar/audio) ditulis ke shared memory milik setiap thread
+klien, sehingga yang lewat socket hanya metadata kecil dan hasil inferensi.
+
+Server dijalankan sebagai proses terpisah (session baru) oleh klien pertama yang
+tidak dapat terhubung, dengan file lock agar hanya satu yang memulainya. Dengan
+`gunicorn --preload`, itu terjadi sekali di proses master sebelum fork.
+
+    python -m common.inference_server --socket /tmp/x.sock --factory detect:create_inference_handlers
+"""
+import argparse
+import atexit
+import fcntl
+import importlib
+import json
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!Q')
+_ALIGN = 64
+
+
+def _send(sock, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Inference server connection closed")
+        received += n
+    return buf
+
+
+def _recv(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return pickle.loads(_recv_exact(sock, size))
+
+
+def _attach(name):
+    """Membuka shared memory milik proses lain tanpa mendaftarkannya ke resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: attach ikut terdaftar di resource tracker dan akan di-unlink saat server keluar.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class _ShmBuffer:
+    """Buffer shared memory milik satu thread klien; diperbesar (2x) bila payload tidak muat."""
+
+    def __init__(self):
+        self.shm = None
+
+    def ensure(self, nbytes):
+        if self.shm is None or self.shm.size < nbytes:
+            self.close()
+            size = 1 << max(20, (max(nbytes, 1) - 1).bit_length())
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        return self.shm
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = None
+
+
+class InferenceClient:
+    """
+    Klien inference-server untuk worker HTTP. Aman dipakai banyak thread: setiap thread
+    memiliki koneksi dan buffer shared memory sendiri (dibuat ulang setelah fork).
+    """
+
+    def __init__(self, socket_path, factory, config=None, threads=1, start_timeout=120.0, call_timeout=None):
+        self.socket_path = socket_path
+        self.factory = factory
+        self.config = config or {}
+        self.threads = int(threads)
+        self.start_timeout = float(start_timeout)
+        self.call_timeout = call_timeout
+        self._local = threading.local()
+        self._buffers = []
+        atexit.register(self.close)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(self.call_timeout)
+        return sock
+
+    def ensure_server(self):
+        """Memastikan server berjalan; memulainya jika belum ada lalu menunggu sampai siap."""
+        try:
+            self._connect().close()
+            return
+        except OSError:
+            pass
+
+        with open(f"{self.socket_path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._connect().close()
+                return
+            except OSError:
+                pass
+
+            logger.info(f"Starting inference server ({self.factory}, threads={self.threads}) at {self.socket_path}")
+            env = dict(os.environ)
+            env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+            for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+                env[var] = str(self.threads)
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'common.inference_server', '--socket', self.socket_path,
+                 '--factory', self.factory, '--config', json.dumps(self.config), '--threads', str(self.threads)],
+                env=env, start_new_session=True,
+            )
+
+            deadline = time.monotonic() + self.start_timeout
+            while time.monotonic() < deadline:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Inference server exited during startup (code {process.returncode})")
+                try:
+                    self._connect().close()
+                    logger.info("Inference server is ready.")
+                    return
+                except OSError:
+                    time.sleep(0.1)
+            raise RuntimeError(f"Inference server did not become ready within {self.start_timeout:.0f}s")
+
+    def _state(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # Setelah fork, koneksi dan buffer milik proses induk tidak boleh dipakai.
+            local.pid = os.getpid()
+            local.sock = None
+            local.buffer = _ShmBuffer()
+            self._buffers.append((local.pid, local.buffer))
+        return local
+
+    def close(self):
+        """Melepas shared memory yang dibuat proses ini (dipanggil otomatis saat exit)."""
+        pid = os.getpid()
+        for owner, buffer in self._buffers:
+            if owner == pid:
+                buffer.close()
+
+    def call(self, op, arrays=(), **kwargs):
+        """
+        Menjalankan operasi `op` di server. `arrays` (list np.ndarray) disalin sekali ke
+        shared memory; `kwargs` dan hasil dikirim lewat socket (pickle).
+        Raises:
+            RuntimeError: Jika server tidak tersedia atau operasi gagal.
+        """
+        state = self._state()
+        specs, offset = [], 0
+        arrays = [np.ascontiguousarray(a) for a in arrays]
+        for array in arrays:
+            specs.append((offset, array.shape, array.dtype.str))
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+
+        shm_name = None
+        if arrays:
+            shm = state.buffer.ensure(offset)
+            for (start, shape, dtype), array in zip(specs, arrays):
+                np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = array
+            shm_name = shm.name
+
+        request = {"op": op, "shm": shm_name, "arrays": specs, "kwargs": kwargs}
+        for attempt in range(2):
+            try:
+                if state.sock is None:
+                    try:
+                        state.sock = self._connect()
+                    except OSError:
+                        self.ensure_server()
+                        state.sock = self._connect()
+                _send(state.sock, request)
+                response = _recv(state.sock)
+                break
+            except (OSError, ConnectionError) as e:
+                if state.sock is not None:
+                    state.sock.close()
+                    state.sock = None
+                if attempt == 1:
+                    raise RuntimeError(f"Inference server unavailable: {e}") from e
+
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+
+def client_from_env(service_name, factory, config=None):
+    """
+    Membuat InferenceClient jika INFERENCE_MODE=server, atau None untuk mode lokal
+    (model dimuat di setiap worker seperti biasa).
+    """
+    if os.environ.get('INFERENCE_MODE', 'local').lower() != 'server':
+        return None
+    return InferenceClient(
+        os.environ.get('INFERENCE_SOCKET', f"/tmp/{service_name}-inference.sock"),
+        factory,
+        config=config,
+        threads=int(os.environ.get('INFERENCE_THREADS', os.cpu_count() or 1)),
+        start_timeout=float(os.environ.get('INFERENCE_SERVER_START_TIMEOUT_SECONDS', 300)),
+    )
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        attached = None
+        try:
+            while True:
+                try:
+                    request = _recv(self.request)
+                except ConnectionError:
+                    return
+
+                try:
+                    arrays = []
+                    if request["shm"]:
+                        if attached is None or attached.name.lstrip('/') != request["shm"].lstrip('/'):
+                            # Klien mengganti buffer (diperbesar): lepaskan yang lama.
+                            if attached is not None:
+                                try:
+                                    attached.close()
+                                except BufferError:
+                                    pass
+                            attached = _attach(request["shm"])
+                        arrays = [
+                            np.ndarray(shape, dtype=dtype, buffer=attached.buf, offset=start)
+                            for start, shape, dtype in request["arrays"]
+                        ]
+                    handler = self.server.handlers[request["op"]]
+                    response = {"ok": True, "result": handler(arrays, **request["kwargs"])}
+                    del arrays
+                except Exception as e:
+                    logger.error(f"Inference op '{request.get('op')}' failed: {e}", exc_info=True)
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                _send(self.request, response)
+        finally:
+            if attached is not None:
+                try:
+                    attached.close()
+                except BufferError:
+                    pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, handlers):
+    """Melayani koneksi di `socket_path` memakai dict op -> fn(arrays, **kwargs)."""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+    server.handlers = handlers
+    os.chmod(socket_path, 0o600)
+    logger.info(f"Inference server listening on {socket_path} (ops: {', '.join(sorted(handlers))})")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proses inference-server bersama untuk satu container.")
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--factory', required=True, help="module:function yang mengembalikan dict op -> handler")
+    parser.add_argument('--config', default='{}', help="Konfigurasi JSON untuk factory")
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    from common.structured_logging import configure_logging
+
+    configure_logging('inference-server')
+    module_name, function_name = args.factory.split(':')
+    factory = getattr(importlib.import_module(module_name), function_name)
+    handlers = factory(threads=args.threads, **json.loads(args.config))
+    if 'torch' in sys.modules:
+        # OMP_NUM_THREADS sudah diset oleh klien; set eksplisit juga untuk pool intra-op torch.
+        sys.modules['torch'].set_num_threads(args.threads)
+    serve(args.socket, handlers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,497 @@
+"""
+Antrean job asinkron untuk inferensi yang lama (transkripsi audio panjang, OCR dokumen).
+
+`POST ...?async=true` (atau header `Prefer: respond-async`) langsung mengembalikan
+202 dengan id job; worker thread di setiap proses gunicorn mengambil job dari antrean
+dan menjalankan handler yang sama dengan jalur sinkron. Klien mem-poll
+`GET /jobs/<id>` (opsional `?wait=<detik>` untuk long-poll) atau menerima hasil lewat
+`callback_url` (host harus ada di JOB_CALLBACK_ALLOWED_HOSTS).
+
+Backend `redis` tahan lama dan dibagi semua worker/replika; backend `local` (in-process)
+dipakai untuk test dan pengembangan satu proses. Job yang sedang diproses memegang
+lease yang diperpanjang secara berkala; jika worker mati, lease kedaluwarsa dan job
+dikembalikan ke antrean (maksimal JOB_MAX_ATTEMPTS percobaan).
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlparse
+
+from flask import jsonify, request, url_for
+from prometheus_client import REGISTRY, Counter, Histogram
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound
+
+from common.serialization import negotiated_response
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+_TIMING_BUCKETS = (0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _job_metrics(registry):
+    """Membuat (sekali per registry) metrik job untuk semua antrean."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'events': Counter(
+                    'jobs_total', 'Jumlah kejadian job asinkron (submitted, succeeded, failed, retried, expired)',
+                    ['queue', 'event'], registry=registry
+                ),
+                'queue_seconds': Histogram(
+                    'job_queue_seconds', 'Waktu tunggu job di antrean sebelum mulai diproses',
+                    ['queue'], registry=registry, buckets=_TIMING_BUCKETS
+                ),
+                'run_seconds': Histogram(
+                    'job_run_seconds', 'Durasi pemrosesan job',
+                    ['queue', 'status'], registry=registry, buckets=_TIMING_BUCKETS
+                ),
+                'callbacks': Counter(
+                    'job_callbacks_total', 'Jumlah pengiriman hasil job ke callback_url',
+                    ['queue', 'outcome'], registry=registry
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+class LocalJobBackend:
+    """Penyimpanan job in-process (dict + deque). Hanya terlihat oleh proses yang sama."""
+
+    def __init__(self, ttl_seconds, lease_seconds):
+        self.ttl_seconds = float(ttl_seconds)
+        self.lease_seconds = float(lease_seconds)
+        self._records = {}
+        self._payloads = {}
+        self._pending = collections.deque()
+        self._leases = {}
+        self._cond = threading.Condition()
+
+    def _purge(self):
+        now = time.time()
+        for job_id in [j for j, (_, expires_at) in self._records.items() if expires_at <= now]:
+            del self._records[job_id]
+            self._payloads.pop(job_id, None)
+
+    def create(self, record, payload):
+        with self._cond:
+            self._purge()
+            self._records[record["id"]] = (record, time.time() + self.ttl_seconds)
+            self._payloads[record["id"]] = payload
+            self._pending.append(record["id"])
+            self._cond.notify()
+
+    def get(self, job_id):
+        with self._cond:
+            entry = self._records.get(job_id)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return dict(entry[0])
+
+    def save(self, record):
+        with self._cond:
+            self._records[record["id"]] = (dict(record), time.time() + self.ttl_seconds)
+
+    def load_payload(self, job_id):
+        with self._cond:
+            return self._payloads.get(job_id)
+
+    def claim(self, timeout):
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            if not self._pending:
+                return None
+            job_id = self._pending.popleft()
+            self._leases[job_id] = time.monotonic() + self.lease_seconds
+            return job_id
+
+    def renew(self, job_id):
+        with self._cond:
+            if job_id in self._leases:
+                self._leases[job_id] = time.monotonic() + self.lease_seconds
+
+    def release(self, job_id, requeue=False):
+        """Melepas job dari daftar 'sedang diproses'; True jika pemanggil yang melepasnya."""
+        with self._cond:
+            if self._leases.pop(job_id, None) is None:
+                return False
+            if requeue:
+                self._pending.appendleft(job_id)
+                self._cond.notify()
+            else:
+                self._payloads.pop(job_id, None)
+            return True
+
+    def expired_leases(self):
+        now = time.monotonic()
+        with self._cond:
+            return [job_id for job_id, deadline in self._leases.items() if deadline <= now]
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+
+class RedisJobBackend:
+    """
+    Penyimpanan job di Redis (reliable queue): `claim` memindahkan id secara atomik dari
+    list pending ke list processing dan memasang key lease ber-TTL. Record dan payload
+    kedaluwarsa JOB_TTL_SECONDS setelah perubahan status terakhir.
+    """
+
+    def __init__(self, url, ttl_seconds, lease_seconds, prefix='jobs'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=2)
+        self.ttl_seconds = int(ttl_seconds)
+        self.lease_seconds = float(lease_seconds)
+        self.prefix = prefix
+
+    def _key(self, kind, job_id=None):
+        return f"{self.prefix}:{kind}" if job_id is None else f"{self.prefix}:{kind}:{job_id}"
+
+    def create(self, record, payload):
+        pipe = self.client.pipeline()
+        pipe.set(self._key('payload', record["id"]), payload, ex=self.ttl_seconds)
+        pipe.set(self._key('job', record["id"]), json.dumps(record), ex=self.ttl_seconds)
+        pipe.lpush(self._key('pending'), record["id"])
+        pipe.execute()
+
+    def get(self, job_id):
+        data = self.client.get(self._key('job', job_id))
+        return json.loads(data) if data is not None else None
+
+    def save(self, record):
+        self.client.set(self._key('job', record["id"]), json.dumps(record), ex=self.ttl_seconds)
+
+    def load_payload(self, job_id):
+        return self.client.get(self._key('payload', job_id))
+
+    def claim(self, timeout):
+        job_id = self.client.brpoplpush(self._key('pending'), self._key('processing'), timeout=max(1, int(timeout)))
+        if job_id is None:
+            return None
+        job_id = job_id.decode()
+        self.client.set(self._key('lease', job_id), os.getpid(), ex=max(1, int(self.lease_seconds)))
+        return job_id
+
+    def renew(self, job_id):
+        self.client.set(self._key('lease', job_id), os.getpid(), ex=max(1, int(self.lease_seconds)))
+
+    def release(self, job_id, requeue=False):
+        """Melepas job dari list processing; True jika pemanggil yang melepasnya (LREM atomik)."""
+        if not self.client.lrem(self._key('processing'), 1, job_id):
+            return False
+        pipe = self.client.pipeline()
+        pipe.delete(self._key('lease', job_id))
+        if requeue:
+            pipe.rpush(self._key('pending'), job_id)
+        else:
+            pipe.delete(self._key('payload', job_id))
+        pipe.execute()
+        return True
+
+    def expired_leases(self):
+        expired = []
+        for raw in self.client.lrange(self._key('processing'), 0, -1):
+            job_id = raw.decode()
+            if self.client.exists(self._key('lease', job_id)):
+                continue
+            record = self.get(job_id)
+            # Lease dipasang sesaat setelah BRPOPLPUSH; beri tenggang untuk job yang baru diklaim.
+            if record is not None and time.time() - (record.get("claimedAt") or 0) < self.lease_seconds:
+                continue
+            expired.append(job_id)
+        return expired
+
+    def depth(self):
+        return self.client.llen(self._key('pending'))
+
+
+class JobQueue:
+    """
+    Antrean job asinkron satu layanan. `handler(payload, params)` menjalankan inferensi
+    dan mengembalikan hasil JSON; exception dari handler menandai job gagal (tanpa
+    retry), sedangkan worker yang mati ditangani lewat lease yang kedaluwarsa.
+    """
+
+    def __init__(self, name, backend, metrics=None, workers=1, max_attempts=3,
+                 callback_hosts=(), callback_timeout=5.0):
+        self.name = name
+        self.backend = backend
+        self.handler = None
+        self.workers = int(workers)
+        self.max_attempts = int(max_attempts)
+        self.callback_hosts = {host.strip().lower() for host in callback_hosts if host.strip()}
+        self.callback_timeout = float(callback_timeout)
+        registry = getattr(metrics, 'registry', None) or REGISTRY
+        self._metrics = _job_metrics(registry)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = []
+        self._running = set()
+
+    @classmethod
+    def from_env(cls, name, metrics=None):
+        """Membuat antrean dari environment variable JOB_*."""
+        backend_name = os.environ.get('JOB_BACKEND', 'local').lower()
+        ttl_seconds = int(os.environ.get('JOB_TTL_SECONDS', 3600))
+        lease_seconds = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+        if backend_name == 'redis':
+            url = os.environ.get('JOB_REDIS_URL', 'redis://localhost:6379/2')
+            backend = RedisJobBackend(url, ttl_seconds, lease_seconds, prefix=f"jobs:{name}")
+        else:
+            if backend_name != 'local':
+                logger.warning(f"Unknown JOB_BACKEND '{backend_name}', using in-process job queue.")
+            backend = LocalJobBackend(ttl_seconds, lease_seconds)
+
+        callback_hosts = os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',')
+        queue = cls(
+            name, backend, metrics,
+            workers=int(os.environ.get('JOB_WORKERS', 1)),
+            max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 3)),
+            callback_hosts=callback_hosts,
+        )
+        logger.info(
+            f"Job queue '{name}' configured (backend={type(backend).__name__}, workers={queue.workers}, "
+            f"ttl={ttl_seconds}s, lease={lease_seconds:.0f}s, max_attempts={queue.max_attempts})."
+        )
+        return queue
+
+    def set_handler(self, handler):
+        self.handler = handler
+
+    def validate_callback(self, callback_url):
+        """Memastikan callback_url memakai http(s) dan host yang diizinkan."""
+        if not callback_url:
+            return None
+        parsed = urlparse(callback_url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise BadRequest("Invalid callback_url: must be an absolute http(s) URL.")
+        if parsed.hostname.lower() not in self.callback_hosts:
+            raise BadRequest(f"callback_url host '{parsed.hostname}' is not allowed.")
+        return callback_url
+
+    def submit(self, payload, params=None, callback_url=None):
+        """Memasukkan job ke antrean dan mengembalikan record-nya."""
+        record = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "params": params or {},
+            "callbackUrl": self.validate_callback(callback_url),
+            "attempts": 0,
+            "submittedAt": time.time(),
+            "claimedAt": None,
+            "startedAt": None,
+            "finishedAt": None,
+            "result": None,
+            "error": None,
+        }
+        self.backend.create(record, payload)
+        self._metrics['events'].labels(queue=self.name, event='submitted').inc()
+        logger.info(f"Job {record['id']} submitted to [{self.name}] ({len(payload)} bytes).")
+        return record
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def wait(self, job_id, timeout):
+        """Long-poll: menunggu sampai job selesai atau `timeout` habis; None jika job tidak ada."""
+        deadline = time.monotonic() + timeout
+        record = self.get(job_id)
+        while record is not None and record["status"] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(min(0.25, max(0.0, deadline - time.monotonic())))
+            record = self.get(job_id)
+        return record
+
+    def ensure_started(self):
+        """Memulai worker thread dan thread pemeliharaan lease di proses ini (lazy, aman setelah fork)."""
+        if self.handler is None or self.workers < 1:
+            return
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._running = set()
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"job-worker-{self.name}-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(
+                threading.Thread(target=self._maintenance_loop, name=f"job-lease-{self.name}", daemon=True)
+            )
+            for thread in self._threads:
+                thread.start()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                self.run_once(timeout=5.0)
+            except Exception as e:
+                logger.error(f"Job worker for [{self.name}] failed: {e}", exc_info=True)
+                time.sleep(1.0)
+
+    def _maintenance_loop(self):
+        interval = max(1.0, self.backend.lease_seconds / 3)
+        while True:
+            time.sleep(interval)
+            try:
+                for job_id in list(self._running):
+                    self.backend.renew(job_id)
+                self.reap()
+            except Exception as e:
+                logger.warning(f"Job lease maintenance for [{self.name}] failed: {e}")
+
+    def reap(self):
+        """Mengembalikan job yang lease-nya kedaluwarsa (worker mati) ke antrean, atau menandainya gagal."""
+        for job_id in self.backend.expired_leases():
+            record = self.get(job_id)
+            retry = record is not None and record["attempts"] < self.max_attempts
+            if not self.backend.release(job_id, requeue=retry):
+                continue
+            if record is None:
+                self._metrics['events'].labels(queue=self.name, event='expired').inc()
+                continue
+            if retry:
+                record["status"] = "queued"
+                self.backend.save(record)
+                self._metrics['events'].labels(queue=self.name, event='retried').inc()
+                logger.warning(f"Job {job_id} lease expired (attempt {record['attempts']}); requeued.")
+            else:
+                self._finish(record, "failed", error=f"Job abandoned after {record['attempts']} attempt(s).")
+
+    def run_once(self, timeout=0.0):
+        """Mengambil dan memproses satu job; False jika antrean kosong."""
+        job_id = self.backend.claim(timeout)
+        if job_id is None:
+            return False
+
+        record = self.get(job_id)
+        payload = self.backend.load_payload(job_id)
+        if record is None or payload is None:
+            self.backend.release(job_id)
+            self._metrics['events'].labels(queue=self.name, event='expired').inc()
+            logger.warning(f"Job {job_id} expired before it could be processed.")
+            return True
+
+        self._running.add(job_id)
+        try:
+            now = time.time()
+            record.update(status="running", attempts=record["attempts"] + 1, claimedAt=now, startedAt=now)
+            self.backend.save(record)
+            self._metrics['queue_seconds'].labels(queue=self.name).observe(now - record["submittedAt"])
+
+            try:
+                result = self.handler(payload, record["params"])
+            except HTTPException as e:
+                self._finish(record, "failed", error=e.description)
+            except Exception as e:
+                logger.error(f"Job {job_id} in [{self.name}] failed: {e}", exc_info=True)
+                self._finish(record, "failed", error=str(e))
+            else:
+                self._finish(record, "succeeded", result=result)
+        finally:
+            self._running.discard(job_id)
+            del payload
+        return True
+
+    def _finish(self, record, status, result=None, error=None):
+        record.update(status=status, result=result, error=error, finishedAt=time.time())
+        self.backend.save(record)
+        self.backend.release(record["id"])
+        self._metrics['events'].labels(queue=self.name, event=status).inc()
+        if record["startedAt"]:
+            self._metrics['run_seconds'].labels(queue=self.name, status=status).observe(
+                record["finishedAt"] - record["startedAt"]
+            )
+        logger.info(f"Job {record['id']} in [{self.name}] {status} after {record['attempts']} attempt(s).")
+        if record.get("callbackUrl"):
+            self._notify(record)
+
+    def _notify(self, record):
+        body = json.dumps(job_view(record), ensure_ascii=False).encode('utf-8')
+        req = urllib.request.Request(
+            record["callbackUrl"], data=body, method='POST', headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.callback_timeout):
+                pass
+            self._metrics['callbacks'].labels(queue=self.name, outcome='delivered').inc()
+        except Exception as e:
+            self._metrics['callbacks'].labels(queue=self.name, outcome='failed').inc()
+            logger.warning(f"Callback for job {record['id']} failed: {e}")
+
+
+def job_view(record):
+    """Representasi publik sebuah job (tanpa parameter internal dan callback URL)."""
+    view = {
+        "jobId": record["id"],
+        "status": record["status"],
+        "attempts": record["attempts"],
+        "submittedAt": record["submittedAt"],
+        "startedAt": record["startedAt"],
+        "finishedAt": record["finishedAt"],
+    }
+    if record["startedAt"]:
+        view["queueSeconds"] = round(record["startedAt"] - record["submittedAt"], 3)
+    if record["finishedAt"] and record["startedAt"]:
+        view["runSeconds"] = round(record["finishedAt"] - record["startedAt"], 3)
+    if record["status"] == "succeeded":
+        view["result"] = record["result"]
+    elif record["status"] == "failed":
+        view["error"] = record["error"]
+    return view
+
+
+def wants_async():
+    """True jika request meminta mode asinkron (`?async=true` atau `Prefer: respond-async`)."""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    prefer = request.headers.get('Prefer', '')
+    return any(token.strip().lower() == 'respond-async' for token in prefer.split(','))
+
+
+def accepted_response(record):
+    """Respons 202 untuk job yang baru dimasukkan ke antrean."""
+    status_url = url_for('job_status', job_id=record["id"])
+    response = jsonify({"jobId": record["id"], "status": record["status"], "statusUrl": status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+
+def register_job_routes(app, jobs):
+    """
+    Mendaftarkan `GET /jobs/<job_id>` (dengan `?wait=<detik>` untuk long-poll, maks.
+    JOB_MAX_WAIT_SECONDS) dan memulai worker job secara lazy di setiap proses.
+    """
+    max_wait = float(os.environ.get('JOB_MAX_WAIT_SECONDS', 30))
+
+    @app.before_request
+    def start_job_workers():
+        jobs.ensure_started()
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        try:
+            wait = min(max_wait, max(0.0, float(request.args.get('wait', 0))))
+        except ValueError:
+            raise BadRequest("Invalid 'wait' parameter. Must be a number of seconds.")
+        record = jobs.wait(job_id, wait) if wait else jobs.get(job_id)
+        if record is None:
+            raise NotFound(f"Job '{job_id}' not found or expired.")
+        return negotiated_response(job_view(record))
+
+    app.extensions['job_queue'] = jobs
@@ -0,0 +1,418 @@
+"""
+Registry beberapa varian model (mis. yolov8n/yolov8s, whisper tiny/base/small) dalam satu
+proses layanan.
+
+- Varian dipilih per request (field `model`) atau lewat aturan routing (rute -> varian),
+  selain itu memakai varian default.
+- Model dimuat secara lazy saat pertama dipakai. Varian default dimuat saat startup dan
+  tidak pernah dikeluarkan (self-test dan request tanpa pilihan selalu memakainya).
+- Jika total memori model yang resident melebihi anggaran, varian yang paling lama tidak
+  dipakai (dan sedang tidak dipakai request mana pun) dikeluarkan.
+- `swap()` mengganti versi satu varian secara atomik: request yang sedang berjalan tetap
+  memakai instance lama sampai selesai, request baru langsung memakai instance baru, dan
+  instance lama dilepas setelah referensi terakhirnya dikembalikan.
+
+Ukuran model diukur dari kenaikan RSS proses selama pemuatan (pemuatan diserialkan),
+sehingga anggaran bersifat perkiraan. Dengan gunicorn --preload, varian default dimuat di
+master sebelum fork; varian lain dimuat per worker, jadi anggaran berlaku per proses.
+
+Konfigurasi env dengan prefix layanan (mis. YOLO, WHISPER):
+    <PREFIX>_MODELS                  daftar varian "nama=spec,..." (atau "spec,..." bila nama = spec)
+    <PREFIX>_DEFAULT_MODEL           nama varian default
+    <PREFIX>_MODEL_MEMORY_BUDGET_MB  anggaran memori model resident (0 = tanpa batas)
+    <PREFIX>_MODEL_ROUTES            aturan routing "rute=varian,..."
+"""
+import gc
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from werkzeug.exceptions import BadRequest
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+
+def _registry_metrics(registry):
+    """Membuat (sekali per registry Prometheus) metrik untuk semua ModelRegistry."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'requests': Counter(
+                    'model_registry_requests_total', 'Pemakaian varian model menurut hit (resident) atau miss (dimuat)',
+                    ['registry', 'variant', 'result'], registry=registry
+                ),
+                'loads': Counter(
+                    'model_registry_loads_total', 'Jumlah pemuatan varian model menurut hasil (ok, error)',
+                    ['registry', 'variant', 'outcome'], registry=registry
+                ),
+                'load_seconds': Histogram(
+                    'model_registry_load_seconds', 'Durasi pemuatan varian model',
+                    ['registry', 'variant'], registry=registry,
+                    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+                ),
+                'evictions': Counter(
+                    'model_registry_evictions_total', 'Jumlah varian model yang dilepas (budget, swap)',
+                    ['registry', 'variant', 'reason'], registry=registry
+                ),
+                'inference_seconds': Histogram(
+                    'model_registry_inference_seconds', 'Durasi pemakaian satu varian model per inferensi',
+                    ['registry', 'variant'], registry=registry,
+                    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+                ),
+                'resident_bytes': Gauge(
+                    'model_registry_resident_bytes', 'Perkiraan memori varian model yang sedang resident',
+                    ['registry', 'variant'], registry=registry
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+def _rss_bytes():
+    """RSS proses saat ini (Linux /proc); 0 jika tidak tersedia."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _parse_pairs(value):
+    """'a=x,b=y' -> {'a': 'x', 'b': 'y'}; item tanpa '=' dipakai sebagai nama sekaligus nilai."""
+    pairs = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            name, _, spec = item.partition('=')
+            pairs[name.strip()] = spec.strip() or name.strip()
+    return pairs
+
+
+class _Entry:
+    """Satu instance model yang sedang resident."""
+
+    __slots__ = ('variant', 'spec', 'model', 'size_bytes', 'refs', 'last_used', 'retired')
+
+    def __init__(self, variant, spec, model, size_bytes):
+        self.variant = variant
+        self.spec = spec
+        self.model = model
+        self.size_bytes = size_bytes
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class _BoundModel:
+    """Proxy satu varian: setiap pemanggilan metode meminjam instance yang berlaku saat itu."""
+
+    def __init__(self, registry, variant):
+        self._registry = registry
+        self._variant = variant
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            with self._registry.acquire(self._variant) as loaded:
+                return getattr(loaded, name)(*args, **kwargs)
+        return call
+
+    def __call__(self, *args, **kwargs):
+        with self._registry.acquire(self._variant) as loaded:
+            return loaded(*args, **kwargs)
+
+
+class ModelRegistry:
+    """
+    Kumpulan varian model dengan pemuatan lazy, eviction LRU berbasis anggaran memori,
+    dan hot-swap versi (lihat docstring modul). Thread-safe.
+
+    `loader(variant, spec)` memuat dan mengembalikan model (raise jika gagal); `unloader(model)`
+    opsional dipanggil saat model dilepas.
+    """
+
+    def __init__(self, name, loader, variants, default=None, memory_budget_bytes=0, routes=None,
+                 unloader=None, registry=None):
+        if not variants:
+            raise ValueError(f"Model registry '{name}' needs at least one variant.")
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.variants = dict(variants)
+        self.default = default or next(iter(self.variants))
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.routes = dict(routes or {})
+        for variant in [self.default, *self.routes.values()]:
+            if variant not in self.variants:
+                raise ValueError(
+                    f"Unknown model variant '{variant}' for registry '{name}'. Known: {', '.join(self.variants)}."
+                )
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Pemuatan diserialkan: kenaikan RSS dapat diatribusikan ke satu model, dan varian
+        # yang sama tidak dimuat dua kali oleh request yang datang bersamaan.
+        self._load_lock = threading.Lock()
+        self._metrics = _registry_metrics(registry or REGISTRY)
+
+    @classmethod
+    def from_env(cls, name, loader, prefix, default_spec, metrics=None, unloader=None):
+        """
+        Registry dari env <prefix>_MODELS, <prefix>_DEFAULT_MODEL, <prefix>_MODEL_MEMORY_BUDGET_MB
+        dan <prefix>_MODEL_ROUTES. Tanpa <prefix>_MODELS, satu-satunya varian adalah `default_spec`
+        dengan nama tanpa ekstensi (mis. 'yolov8n.pt' -> 'yolov8n').
+        """
+        variants = _parse_pairs(os.environ.get(f'{prefix}_MODELS'))
+        if not variants:
+            variants = {os.path.splitext(os.path.basename(default_spec))[0]: default_spec}
+        default = os.environ.get(f'{prefix}_DEFAULT_MODEL') or next(
+            (variant for variant, spec in variants.items() if spec == default_spec), None
+        )
+        return cls(
+            name, loader, variants, default=default,
+            memory_budget_bytes=float(os.environ.get(f'{prefix}_MODEL_MEMORY_BUDGET_MB', 0)) * 1024 * 1024,
+            routes=_parse_pairs(os.environ.get(f'{prefix}_MODEL_ROUTES')),
+            unloader=unloader, registry=metrics.registry if metrics is not None else None,
+        )
+
+    def select(self, requested=None, route=None):
+        """
+        Varian untuk satu request: pilihan eksplisit, lalu aturan routing `route`, lalu default.
+        Raises:
+            BadRequest: Jika varian yang diminta tidak dikonfigurasi.
+        """
+        if requested:
+            if requested not in self.variants:
+                raise BadRequest(f"Unknown model '{requested}'. Available models: {', '.join(self.variants)}.")
+            return requested
+        return self.routes.get(route) or self.default
+
+    def spec(self, variant):
+        """Spec (versi) varian yang sedang berlaku, mis. untuk kunci cache hasil."""
+        return self.variants[variant]
+
+    def load(self, variant=None):
+        """Memastikan varian resident (dimuat jika perlu) dan mengembalikan modelnya."""
+        entry = self._checkout(variant or self.default)
+        self._release(entry)
+        return entry.model
+
+    @contextmanager
+    def acquire(self, variant=None):
+        """
+        Meminjam model satu varian selama blok `with`. Selama dipinjam, instance tersebut
+        tidak dikeluarkan oleh eviction maupun swap.
+        """
+        variant = variant or self.default
+        entry = self._checkout(variant)
+        started = time.monotonic()
+        try:
+            yield entry.model
+        finally:
+            self._metrics['inference_seconds'].labels(registry=self.name, variant=variant).observe(
+                time.monotonic() - started
+            )
+            self._release(entry)
+
+    def bound(self, variant=None):
+        """
+        Proxy varian (None = default) yang dapat disimpan sebagai pengganti model: tidak
+        menahan instance tertentu, sehingga hot-swap dan eviction tetap berlaku.
+        """
+        return _BoundModel(self, variant or self.default)
+
+    def swap(self, variant, spec=None):
+        """
+        Mengganti versi varian dengan `spec` (default: spec saat ini, yaitu muat ulang).
+        Jika varian sedang resident, versi baru dimuat lebih dulu lalu dipasang secara atomik;
+        jika belum, hanya spec-nya yang diganti dan pemuatan tetap lazy. Varian baru boleh
+        ditambahkan dengan cara ini.
+        """
+        spec = spec or self.variants.get(variant)
+        if not spec:
+            raise ValueError(f"Model variant '{variant}' is not configured; a spec is required to add it.")
+        with self._load_lock:
+            with self._lock:
+                resident = variant in self._entries
+                if not resident:
+                    self.variants[variant] = spec
+            if not resident:
+                logger.info(f"Model registry '{self.name}': variant '{variant}' now points to '{spec}' (lazy).")
+                return
+            entry = self._load_entry(variant, spec)
+            with self._lock:
+                old = self._entries.get(variant)
+                self.variants[variant] = spec
+                self._entries[variant] = entry
+                victims = []
+                if old is not None:
+                    old.retired = True
+                    if old.refs == 0:
+                        victims.append((old, 'swap'))
+                victims += self._evict_locked()
+        logger.info(f"Model registry '{self.name}': variant '{variant}' hot-swapped to '{spec}'.")
+        self._unload(victims)
+
+    def status(self):
+        """Ringkasan varian untuk endpoint admin: spec, resident, ukuran, dan pemakaian."""
+        with self._lock:
+            return {
+                "default": self.default,
+                "memoryBudgetBytes": self.memory_budget_bytes,
+                "residentBytes": sum(entry.size_bytes for entry in self._entries.values()),
+                "routes": dict(self.routes),
+                "variants": {
+                    variant: {
+                        "spec": spec,
+                        "resident": variant in self._entries,
+                        "sizeBytes": self._entries[variant].size_bytes if variant in self._entries else 0,
+                        "inUse": self._entries[variant].refs if variant in self._entries else 0,
+                    }
+                    for variant, spec in self.variants.items()
+                },
+            }
+
+    def _checkout(self, variant):
+        if variant not in self.variants:
+            raise BadRequest(f"Unknown model '{variant}'. Available models: {', '.join(self.variants)}.")
+        with self._lock:
+            entry = self._take_locked(variant)
+        if entry is not None:
+            self._metrics['requests'].labels(registry=self.name, variant=variant, result='hit').inc()
+            return entry
+
+        with self._load_lock:
+            with self._lock:
+                entry = self._take_locked(variant)
+            if entry is None:
+                entry = self._load_entry(variant, self.variants[variant])
+                with self._lock:
+                    self._entries[variant] = entry
+                    entry.refs += 1
+                    victims = self._evict_locked()
+                self._unload(victims)
+        self._metrics['requests'].labels(registry=self.name, variant=variant, result='miss').inc()
+        return entry
+
+    def _take_locked(self, variant):
+        entry = self._entries.get(variant)
+        if entry is not None:
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            if entry.retired:
+                victims = [(entry, 'swap')] if entry.refs == 0 else []
+            else:
+                # Eviction yang tertunda karena semua kandidat sedang dipakai saat pemuatan.
+                victims = self._evict_locked()
+        self._unload(victims)
+
+    def _load_entry(self, variant, spec):
+        logger.info(f"Model registry '{self.name}': loading variant '{variant}' ({spec})...")
+        rss_before = _rss_bytes()
+        started = time.monotonic()
+        try:
+            model = self.loader(variant, spec)
+        except Exception:
+            self._metrics['loads'].labels(registry=self.name, variant=variant, outcome='error').inc()
+            raise
+        elapsed = time.monotonic() - started
+        size = max(0, _rss_bytes() - rss_before)
+        self._metrics['loads'].labels(registry=self.name, variant=variant, outcome='ok').inc()
+        self._metrics['load_seconds'].labels(registry=self.name, variant=variant).observe(elapsed)
+        self._metrics['resident_bytes'].labels(registry=self.name, variant=variant).set(size)
+        logger.info(
+            f"Model registry '{self.name}': variant '{variant}' loaded in {elapsed:.2f}s (~{size / 2**20:.0f} MiB)."
+        )
+        return _Entry(variant, spec, model, size)
+
+    def _evict_locked(self):
+        """Mengeluarkan varian LRU yang tidak sedang dipakai sampai total memori <= anggaran."""
+        if self.memory_budget_bytes <= 0:
+            return []
+        victims = []
+        resident = sum(entry.size_bytes for entry in self._entries.values())
+        while resident > self.memory_budget_bytes:
+            candidates = [
+                entry for entry in self._entries.values() if entry.refs == 0 and entry.variant != self.default
+            ]
+            if not candidates:
+                logger.warning(
+                    f"Model registry '{self.name}' is over its memory budget "
+                    f"({resident / 2**20:.0f} > {self.memory_budget_bytes / 2**20:.0f} MiB) but every model is in use."
+                )
+                break
+            victim = min(candidates, key=lambda entry: entry.last_used)
+            del self._entries[victim.variant]
+            resident -= victim.size_bytes
+            victims.append((victim, 'budget'))
+        return victims
+
+    def _unload(self, victims):
+        for entry, reason in victims:
+            logger.info(f"Model registry '{self.name}': unloading variant '{entry.variant}' ({entry.spec}, {reason}).")
+            self._metrics['evictions'].labels(registry=self.name, variant=entry.variant, reason=reason).inc()
+            with self._lock:
+                if self._entries.get(entry.variant) is None:
+                    self._metrics['resident_bytes'].labels(registry=self.name, variant=entry.variant).set(0)
+            if self.unloader is not None:
+                try:
+                    self.unloader(entry.model)
+                except Exception as e:
+                    logger.warning(f"Model registry '{self.name}': unloader failed for '{entry.variant}': {e}")
+            entry.model = None
+        if victims:
+            gc.collect()
+
+
+def register_model_routes(app, *registries):
+    """
+    Mendaftarkan `GET /models` (status semua registry) dan `POST /models/<registry>/<varian>`
+    (hot-swap; body JSON opsional {"spec": "..."}). Swap hanya aktif jika MODEL_ADMIN_TOKEN
+    di-set dan dikirim di header `X-Admin-Token`.
+
+    Swap hanya mengubah registry di proses yang menerima request; worker gunicorn lain tetap
+    memakai versi lama (dan kunci cache hasilnya berbeda). Karena itu swap ditolak (409) jika
+    GUNICORN_WORKERS > 1 (default 2, sama dengan Dockerfile); ganti versi lewat redeploy.
+    """
+    from flask import jsonify, request
+    from werkzeug.exceptions import Conflict, Forbidden, NotFound
+
+    by_name = {registry.name: registry for registry in registries}
+    admin_token = os.environ.get('MODEL_ADMIN_TOKEN')
+    workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+
+    @app.route('/models', methods=['GET'])
+    def model_status():
+        return jsonify({name: registry.status() for name, registry in by_name.items()})
+
+    @app.route('/models/<registry_name>/<variant>', methods=['POST'])
+    def model_swap(registry_name, variant):
+        token = request.headers.get('X-Admin-Token', '')
+        if not admin_token or not hmac.compare_digest(token.encode(), admin_token.encode()):
+            raise Forbidden("Model administration requires a valid X-Admin-Token.")
+        if workers > 1:
+            raise Conflict(
+                f"Hot-swap would only change one of {workers} workers. "
+                "Run with GUNICORN_WORKERS=1 or redeploy with the new model."
+            )
+        registry = by_name.get(registry_name)
+        if registry is None:
+            raise NotFound(f"Model registry '{registry_name}' not found.")
+        spec = (request.get_json(silent=True) or {}).get('spec')
+        try:
+            registry.swap(variant, spec)
+        except ValueError as e:
+            raise BadRequest(str(e))
+        return jsonify(registry.status())
+
+    app.extensions['model_registries'] = by_name
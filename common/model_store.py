@@ -0,0 +1,255 @@
+"""
+Penyimpanan artefak model lokal (bobot YOLO, checkpoint Whisper, ...) dengan manifest
+ber-checksum.
+
+Artefak disimpan di MODEL_STORE_DIR sebagai `<sumber>/<nama file atau direktori>` dan
+dicatat di `manifest.json` (path relatif, ukuran, SHA-256). Saat layanan memuat model,
+artefak diambil dari store dan diverifikasi; hanya jika belum ada (dan
+MODEL_STORE_OFFLINE tidak aktif) artefak diunduh lewat fetcher sumbernya lalu dicatat.
+Di node air-gapped, store diisi saat build image (pre-bake) dan unduhan dimatikan.
+
+Pre-bake (mis. dari Dockerfile.python-service):
+    python -m common.model_store fetch ultralytics:yolov8n.pt openai-whisper:base
+    python -m common.model_store verify
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'temandifa-models')
+MANIFEST_NAME = 'manifest.json'
+VERIFY_MODES = ('sha256', 'size', 'none')
+
+
+class ModelArtifactError(RuntimeError):
+    """Artefak model tidak tersedia di store atau checksum-nya tidak cocok."""
+
+
+def _fetch_ultralytics(name, directory):
+    from ultralytics.utils.downloads import attempt_download_asset
+
+    return str(attempt_download_asset(os.path.join(directory, name)))
+
+
+def _fetch_openai_whisper(name, directory):
+    import whisper
+
+    if name not in whisper._MODELS:
+        raise ModelArtifactError(f"Unknown openai-whisper model '{name}'.")
+    # _download memverifikasi SHA-256 yang tertanam di URL checkpoint.
+    return whisper._download(whisper._MODELS[name], directory, False)
+
+
+def _fetch_faster_whisper(name, directory):
+    from faster_whisper import download_model
+
+    return download_model(name, output_dir=os.path.join(directory, name))
+
+
+# sumber -> fetch(nama, direktori staging) yang mengembalikan path file/direktori hasil unduhan.
+FETCHERS = {
+    'ultralytics': _fetch_ultralytics,
+    'openai-whisper': _fetch_openai_whisper,
+    'faster-whisper': _fetch_faster_whisper,
+}
+
+
+def artifact_digest(path):
+    """SHA-256 isi file; untuk direktori, hash dari (path relatif, hash file) setiap file secara berurutan."""
+    if os.path.isfile(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            full = os.path.join(root, filename)
+            digest.update(os.path.relpath(full, path).encode())
+            digest.update(artifact_digest(full).encode())
+    return digest.hexdigest()
+
+
+def artifact_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+class ModelStore:
+    """
+    Direktori artefak model dengan manifest. Penulisan manifest dan pengunduhan dilindungi
+    file lock, sehingga beberapa worker atau proses yang start bersamaan tidak mengunduh
+    artefak yang sama dua kali.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, offline=False, verify='sha256'):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Invalid verify mode '{verify}'. Use one of: {', '.join(VERIFY_MODES)}.")
+        self.root = root
+        self.offline = offline
+        self.verify = verify
+
+    @classmethod
+    def from_env(cls):
+        """Store dari env MODEL_STORE_DIR, MODEL_STORE_OFFLINE (true/false) dan MODEL_STORE_VERIFY."""
+        return cls(
+            root=os.environ.get('MODEL_STORE_DIR', DEFAULT_STORE_DIR),
+            offline=os.environ.get('MODEL_STORE_OFFLINE', 'false').lower() == 'true',
+            verify=os.environ.get('MODEL_STORE_VERIFY', 'sha256').lower(),
+        )
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f).get('artifacts', {})
+        except FileNotFoundError:
+            return {}
+
+    def _write_manifest(self, artifacts):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.manifest-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': 1, 'artifacts': artifacts}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.store.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def check(self, key, entry):
+        """Mengembalikan None jika artefak utuh, atau alasan kegagalan verifikasi."""
+        path = os.path.join(self.root, entry['path'])
+        if not os.path.exists(path):
+            return f"missing file {path}"
+        if self.verify == 'none':
+            return None
+        if artifact_size(path) != entry['size']:
+            return f"size mismatch for {path}"
+        if self.verify == 'sha256' and artifact_digest(path) != entry['sha256']:
+            return f"checksum mismatch for {path}"
+        return None
+
+    def resolve(self, source, name, fetch=None):
+        """
+        Path lokal artefak `name` dari `source` (kunci FETCHERS). Artefak yang sudah
+        tercatat diverifikasi; yang belum ada diunduh jika store tidak offline.
+        Raises:
+            ModelArtifactError: Jika artefak tidak ada/rusak dan tidak boleh atau gagal diunduh.
+        """
+        key = f"{source}/{name}"
+        entry = self.manifest().get(key)
+        if entry is not None:
+            problem = self.check(key, entry)
+            if problem is None:
+                return os.path.join(self.root, entry['path'])
+            logger.error(f"Model artifact '{key}' failed verification: {problem}")
+            if self.offline:
+                raise ModelArtifactError(f"Model artifact '{key}' failed verification: {problem}")
+
+        if self.offline:
+            raise ModelArtifactError(
+                f"Model artifact '{key}' is not in the store at {self.root} and MODEL_STORE_OFFLINE is enabled."
+            )
+        fetch = fetch or FETCHERS.get(source)
+        if fetch is None:
+            raise ModelArtifactError(f"No fetcher for model source '{source}'. Known: {', '.join(FETCHERS)}.")
+
+        with self._locked():
+            # Proses lain mungkin sudah mengunduhnya selagi kita menunggu lock.
+            entry = self.manifest().get(key)
+            if entry is not None and self.check(key, entry) is None:
+                return os.path.join(self.root, entry['path'])
+            staging = os.path.abspath(tempfile.mkdtemp(dir=self.root, prefix='.staging-'))
+            try:
+                logger.info(f"Fetching model artifact '{key}' into {self.root}")
+                started = time.monotonic()
+                fetched = fetch(name, staging)
+                if os.path.commonpath([os.path.abspath(fetched), staging]) != staging:
+                    # Fetcher memakai cache miliknya sendiri (mis. direktori weights ultralytics): salin, jangan pindahkan.
+                    copy = shutil.copytree if os.path.isdir(fetched) else shutil.copy2
+                    fetched = copy(fetched, os.path.join(staging, os.path.basename(os.path.normpath(fetched))))
+                path = self._add_locked(key, source, fetched)
+                logger.info(f"Model artifact '{key}' stored at {path} in {time.monotonic() - started:.1f}s")
+                return path
+            except ModelArtifactError:
+                raise
+            except Exception as e:
+                raise ModelArtifactError(f"Failed to fetch model artifact '{key}': {e}") from e
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def add(self, source, name, path):
+        """Memasukkan file/direktori yang sudah ada ke store (dipindah) dan mencatatnya di manifest."""
+        with self._locked():
+            return self._add_locked(f"{source}/{name}", source, path)
+
+    def _add_locked(self, key, source, path):
+        target = os.path.join(self.root, source, os.path.basename(os.path.normpath(path)))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.abspath(path) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            shutil.move(path, target)
+        artifacts = self.manifest()
+        artifacts[key] = {
+            'path': os.path.relpath(target, self.root),
+            'size': artifact_size(target),
+            'sha256': artifact_digest(target),
+            'addedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        self._write_manifest(artifacts)
+        return target
+
+    def verify_all(self):
+        """Memverifikasi seluruh artefak di manifest; mengembalikan {kunci: alasan} untuk yang gagal."""
+        return {key: problem for key, entry in self.manifest().items() if (problem := self.check(key, entry))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mengisi dan memverifikasi model artifact store.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fetch = sub.add_parser('fetch', help="Mengunduh artefak ke store (pre-bake saat build image)")
+    fetch.add_argument('artifacts', nargs='+', metavar='SOURCE:NAME', help=f"Sumber: {', '.join(FETCHERS)}")
+    sub.add_parser('verify', help="Memeriksa ukuran dan checksum semua artefak di manifest")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    store = ModelStore.from_env()
+    store.verify = 'sha256'
+    if args.command == 'fetch':
+        store.offline = False
+        for artifact in args.artifacts:
+            source, _, name = artifact.partition(':')
+            if not name:
+                parser.error(f"Invalid artifact '{artifact}', expected SOURCE:NAME.")
+            print(store.resolve(source, name))
+        return 0
+
+    failures = store.verify_all()
+    for key, problem in failures.items():
+        print(f"FAILED {key}: {problem}")
+    print(f"{len(store.manifest())} artifact(s) checked, {len(failures)} failure(s).")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
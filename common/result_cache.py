@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+
+def _cache_metrics(registry):
+    """Membuat (sekali per registry) counter dan gauge untuk semua instance cache."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'hits': Counter(
+                    'result_cache_hits_total', 'Jumlah cache hit hasil inferensi',
+                    ['cache', 'tier'], registry=registry
+                ),
+                'misses': Counter(
+                    'result_cache_misses_total', 'Jumlah cache miss hasil inferensi',
+                    ['cache'], registry=registry
+                ),
+                'evictions': Counter(
+                    'result_cache_evictions_total', 'Jumlah entri cache lokal yang dikeluarkan',
+                    ['cache', 'reason'], registry=registry
+                ),
+                'bytes': Gauge(
+                    'result_cache_local_bytes', 'Perkiraan ukuran cache lokal dalam byte',
+                    ['cache'], registry=registry
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class LocalLRUCache:
+    """Cache LRU in-process dengan batas total byte dan TTL per entri. Thread-safe."""
+
+    def __init__(self, max_bytes, ttl_seconds, on_evict=None):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, 'ttl')
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key, 'size')
+
+    def _remove(self, key, reason):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        if reason and self.on_evict:
+            self.on_evict(reason)
+
+
+class FileCacheBackend:
+    """Tier bersama berbasis file lokal; dapat dipakai bersama oleh semua worker gunicorn dalam satu container."""
+
+    def __init__(self, directory, ttl_seconds):
+        self.directory = directory
+        self.ttl_seconds = float(ttl_seconds)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.unlink(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class RedisCacheBackend:
+    """Tier bersama berbasis Redis; dipakai bersama oleh semua worker dan replika."""
+
+    def __init__(self, url, ttl_seconds, prefix='result-cache'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(f"{self.prefix}:{key}")
+
+    def set(self, key, data):
+        self.client.set(f"{self.prefix}:{key}", data, ex=self.ttl_seconds)
+
+
+class ResultCache:
+    """
+    Cache hasil inferensi yang dialamatkan berdasarkan konten (hash payload +
+    model + parameter). Tier pertama adalah LRU in-process; tier kedua (opsional)
+    adalah penyimpanan bersama (file lokal atau Redis). Kegagalan tier bersama
+    hanya dicatat sebagai warning dan tidak pernah menggagalkan request.
+
+    Nilai yang dikembalikan `get` dapat dibagi antar request, jadi jangan diubah.
+    """
+
+    def __init__(self, name, metrics=None, max_bytes=64 * 1024 * 1024, ttl_seconds=600, shared=None, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.shared = shared
+        registry = getattr(metrics, 'registry', None) or REGISTRY
+        self._metrics = _cache_metrics(registry)
+        self.local = LocalLRUCache(max_bytes, ttl_seconds, on_evict=self._on_evict)
+
+    @classmethod
+    def from_env(cls, name, metrics=None):
+        """Membuat cache dari environment variable RESULT_CACHE_*."""
+        enabled = os.environ.get('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+        max_bytes = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        ttl_seconds = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 600))
+        backend = os.environ.get('RESULT_CACHE_BACKEND', 'none').lower()
+
+        shared = None
+        if enabled and backend != 'none':
+            try:
+                if backend == 'redis':
+                    url = os.environ.get('RESULT_CACHE_REDIS_URL', 'redis://localhost:6379/1')
+                    shared = RedisCacheBackend(url, ttl_seconds, prefix=f"result-cache:{name}")
+                elif backend == 'file':
+                    directory = os.environ.get('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'result-cache', name))
+                    shared = FileCacheBackend(directory, ttl_seconds)
+                else:
+                    logger.warning(f"Unknown RESULT_CACHE_BACKEND '{backend}', shared cache tier disabled.")
+            except ImportError as e:
+                logger.warning(f"Shared cache backend '{backend}' unavailable (missing dependency: {e}).")
+            except Exception as e:
+                logger.warning(f"Failed to initialize shared cache backend '{backend}': {e}", exc_info=True)
+
+        logger.info(
+            f"Result cache '{name}' configured (enabled={enabled}, max_bytes={max_bytes}, "
+            f"ttl={ttl_seconds}s, shared={type(shared).__name__ if shared else 'none'})."
+        )
+        return cls(name, metrics, max_bytes=max_bytes, ttl_seconds=ttl_seconds, shared=shared, enabled=enabled)
+
+    @staticmethod
+    def make_key(payload, model, version=None, params=None):
+        """Kunci cache: SHA-256 dari payload, nama/versi model, dan parameter inferensi."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(
+            {'model': model, 'version': version, 'params': params or {}},
+            sort_keys=True, default=str
+        ).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(payload)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Mengembalikan hasil tersimpan atau None jika tidak ada."""
+        if not self.enabled:
+            return None
+
+        value = self.local.get(key)
+        if value is not None:
+            self._metrics['hits'].labels(cache=self.name, tier='local').inc()
+            return value
+
+        if self.shared is not None:
+            try:
+                data = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared cache read failed for '{self.name}': {e}")
+                data = None
+            if data is not None:
+                value = json.loads(data)
+                self.local.set(key, value, len(data))
+                self._update_size_gauge()
+                self._metrics['hits'].labels(cache=self.name, tier='shared').inc()
+                return value
+
+        self._metrics['misses'].labels(cache=self.name).inc()
+        return None
+
+    def set(self, key, value):
+        """Menyimpan hasil (harus dapat diserialisasi ke JSON) ke semua tier."""
+        if not self.enabled:
+            return
+
+        data = _encode(value)
+        self.local.set(key, value, len(data))
+        self._update_size_gauge()
+
+        if self.shared is not None:
+            try:
+                self.shared.set(key, data)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for '{self.name}': {e}")
+
+    def _on_evict(self, reason):
+        self._metrics['evictions'].labels(cache=self.name, reason=reason).inc()
+        self._update_size_gauge()
+
+    def _update_size_gauge(self):
+        self._metrics['bytes'].labels(cache=self.name).set(self.local.current_bytes)
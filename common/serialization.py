@@ -0,0 +1,124 @@
+"""
+Serialisasi respons dan negosiasi konten (header Accept) untuk layanan Python.
+
+- application/json (default): dibuat dengan orjson jika terpasang; provider dipasang
+  di aplikasi Flask sehingga `jsonify` dan `request.get_json` ikut memakainya.
+- application/msgpack: MessagePack. Hasil deteksi dikirim dalam bentuk kolomnar ringkas:
+  satu tabel nama kelas, lalu array paralel id kelas, confidence dan bbox yang
+  dikuantisasi ke integer (lihat `columnar_detections`).
+"""
+import logging
+
+from flask import current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+COLUMNAR_FORMAT = 'columnar-v1'
+# confidence 0..1 -> 0..1000, bbox ternormalisasi 0..1 -> 0..10000 (uint16 di MessagePack).
+CONFIDENCE_SCALE = 1000
+BBOX_SCALE = 10000
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider Flask berbasis orjson. Kunci tidak diurutkan (urutan penyisipan
+    dipertahankan) dan skalar/array numpy diserialisasi langsung.
+    """
+
+    sort_keys = False
+
+    def _options(self):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return option | orjson.OPT_SORT_KEYS if self.sort_keys else option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opsi khusus modul json (indent, separators, ...) tetap dilayani provider bawaan.
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """Memakai orjson untuk JSON aplikasi jika tersedia (fallback: modul json bawaan)."""
+    if orjson is None:
+        logger.info("orjson is not installed; using the standard json module for responses.")
+        return
+    app.json = OrjsonProvider(app)
+
+
+def wants_msgpack():
+    """True jika header Accept lebih memilih MessagePack daripada JSON (dan msgpack terpasang)."""
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+    return best in MSGPACK_MIMETYPES
+
+
+def negotiated_response(payload, compact=None):
+    """
+    Respons sesuai header Accept: JSON (default) atau MessagePack. `compact(payload)`
+    (opsional) membentuk isi versi MessagePack, misalnya bentuk kolomnar hasil deteksi.
+    """
+    if wants_msgpack():
+        body = msgpack.packb(compact(payload) if compact else payload, use_bin_type=True)
+        response = current_app.response_class(body, mimetype=MSGPACK_MIMETYPES[0])
+    else:
+        response = jsonify(payload)
+    response.vary.add('Accept')
+    return response
+
+
+def columnar_detections(detection_lists):
+    """
+    Mengubah beberapa daftar deteksi ({"class", "confidence", "bbox"}) menjadi
+    (tabel nama kelas bersama, list kolom per daftar). Setiap kolom berisi
+    "classId" (indeks ke tabel), "confidence" (x CONFIDENCE_SCALE) dan "bbox"
+    (datar [x, y, w, h, ...], x BBOX_SCALE), semuanya integer.
+    """
+    classes, class_ids, columns = [], {}, []
+    for detections in detection_lists:
+        ids, confidences, boxes = [], [], []
+        for detection in detections:
+            name = detection["class"]
+            if name not in class_ids:
+                class_ids[name] = len(classes)
+                classes.append(name)
+            ids.append(class_ids[name])
+            confidences.append(int(round(float(detection["confidence"]) * CONFIDENCE_SCALE)))
+            boxes.extend(int(round(float(value) * BBOX_SCALE)) for value in detection["bbox"])
+        columns.append({"classId": ids, "confidence": confidences, "bbox": boxes})
+    return classes, columns
+
+
+def columnar_header(classes):
+    """Field pembuka payload kolomnar (format dan skala kuantisasi)."""
+    return {
+        "format": COLUMNAR_FORMAT, "confidenceScale": CONFIDENCE_SCALE, "bboxScale": BBOX_SCALE,
+        "classes": classes,
+    }
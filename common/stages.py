@@ -0,0 +1,70 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import has_request_context, request
+from opentelemetry import trace
+from prometheus_client import REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+# Rentang dari operasi sub-milidetik (serialisasi) sampai transkripsi audio panjang.
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+def _stage_histogram(registry):
+    """Membuat (sekali per registry) histogram durasi tahap pemrosesan request."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = Histogram(
+                'request_stage_seconds', 'Durasi per tahap pemrosesan request (read, decode, inference, serialize, ...)',
+                ['endpoint', 'stage'], registry=registry, buckets=STAGE_BUCKETS
+            )
+        return _metrics_by_registry[key]
+
+
+class StageTimer:
+    """
+    Pencatat durasi tahap pemrosesan. Setiap `stage(...)` mencatat histogram
+    `request_stage_seconds{endpoint,stage}`, membuat child span OpenTelemetry di bawah
+    span request, dan melampirkan exemplar trace_id (jika trace di-sample) sehingga
+    bucket yang lambat di Grafana dapat dibuka langsung ke trace-nya di Tempo.
+
+    Di luar request Flask (worker batch/job), label endpoint bernilai 'background'.
+    """
+
+    def __init__(self, name, metrics=None):
+        self.name = name
+        registry = getattr(metrics, 'registry', None) or REGISTRY
+        self._histogram = _stage_histogram(registry)
+        self._tracer = trace.get_tracer(f"temandifa.{name}")
+
+    @contextmanager
+    def stage(self, stage, endpoint=None, **attributes):
+        """Context manager yang mengukur satu tahap; atribut tambahan dicatat di span."""
+        if endpoint is None:
+            endpoint = (request.endpoint or 'unknown') if has_request_context() else 'background'
+        with self._tracer.start_as_current_span(
+            f"{self.name}.{stage}", attributes={"stage": stage, "endpoint": endpoint, **attributes}
+        ) as span:
+            started = time.perf_counter()
+            try:
+                yield span
+            finally:
+                self.observe(endpoint, stage, time.perf_counter() - started, span)
+
+    def observe(self, endpoint, stage, seconds, span=None):
+        """Mencatat durasi yang diukur di tempat lain (misalnya di thread batch)."""
+        context = (span or trace.get_current_span()).get_span_context()
+        exemplar = None
+        if context.is_valid and context.trace_flags.sampled:
+            exemplar = {"trace_id": format(context.trace_id, '032x')}
+        self._histogram.labels(endpoint=endpoint, stage=stage).observe(seconds, exemplar=exemplar)
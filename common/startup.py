@@ -0,0 +1,82 @@
+"""
+Pengukuran fase startup layanan sebagai metrik, untuk memantau latensi scale-out.
+
+Gauge `service_startup_phase_seconds{phase}`:
+- imports: sejak proses dimulai sampai `create_app` dipanggil (interpreter + import modul);
+- app_factory: pembuatan aplikasi Flask (logging, tracing, metrics, health, admission);
+- weight_load (dan fase lain yang dicatat layanan lewat `phase(...)`): pemuatan model;
+- warmup: self-test pertama yang berhasil di proses ini (inferensi pertama);
+- ready: sejak proses dimulai sampai warm-up selesai.
+
+Dengan gunicorn --preload, fase import dan pemuatan bobot terjadi di master sebelum fork
+(nilainya ikut tersalin ke worker); warmup dan ready diukur per worker sejak fork.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+_MODULE_LOADED = time.monotonic()
+
+
+def process_uptime():
+    """Detik sejak proses ini dimulai (Linux /proc); fallback: sejak modul ini di-import."""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, IndexError, ValueError):
+        return time.monotonic() - _MODULE_LOADED
+
+
+def _phase_gauge(registry):
+    """Membuat (sekali per registry) gauge durasi fase startup."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = Gauge(
+                'service_startup_phase_seconds', 'Durasi fase startup (imports, weight_load, warmup, ready, ...)',
+                ['phase'], registry=registry
+            )
+        return _metrics_by_registry[key]
+
+
+class StartupTimer:
+    """Pencatat fase startup satu layanan (lihat docstring modul)."""
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self._gauge = _phase_gauge(registry or REGISTRY)
+        self._warm_pid = None
+
+    def record(self, phase, seconds):
+        self._gauge.labels(phase=phase).set(seconds)
+        logger.info(f"Startup phase '{phase}' for [{self.name}]: {seconds:.3f}s")
+
+    @contextmanager
+    def phase(self, phase):
+        """Mengukur satu fase startup (dicatat juga jika fase gagal)."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(phase, time.monotonic() - started)
+
+    def mark_warm(self, warmup_seconds):
+        """Dipanggil setelah self-test berhasil; hanya yang pertama per proses yang dicatat."""
+        pid = os.getpid()
+        if self._warm_pid == pid:
+            return
+        self._warm_pid = pid
+        self.record('warmup', warmup_seconds)
+        self.record('ready', process_uptime())
@@ -0,0 +1,196 @@
+"""
+Konfigurasi logging terpusat untuk layanan Python.
+
+Record dikirim lewat QueueHandler ke satu thread QueueListener yang memformat (JSON)
+dan menulis ke stderr, sehingga thread request tidak pernah menunggu I/O. Trace/span
+id OpenTelemetry ditambahkan di thread pemanggil (sebelum masuk antrean). Log INFO/DEBUG
+di dalam request di-sample per request (LOG_SAMPLE_RATE) berdasarkan trace id, sehingga
+semua log satu request ikut tersimpan atau terbuang bersama; WARNING ke atas selalu
+disimpan.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+from flask import g, has_request_context
+from opentelemetry import trace
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] [trace_id=%(trace_id)s] - %(message)s'
+
+# Atribut bawaan LogRecord; atribut lain (dari `extra=`) ikut ditulis sebagai field JSON.
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'trace_id', 'span_id'}
+
+_lock = threading.Lock()
+_state = {}
+
+
+class TraceContextFilter(logging.Filter):
+    """Menambahkan trace_id/span_id span aktif ke record (dijalankan di thread pemanggil)."""
+
+    def filter(self, record):
+        context = trace.get_current_span().get_span_context()
+        if context.is_valid:
+            record.trace_id = format(context.trace_id, '032x')
+            record.span_id = format(context.span_id, '016x')
+        else:
+            record.trace_id = record.span_id = None
+        return True
+
+
+class RequestSampler(logging.Filter):
+    """
+    Menyimpan log di bawah WARNING hanya untuk sebagian request (`rate` 0..1).
+    Keputusan diambil sekali per request: dari trace id jika ada (konsisten antar
+    layanan), atau acak. Log di luar request (startup, worker background) selalu disimpan.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING or not has_request_context():
+            return True
+        keep = g.get('_log_sampled')
+        if keep is None:
+            trace_id = getattr(record, 'trace_id', None)
+            bucket = int(trace_id[-8:], 16) / 0xFFFFFFFF if trace_id else random.random()
+            keep = g._log_sampled = bucket < self.rate
+        return keep
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris; field tambahan dari `extra=` ikut disertakan."""
+
+    def __init__(self, service_name):
+        super().__init__()
+        self.service_name = service_name
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "service": self.service_name,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "file": f"{record.filename}:{record.lineno}",
+            "thread": record.threadName,
+        }
+        if getattr(record, 'trace_id', None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang membuang record (dan menghitungnya) saat antrean penuh, bukan memblokir."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Hanya resolve pesan dan traceback di thread pemanggil; formatting JSON di thread listener.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _StderrHandler(logging.StreamHandler):
+    """StreamHandler yang selalu menulis ke `sys.stderr` saat ini (bukan objek saat dibuat)."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+def _start_listener():
+    handler = _state['queue_handler']
+    handler.queue = queue.Queue(maxsize=_state['queue_size'])
+    listener = logging.handlers.QueueListener(handler.queue, _state['stream_handler'], respect_handler_level=False)
+    listener.start()
+    _state['listener'] = listener
+
+
+def _after_fork_in_child():
+    # Thread listener tidak ikut ter-fork (gunicorn --preload); mulai ulang dengan antrean baru.
+    if 'queue_handler' in _state:
+        _start_listener()
+
+
+def _stop_listener():
+    listener = _state.get('listener')
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def configure_logging(service_name):
+    """
+    Memasang logging terstruktur di root logger (sekali per proses). Env:
+    LOG_FORMAT (json|text), LOG_LEVEL, LOG_SAMPLE_RATE (0..1, default 1), LOG_QUEUE_SIZE.
+    """
+    with _lock:
+        if 'queue_handler' in _state:
+            return _state['queue_handler']
+
+        log_format = os.environ.get('LOG_FORMAT', 'json').lower()
+        level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+        sample_rate = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+        stream_handler = _StderrHandler()
+        if log_format == 'text':
+            stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        else:
+            stream_handler.setFormatter(JsonFormatter(service_name))
+
+        queue_handler = _NonBlockingQueueHandler(None)
+        queue_handler.addFilter(TraceContextFilter())
+        queue_handler.addFilter(RequestSampler(sample_rate))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            # Handler dari logging.basicConfig diganti; handler lain (mis. capture pytest) dibiarkan.
+            if type(handler) is logging.StreamHandler:
+                root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _state.update(
+            queue_handler=queue_handler, stream_handler=stream_handler,
+            queue_size=int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+        )
+        _start_listener()
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        atexit.register(_stop_listener)
+
+        logging.getLogger(__name__).info(
+            f"Logging configured (format={log_format}, level={level}, sample_rate={sample_rate})."
+        )
+        return queue_handler
@@ -0,0 +1,152 @@
+import io
+import json
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify, request
+from opentelemetry.sdk.trace import TracerProvider
+from prometheus_client import CollectorRegistry
+
+# Provider lokal: span di-sample tanpa bergantung pada konfigurasi tracing global layanan.
+tracer = TracerProvider().get_tracer(__name__)
+
+
+def test_admission_limiter_hands_slot_to_waiter_or_times_out():
+    from werkzeug.exceptions import ServiceUnavailable
+    from common.admission import AdmissionLimiter
+
+    limiter = AdmissionLimiter('test', max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(ServiceUnavailable):
+        limiter.acquire()
+
+    limiter.queue_timeout = 5
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), admitted.set()))
+    waiter.start()
+    while not limiter._waiters:
+        pass
+    limiter.release(0.5)
+    waiter.join(2)
+    assert admitted.is_set()
+    assert limiter._active == 1
+    limiter.release()
+    assert limiter._active == 0
+
+
+def test_stage_timer_records_histograms_with_trace_exemplars():
+    from common.stages import StageTimer
+
+    registry = CollectorRegistry()
+    stages = StageTimer('test', SimpleNamespace(registry=registry))
+    app = Flask(__name__)
+
+    @app.route('/scan', methods=['POST'])
+    def scan_endpoint():
+        return ''
+
+    with app.test_request_context('/scan', method='POST'):
+        for stage in ('read', 'decode'):
+            with stages.stage(stage):
+                pass
+    with tracer.start_as_current_span('req'):
+        stages.observe('scan_endpoint', 'ocr', 0.2)
+
+    for stage in ('read', 'decode', 'ocr'):
+        assert registry.get_sample_value(
+            'request_stage_seconds_count', {'endpoint': 'scan_endpoint', 'stage': stage}
+        ) == 1
+    exemplars = [
+        sample.exemplar
+        for family in registry.collect() if family.name == 'request_stage_seconds'
+        for sample in family.samples
+        if sample.exemplar and sample.labels.get('stage') == 'ocr'
+    ]
+    assert exemplars and len(exemplars[0].labels['trace_id']) == 32
+
+
+def test_structured_logging_samples_request_info_but_keeps_warnings():
+    from common.structured_logging import JsonFormatter, RequestSampler, TraceContextFilter
+
+    sampler, trace_filter = RequestSampler(0.0), TraceContextFilter()
+
+    def record(level, msg):
+        rec = logging.LogRecord('ocr', level, __file__, 1, msg, (), None)
+        trace_filter.filter(rec)
+        return rec
+
+    with Flask(__name__).test_request_context('/scan'), tracer.start_as_current_span('req') as span:
+        info, warning = record(logging.INFO, 'received'), record(logging.WARNING, 'slow')
+        assert not sampler.filter(info)
+        assert sampler.filter(warning)
+
+    assert sampler.filter(record(logging.INFO, 'startup'))
+
+    entry = json.loads(JsonFormatter('ocr_service').format(warning))
+    assert entry['msg'] == 'slow'
+    assert entry['level'] == 'WARNING'
+    assert entry['trace_id'] == format(span.get_span_context().trace_id, '032x')
+
+
+def test_upload_rejected_early_by_magic_bytes_and_size(mocker):
+    from werkzeug.test import EnvironBuilder
+    from common.app_factory import register_error_handlers
+    from common.uploads import IMAGE_KINDS, register_upload_limits, upload_view
+
+    app = Flask(__name__)
+    register_error_handlers(app)
+    register_upload_limits(app, {'scan_endpoint': {'max_bytes': 26 * 1024 * 1024, 'kinds': IMAGE_KINDS}})
+    received = []
+
+    @app.route('/scan', methods=['POST'])
+    def scan_endpoint():
+        received.append(len(upload_view(request.files['image'])))
+        return jsonify(size=received[-1])
+
+    class CountingStream(io.BytesIO):
+        def readinto(self, buffer):
+            self.bytes_read = getattr(self, 'bytes_read', 0) + len(buffer)
+            return super().readinto(buffer)
+
+        def read(self, size=-1):
+            data = super().read(size)
+            self.bytes_read = getattr(self, 'bytes_read', 0) + len(data)
+            return data
+
+    client = app.test_client()
+    garbage = b"MZ this is not an image" + b"\0" * (4 * 1024 * 1024)
+    body = EnvironBuilder(
+        method='POST', data={'image': (io.BytesIO(garbage), 'evil.png')}, content_type='multipart/form-data'
+    )
+    environ = body.get_environ()
+    stream = CountingStream(environ['wsgi.input'].read())
+    rv = client.post(
+        '/scan', input_stream=stream, content_type=environ['CONTENT_TYPE'], content_length=len(stream.getvalue())
+    )
+    assert rv.status_code == 415
+    assert stream.bytes_read < len(garbage) // 4
+    assert received == []
+
+    png = b"\x89PNG\r\n\x1a\n" + b"\0" * 4096
+    rv = client.post('/scan', content_type='multipart/form-data', data={'image': (io.BytesIO(png), 'ok.png')})
+    assert rv.status_code == 200 and rv.json == {'size': len(png)}
+
+    mocker.patch.dict(app.extensions['upload_policies']['scan_endpoint'], {'max_bytes': 1024})
+    rv = client.post('/scan', content_type='multipart/form-data', data={'image': (io.BytesIO(png), 'big.png')})
+    assert rv.status_code == 413
+
+
+def test_self_test_monitors_share_registry_gauges_per_service():
+    from common.health import SelfTestMonitor
+
+    registry = CollectorRegistry()
+    passing = SelfTestMonitor('ocr-service', registry=registry)
+    failing = SelfTestMonitor('yolo-detector', registry=registry)
+    passing.set_check(lambda: None)
+    failing.set_check(lambda: 1 / 0)
+
+    assert passing.run_once() and not failing.run_once()
+    assert registry.get_sample_value('self_test_success', {'service': 'ocr-service'}) == 1
+    assert registry.get_sample_value('self_test_success', {'service': 'yolo-detector'}) == 0
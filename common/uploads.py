@@ -0,0 +1,255 @@
+"""
+Penerimaan upload multipart dengan penolakan dini dan hand-off tanpa salinan.
+
+Request class aplikasi diganti (lihat `register_upload_limits`) sehingga untuk endpoint
+yang terdaftar:
+- batas ukuran body (`max_bytes`) berlaku per endpoint: Content-Length yang terlalu besar
+  langsung ditolak 413 sebelum body dibaca, body chunked dihentikan begitu melewati batas;
+- byte awal setiap file diperiksa (magic bytes) saat chunk pertama tiba; jenis yang tidak
+  diizinkan ditolak 415 tanpa membaca sisa body;
+- file ditampung di `UploadSpool` (memori, pindah ke file sementara jika besar) dan
+  diserahkan ke decoder sebagai memoryview (`upload_view`) tanpa salinan `bytes` tambahan.
+"""
+import io
+import logging
+import mmap
+import os
+import tempfile
+
+from flask import current_app, has_app_context, request
+from flask.wrappers import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 32
+SPOOL_MAX_MEMORY_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY_BYTES', 8 * 1024 * 1024))
+
+
+def _riff(form_type):
+    return lambda head: head[:4] == b'RIFF' and head[8:12] == form_type
+
+
+def _mpeg_audio_sync(head):
+    # Frame MPEG audio (MP3) atau ADTS AAC tanpa tag: 11 bit sync 0xFFE.
+    return len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0
+
+
+MAGIC_SIGNATURES = {
+    'jpeg': lambda head: head[:3] == b'\xff\xd8\xff',
+    'png': lambda head: head[:8] == b'\x89PNG\r\n\x1a\n',
+    'bmp': lambda head: head[:2] == b'BM',
+    'webp': _riff(b'WEBP'),
+    'tiff': lambda head: head[:4] in (b'II*\x00', b'MM\x00*'),
+    'wav': _riff(b'WAVE'),
+    'mp3': lambda head: head[:3] == b'ID3' or _mpeg_audio_sync(head),
+    'ogg': lambda head: head[:4] == b'OggS',
+    'flac': lambda head: head[:4] == b'fLaC',
+    'webm': lambda head: head[:4] == b'\x1a\x45\xdf\xa3',
+    'mp4': lambda head: head[4:8] == b'ftyp',
+    'amr': lambda head: head[:5] == b'#!AMR',
+}
+
+IMAGE_KINDS = frozenset({'jpeg', 'png', 'bmp', 'webp', 'tiff'})
+AUDIO_KINDS = frozenset({'wav', 'mp3', 'ogg', 'flac', 'webm', 'mp4', 'amr'})
+
+
+def sniff_kind(head, kinds=None):
+    """Jenis file dari byte awal (mis. 'jpeg', 'wav'), dibatasi ke `kinds` jika diberikan; None jika tidak cocok."""
+    head = bytes(head[:SNIFF_BYTES])
+    for kind, matches in MAGIC_SIGNATURES.items():
+        if (kinds is None or kind in kinds) and matches(head):
+            return kind
+    return None
+
+
+class BufferReader(io.RawIOBase):
+    """File-like read-only di atas buffer (bytes/memoryview/mmap) tanpa menyalin seluruh isi."""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class UploadSpool:
+    """
+    Penampung satu file upload yang ditulis oleh parser multipart. Byte awal diperiksa
+    terhadap `kinds` begitu tersedia; isi disimpan di memori dan dipindah ke file
+    sementara setelah melewati UPLOAD_SPOOL_MAX_MEMORY_BYTES.
+    """
+
+    def __init__(self, filename=None, kinds=None):
+        self.filename = filename
+        self.kinds = kinds
+        self.kind = None
+        self.size = 0
+        self._file = io.BytesIO()
+        self._head = b''
+        self._mmap = None
+        self._views = []
+
+    @property
+    def in_memory(self):
+        return isinstance(self._file, io.BytesIO)
+
+    def _check_head(self, final=False):
+        if self.kind is not None or self.kinds is None:
+            return
+        if len(self._head) < SNIFF_BYTES and not final:
+            return
+        self.kind = sniff_kind(self._head, self.kinds)
+        if self.kind is None:
+            logger.warning(f"Rejected upload '{self.filename}': content does not match {sorted(self.kinds)}.")
+            raise UnsupportedMediaType(
+                f"File content of '{self.filename}' is not an allowed type. Allowed: {', '.join(sorted(self.kinds))}."
+            )
+
+    def write(self, data):
+        if len(self._head) < SNIFF_BYTES:
+            self._head += bytes(data[:SNIFF_BYTES - len(self._head)])
+            self._check_head()
+        self.size += len(data)
+        if self.in_memory and self.size > SPOOL_MAX_MEMORY_BYTES:
+            spilled = tempfile.TemporaryFile()
+            spilled.write(self._file.getbuffer())
+            self._file = spilled
+        return self._file.write(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Parser memanggil seek(0) setelah file selesai ditulis; file yang sangat kecil diperiksa di sini.
+        self._check_head(final=True)
+        return self._file.seek(offset, whence)
+
+    def __getattr__(self, name):
+        # read/tell/flush/... diteruskan ke penampung (dipakai FileStorage.read/save).
+        return getattr(self._file, name)
+
+    def view(self):
+        """Isi file sebagai memoryview tanpa salinan (buffer memori atau mmap file sementara)."""
+        if self.in_memory:
+            view = self._file.getbuffer()
+        elif self.size == 0:
+            return memoryview(b'')
+        else:
+            self._file.flush()
+            if self._mmap is None:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(self._mmap)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in self._views:
+            try:
+                view.release()
+            except BufferError:
+                pass  # Masih dipakai (mis. slice di decoder); dibebaskan saat referensi terakhir hilang.
+        self._views = []
+        for resource in (self._mmap, self._file):
+            if resource is None:
+                continue
+            try:
+                resource.close()
+            except BufferError:
+                pass
+
+
+class UploadRequest(Request):
+    """Request dengan batas ukuran dan spool upload per endpoint (lihat `register_upload_limits`)."""
+
+    def _upload_policy(self):
+        if not has_app_context() or self.url_rule is None:
+            return None
+        return current_app.extensions.get('upload_policies', {}).get(self.url_rule.endpoint)
+
+    @property
+    def max_content_length(self):
+        policy = self._upload_policy()
+        if self._max_content_length is None and policy is not None:
+            return policy['max_bytes']
+        return Request.max_content_length.fget(self)
+
+    @max_content_length.setter
+    def max_content_length(self, value):
+        self._max_content_length = value
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        policy = self._upload_policy()
+        if policy is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return UploadSpool(filename, policy['kinds'])
+
+
+def register_upload_limits(app, limits):
+    """
+    Mengaktifkan penerimaan upload untuk endpoint tertentu.
+
+    Args:
+        app (Flask): Aplikasi Flask.
+        limits (dict): nama endpoint -> {"max_bytes", "kinds"}. `kinds` adalah himpunan
+            jenis dari MAGIC_SIGNATURES (None = tanpa pemeriksaan isi). `max_bytes` dapat
+            ditimpa lewat env UPLOAD_<ENDPOINT>_MAX_BYTES.
+    """
+    policies = {}
+    for endpoint, spec in limits.items():
+        max_bytes = int(os.environ.get(f"UPLOAD_{endpoint.upper()}_MAX_BYTES", spec['max_bytes']))
+        policies[endpoint] = {'max_bytes': max_bytes, 'kinds': spec.get('kinds')}
+        logger.info(
+            f"Upload limits for '{endpoint}': max_bytes={max_bytes}, kinds={sorted(spec.get('kinds') or [])}"
+        )
+    app.request_class = UploadRequest
+    app.extensions['upload_policies'] = policies
+
+    @app.before_request
+    def reject_oversized_upload():
+        # Content-Length sudah diketahui dari header: tolak sebelum body dibaca sama sekali.
+        policy = policies.get(request.endpoint)
+        if policy is not None and request.content_length is not None and request.content_length > policy['max_bytes']:
+            raise RequestEntityTooLarge(
+                f"Upload of {request.content_length} bytes exceeds the limit of {policy['max_bytes']} bytes."
+            )
+
+
+def upload_view(file):
+    """
+    Isi FileStorage sebagai memoryview. Tanpa salinan jika file ditampung `UploadSpool`;
+    selain itu (endpoint tanpa kebijakan upload) dibaca seperti `file.read()`.
+    """
+    if isinstance(file.stream, UploadSpool):
+        return file.stream.view()
+    file.stream.seek(0)
+    return memoryview(file.read())
+
@@ -1,18 +1,27 @@
-from flask import request, jsonify
+from flask import request
 from werkzeug.exceptions import BadRequest, InternalServerError, UnsupportedMediaType
 from PIL import Image
-import io
 import logging
 import os
 import pytesseract
 
-from common.app_factory import create_app
+from common.app_factory import create_app, register_self_test
+from common.image_ingest import InvalidImageError, ImageTooLargeError, ingest_image
+from common.jobs import JobQueue, accepted_response, register_job_routes, wants_async
+from common.result_cache import ResultCache
+from common.serialization import negotiated_response
+from common.stages import StageTimer
+from common.uploads import IMAGE_KINDS, upload_view
+from engine_pool import EngineUnavailableError, create_engine_pool
+from preprocess import PROFILES, ocr_regions, preprocess
 
-log_format = '%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] - %(message)s'
-logging.basicConfig(level=logging.INFO, format=log_format)
 logger = logging.getLogger(__name__)
 
-app, metrics = create_app(__name__)
+app, metrics = create_app(__name__, service_name='ocr-service', admission_limits={
+    'scan_endpoint': {'max_concurrent': 2, 'max_queue': 8, 'queue_timeout': 30},
+}, upload_limits={
+    'scan_endpoint': {'max_bytes': 26 * 1024 * 1024, 'kinds': IMAGE_KINDS},
+})
 
 try:
     dummy_image = Image.new('RGB', (10, 10), color='black')
@@ -21,7 +30,145 @@ except Exception as e:
     dummy_image = None
     logger.error(f"Failed to create dummy image for health check: {e}", exc_info=True)
 
-metrics.info('app_info', 'OCR Service Information', version='1.0.0')
+ALLOWED_FORMATS = {'PNG', 'JPEG', 'MPO', 'BMP', 'TIFF', 'WEBP'}
+INGEST_MAX_SIDE = int(os.environ.get('OCR_INGEST_MAX_SIDE', 2000))
+
+APP_VERSION = '1.0.0'
+LANG_CODE = 'ind'
+
+result_cache = ResultCache.from_env('ocr_scan', metrics)
+stages = StageTimer('ocr_service', metrics)
+
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'pool').lower()
+ENGINE_POOL_SIZE = int(os.environ.get('OCR_ENGINE_POOL_SIZE', 4))
+ENGINE_ACQUIRE_TIMEOUT = float(os.environ.get('OCR_ENGINE_ACQUIRE_TIMEOUT_SECONDS', 30))
+
+engine_pool = None
+if OCR_ENGINE == 'pool':
+    with app.extensions['startup'].phase('weight_load'):
+        engine_pool = create_engine_pool(
+            LANG_CODE, ENGINE_POOL_SIZE, acquire_timeout=ENGINE_ACQUIRE_TIMEOUT, metrics=metrics
+        )
+
+DEFAULT_PROFILE = os.environ.get('OCR_DEFAULT_PROFILE', 'none').lower()
+REGION_PARALLELISM = int(os.environ.get('OCR_REGION_PARALLELISM', 2))
+ALLOWED_PSM = {3, 4, 6, 7, 11, 12}
+
+def run_ocr(pil_image, psm=None, data=False):
+    """
+    Menjalankan OCR memakai pool engine Tesseract yang persisten jika tersedia,
+    atau pytesseract (proses `tesseract` per panggilan) sebagai fallback.
+    Jika `data` True, mengembalikan TSV kata/baris (image_to_data) alih-alih teks.
+    """
+    if engine_pool is not None:
+        try:
+            if data:
+                return engine_pool.image_to_data(pil_image, psm=psm)
+            return engine_pool.image_to_string(pil_image, psm=psm)
+        except EngineUnavailableError as e:
+            logger.warning(f"Tesseract engine pool unavailable, falling back to pytesseract: {e}")
+    config = f'--psm {psm}' if psm is not None else ''
+    if data:
+        return pytesseract.image_to_data(pil_image, lang=LANG_CODE, config=config)
+    return pytesseract.image_to_string(pil_image, lang=LANG_CODE, config=config)
+
+def parse_scan_options(form):
+    """Memvalidasi opsi OCR per request: profile, psm, dan boxes."""
+    profile = (form.get('profile') or DEFAULT_PROFILE).lower()
+    if profile not in PROFILES:
+        raise BadRequest(f"Invalid profile '{profile}'. Allowed: {', '.join(PROFILES)}")
+
+    psm = form.get('psm')
+    if psm is not None and psm != '':
+        try:
+            psm = int(psm)
+        except ValueError:
+            raise BadRequest(f"Invalid psm '{psm}'. Must be an integer.")
+        if psm not in ALLOWED_PSM:
+            raise BadRequest(f"Invalid psm {psm}. Allowed: {', '.join(str(p) for p in sorted(ALLOWED_PSM))}")
+    else:
+        psm = None
+
+    boxes = (form.get('boxes') or 'false').lower() in ('1', 'true', 'yes')
+    return profile, psm, boxes
+
+def scan_image(image_bytes, filename, profile, psm, with_boxes):
+    """
+    Menjalankan OCR pada byte gambar dan mengembalikan respons JSON (dict).
+    Dipakai oleh endpoint sinkron maupun worker job asinkron.
+    """
+    logger.info(f"Received image '{filename}' ({len(image_bytes)} bytes) for OCR (profile={profile}, psm={psm}).")
+
+    cache_key = result_cache.make_key(
+        image_bytes, model='tesseract', version=APP_VERSION,
+        params={
+            'lang': LANG_CODE, 'ingest_max_side': INGEST_MAX_SIDE,
+            'profile': profile, 'psm': psm, 'boxes': with_boxes
+        }
+    )
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Result cache hit for '{filename}'.")
+        return cached
+
+    try:
+        with stages.stage('decode'):
+            ingested = ingest_image(
+                image_bytes,
+                max_side=INGEST_MAX_SIDE or None,
+                mode=None,
+                allowed_formats=ALLOWED_FORMATS
+            )
+        pil_image = ingested.image
+        logger.debug(
+            f"Image '{filename}' decoded at {pil_image.size} (original {ingested.original_size})."
+        )
+    except ImageTooLargeError as img_err:
+        logger.warning(f"Image too large received ('{filename}'): {img_err}")
+        raise BadRequest(f"Image too large: {img_err}")
+    except InvalidImageError as img_err:
+        logger.warning(f"Invalid or corrupted image file received ('{filename}'): {img_err}")
+        raise BadRequest(f"Invalid or corrupted image file: {img_err}")
+
+    logger.info(f"Performing OCR on image '{filename}'...")
+    try:
+        if profile == 'none' and not with_boxes:
+            with stages.stage('ocr', profile=profile):
+                ocr_result = {"text": run_ocr(pil_image, psm=psm)}
+        else:
+            with stages.stage('preprocess', profile=profile):
+                prepared = preprocess(pil_image, profile)
+            cropped = prepared.regions != [(0, 0, prepared.image.width, prepared.image.height)]
+            region_psm = psm
+            if region_psm is None and cropped:
+                region_psm = PROFILES[profile]['region_psm']
+            with stages.stage('ocr', profile=profile, regions=len(prepared.regions)):
+                ocr_result = ocr_regions(
+                    prepared, run_ocr, psm=region_psm,
+                    with_boxes=with_boxes, parallelism=REGION_PARALLELISM
+                )
+        scanned_text = ocr_result["text"]
+        logger.info(f"OCR complete for '{filename}'. Extracted text length: {len(scanned_text)}")
+    except (pytesseract.TesseractError, RuntimeError) as tess_err:
+        logger.error(f"Error during Tesseract processing for '{filename}': {tess_err}", exc_info=True)
+        raise InternalServerError(f"Error occurred during OCR processing: {tess_err}")
+
+    response = {"scannedText": scanned_text.strip()}
+    if with_boxes:
+        response["words"] = ocr_result["words"]
+        response["lines"] = ocr_result["lines"]
+    result_cache.set(cache_key, response)
+    return response
+
+def run_scan_job(image_bytes, params):
+    """Handler job OCR asinkron; parameter sudah divalidasi saat submit."""
+    return scan_image(image_bytes, params["filename"], params["profile"], params["psm"], params["boxes"])
+
+scan_jobs = JobQueue.from_env('ocr_scan', metrics)
+scan_jobs.set_handler(run_scan_job)
+register_job_routes(app, scan_jobs)
+
+metrics.info('app_info', 'OCR Service Information', version=APP_VERSION)
 
 @app.route('/scan', methods=['POST'])
 @metrics.counter('scan_requests_total', 'Total number of /scan requests')
@@ -31,7 +178,11 @@ def scan_endpoint():
     """
     Endpoint untuk melakukan OCR pada gambar yang diunggah.
     Menerima file gambar melalui form-data dengan key 'image'.
-    Mengembalikan teks hasil OCR dalam format JSON.
+    Field opsional: 'profile' (none/fast/balanced/accurate), 'psm', dan 'boxes'
+    (true untuk menyertakan kotak kata dan baris).
+    Mengembalikan teks hasil OCR dalam format JSON (atau MessagePack sesuai header
+    Accept), atau 202 + id job jika diminta
+    asinkron (`?async=true` / `Prefer: respond-async`, opsional 'callback_url').
     """
     if 'image' not in request.files:
         logger.warning("Request to /scan missing 'image' file part.")
@@ -54,31 +205,22 @@ def scan_endpoint():
             f"Allowed extensions: {', '.join(allowed_extensions)}"
         )
 
-    try:
-        image_bytes = file.read()
-        logger.info(f"Received image '{file.filename}' ({len(image_bytes)} bytes) for OCR.")
+    profile, psm, with_boxes = parse_scan_options(request.form)
 
-        pil_image = None
-        try:
-            pil_image = Image.open(io.BytesIO(image_bytes))
-            pil_image.verify()
-            pil_image = Image.open(io.BytesIO(image_bytes))
-            pil_image.load()
-            logger.debug(f"Image '{file.filename}' successfully opened and verified.")
-        except (IOError, SyntaxError, ValueError) as img_err:
-            logger.warning(f"Invalid or corrupted image file received ('{file.filename}'): {img_err}")
-            raise BadRequest(f"Invalid or corrupted image file: {img_err}")
-
-        logger.info(f"Performing OCR on image '{file.filename}'...")
-        try:
-            lang_code = 'ind'
-            scanned_text = pytesseract.image_to_string(pil_image, lang=lang_code)
-            logger.info(f"OCR complete for '{file.filename}'. Extracted text length: {len(scanned_text)}")
-        except pytesseract.TesseractError as tess_err:
-            logger.error(f"Error during Tesseract processing for '{file.filename}': {tess_err}", exc_info=True)
-            raise InternalServerError(f"Error occurred during OCR processing: {tess_err}")
+    with stages.stage('read'):
+        image_bytes = upload_view(file)
+
+    if wants_async():
+        record = scan_jobs.submit(
+            bytes(image_bytes), params={"filename": file.filename, "profile": profile, "psm": psm, "boxes": with_boxes},
+            callback_url=request.form.get('callback_url')
+        )
+        return accepted_response(record)
 
-        return jsonify({"scannedText": scanned_text.strip()})
+    try:
+        response = scan_image(image_bytes, file.filename, profile, psm, with_boxes)
+        with stages.stage('serialize'):
+            return negotiated_response(response)
 
     except (BadRequest, UnsupportedMediaType) as http_err:
         raise http_err
@@ -87,24 +229,13 @@ def scan_endpoint():
         logger.error(f"Unexpected error during OCR for file '{file.filename}': {e}", exc_info=True)
         raise InternalServerError("An unexpected error occurred during OCR processing.")
 
-@app.route('/health', methods=['GET'])
-@metrics.do_not_track()
-def health_check():
-    """
-    Endpoint health check.
-    Memeriksa Tesseract dapat dieksekusi pada gambar dummy.
-    """
+def run_self_test():
+    """Self-test berkala: memastikan Tesseract dapat dieksekusi pada gambar dummy (sekaligus warm-up engine)."""
     if dummy_image is None:
-         logger.error("Health check failed: Dummy image not created.")
-         return jsonify({"status": "unhealthy", "reason": "Health check setup failed"}), 503
-    
-    try:
-        _ = pytesseract.image_to_string(dummy_image, lang='ind', timeout=5)
-        logger.debug("Health check Tesseract execution successful.")
-        return jsonify({"status": "healthy"}), 200
-    except Exception as e:
-        logger.error(f"Health check failed: Tesseract execution error: {e}", exc_info=True)
-        return jsonify({"status": "unhealthy", "reason": f"Tesseract execution failed: {e}"}), 503
+        raise RuntimeError("Health check setup failed")
+    run_ocr(dummy_image)
+
+register_self_test(app, run_self_test)
 
 if __name__ == '__main__':
     host = os.environ.get('HOST', '0.0.0.0')
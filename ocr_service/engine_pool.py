@@ -0,0 +1,180 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+_metrics_lock = threading.Lock()
+_metrics_by_registry = {}
+
+
+def _engine_metrics(registry):
+    """Membuat (sekali per registry Prometheus) metrik pool engine Tesseract."""
+    with _metrics_lock:
+        key = id(registry)
+        if key not in _metrics_by_registry:
+            _metrics_by_registry[key] = {
+                'wait': Histogram(
+                    'ocr_engine_wait_seconds', 'Waktu tunggu untuk mendapatkan engine Tesseract dari pool',
+                    registry=registry,
+                    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+                ),
+                'created': Counter(
+                    'ocr_engine_created_total', 'Jumlah engine Tesseract yang diinisialisasi', registry=registry
+                ),
+            }
+        return _metrics_by_registry[key]
+
+
+DEFAULT_PSM = 3
+
+
+class EngineUnavailableError(RuntimeError):
+    """Engine tidak dapat dibuat atau tidak tersedia dalam batas waktu tunggu."""
+
+
+class TesseractEnginePool:
+    """
+    Pool berukuran tetap berisi engine Tesseract yang sudah diinisialisasi.
+    Data bahasa dimuat sekali per engine, dan gambar diberikan langsung dari memori
+    (tanpa file sementara atau proses `tesseract` baru per request).
+
+    Engine dibuat secara lazy di proses yang memakainya, sehingga aman untuk
+    `gunicorn --preload`. Satu engine hanya dipakai oleh satu thread pada satu waktu.
+
+    Jika pembuatan engine gagal, pembuatan berikutnya ditunda dengan backoff eksponensial
+    (`retry_backoff` hingga `max_retry_backoff` detik); selama itu request tanpa engine
+    langsung mendapat EngineUnavailableError sehingga pemanggil dapat memakai fallback.
+    """
+
+    def __init__(self, engine_factory, size=4, acquire_timeout=30.0, retry_backoff=1.0, max_retry_backoff=60.0,
+                 registry=None):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.engine_factory = engine_factory
+        self.size = int(size)
+        self.acquire_timeout = float(acquire_timeout)
+        self.retry_backoff = float(retry_backoff)
+        self.max_retry_backoff = float(max_retry_backoff)
+
+        self._available = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+        self.last_error = None
+        self._metrics = _engine_metrics(registry or REGISTRY)
+
+    def _create_engine(self):
+        try:
+            engine = self.engine_factory()
+        except Exception as e:
+            with self._lock:
+                self._created -= 1
+                self._failures += 1
+                backoff = min(self.max_retry_backoff, self.retry_backoff * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + backoff
+                self.last_error = str(e)
+            logger.error(f"Failed to initialize Tesseract engine, retrying in {backoff:.1f}s: {e}", exc_info=True)
+            raise EngineUnavailableError(f"Failed to initialize Tesseract engine: {e}") from e
+        with self._lock:
+            self._failures = 0
+            self.last_error = None
+        self._metrics['created'].inc()
+        logger.info(f"Tesseract engine initialized ({self._created}/{self.size}).")
+        return engine
+
+    def _discard(self, engine):
+        with self._lock:
+            self._created -= 1
+        try:
+            engine.End()
+        except Exception:
+            pass
+
+    @contextmanager
+    def acquire(self):
+        """Meminjam satu engine dari pool; engine dikembalikan setelah blok selesai."""
+        started = time.perf_counter()
+        engine = None
+        try:
+            engine = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                backing_off = time.monotonic() < self._retry_at
+                can_create = self._created < self.size and not backing_off
+                if can_create:
+                    self._created += 1
+                elif backing_off and self._created == 0:
+                    # Tidak ada engine yang bisa ditunggu sampai backoff selesai.
+                    raise EngineUnavailableError(
+                        f"Tesseract engine unavailable, retrying in {self._retry_at - time.monotonic():.1f}s: "
+                        f"{self.last_error}"
+                    )
+            if can_create:
+                engine = self._create_engine()
+            else:
+                try:
+                    engine = self._available.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise EngineUnavailableError(
+                        f"No Tesseract engine available within {self.acquire_timeout:.1f}s"
+                    )
+        self._metrics['wait'].observe(time.perf_counter() - started)
+
+        healthy = True
+        try:
+            yield engine
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                engine.Clear()
+                self._available.put(engine)
+            else:
+                self._discard(engine)
+
+    def image_to_string(self, pil_image, psm=None):
+        """Menjalankan OCR pada gambar PIL dan mengembalikan teks hasilnya."""
+        with self.acquire() as engine:
+            engine.SetPageSegMode(DEFAULT_PSM if psm is None else psm)
+            engine.SetImage(pil_image)
+            return engine.GetUTF8Text()
+
+    def image_to_data(self, pil_image, psm=None):
+        """Menjalankan OCR dan mengembalikan keluaran TSV (setara `pytesseract.image_to_data`)."""
+        with self.acquire() as engine:
+            engine.SetPageSegMode(DEFAULT_PSM if psm is None else psm)
+            engine.SetImage(pil_image)
+            return engine.GetTSVText(0)
+
+
+def create_engine_pool(lang, size, acquire_timeout=30.0, tessdata_path=None, metrics=None):
+    """
+    Membuat pool engine berbasis tesserocr (binding C-API Tesseract).
+    Mengembalikan None jika tesserocr tidak terpasang, sehingga pemanggil dapat
+    kembali memakai pytesseract.
+    """
+    try:
+        import tesserocr
+    except ImportError:
+        logger.warning("tesserocr is not installed; OCR will fall back to pytesseract.")
+        return None
+
+    tessdata_path = tessdata_path or os.environ.get('TESSDATA_PREFIX')
+
+    def factory():
+        if tessdata_path:
+            return tesserocr.PyTessBaseAPI(path=tessdata_path, lang=lang)
+        return tesserocr.PyTessBaseAPI(lang=lang)
+
+    logger.info(f"Tesseract engine pool configured (lang={lang}, size={size}, tessdata={tessdata_path or 'default'}).")
+    return TesseractEnginePool(
+        factory, size=size, acquire_timeout=acquire_timeout, registry=metrics.registry if metrics is not None else None
+    )
@@ -0,0 +1,290 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Profil preprocessing: menukar akurasi dengan latensi.
+#   target_line_height: tinggi baris teks (px) yang dituju saat rescale; None = tanpa rescale.
+#   max_side: batas sisi terpanjang setelah rescale; None = tanpa batas.
+#   binarize: None, 'otsu' (global, cepat), atau 'adaptive' (rata-rata lokal, tahan bayangan).
+#   crop_regions: hanya OCR area yang terdeteksi berisi teks.
+#   region_psm: page segmentation mode default untuk setiap crop.
+PROFILES = {
+    'none': {
+        'grayscale': False, 'target_line_height': None, 'max_side': None,
+        'binarize': None, 'crop_regions': False, 'region_psm': None,
+    },
+    'fast': {
+        'grayscale': True, 'target_line_height': 24, 'max_side': 1600,
+        'binarize': 'otsu', 'crop_regions': True, 'region_psm': 6,
+    },
+    'balanced': {
+        'grayscale': True, 'target_line_height': 32, 'max_side': 2400,
+        'binarize': 'otsu', 'crop_regions': True, 'region_psm': 6,
+    },
+    'accurate': {
+        'grayscale': True, 'target_line_height': 40, 'max_side': None,
+        'binarize': 'adaptive', 'crop_regions': False, 'region_psm': None,
+    },
+}
+
+REGION_CELL_SIZE = 16
+MAX_REGIONS = 32
+MAX_REGION_COVERAGE = 0.8
+
+
+class PreprocessResult(NamedTuple):
+    image: Image.Image
+    regions: List[Tuple[int, int, int, int]]
+    scale: float
+
+
+def _runs(mask, max_gap=0):
+    """Mengembalikan daftar (start, end) untuk deretan True berurutan; celah <= max_gap digabung."""
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[0::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+    if max_gap > 0:
+        keep = np.concatenate(([True], (starts[1:] - ends[:-1]) > max_gap))
+        group = np.cumsum(keep) - 1
+        merged_ends = np.zeros(int(group[-1]) + 1, dtype=ends.dtype)
+        np.maximum.at(merged_ends, group, ends)
+        starts = starts[keep]
+        ends = merged_ends
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def otsu_threshold(gray):
+    """Ambang global Otsu dihitung dari histogram secara vektor."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    prob = hist / max(gray.size, 1)
+    omega = np.cumsum(prob)
+    mu = np.cumsum(prob * np.arange(256))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma_b = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    sigma_b[~np.isfinite(sigma_b)] = 0.0
+    return int(np.argmax(sigma_b))
+
+
+def adaptive_binarize(gray, window=31, offset=10):
+    """Binarisasi dengan ambang rata-rata lokal memakai integral image (tanpa loop per piksel)."""
+    half = window // 2
+    padded = np.pad(gray.astype(np.float64), half + 1, mode='edge')
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    h, w = gray.shape
+    total = (
+        integral[window:window + h, window:window + w] - integral[:h, window:window + w]
+        - integral[window:window + h, :w] + integral[:h, :w]
+    )
+    local_mean = total / float(window * window)
+    return np.where(gray > local_mean - offset, 255, 0).astype(np.uint8)
+
+
+def estimate_line_height(ink):
+    """Perkiraan tinggi baris teks (px) dari profil proyeksi horizontal piksel tinta."""
+    row_density = ink.mean(axis=1)
+    if not row_density.any():
+        return None
+    text_rows = row_density > max(0.01, float(row_density.mean()) * 0.5)
+    heights = np.array([end - start for start, end in _runs(text_rows)])
+    heights = heights[heights >= 3]
+    if len(heights) == 0:
+        return None
+    return float(np.median(heights))
+
+
+def detect_text_regions(ink, cell=REGION_CELL_SIZE, min_density=0.02, max_density=0.6):
+    """
+    Mendeteksi area berisi teks dengan membagi mask tinta menjadi sel-sel kecil,
+    menandai sel dengan kepadatan tinta khas teks, lalu memotongnya menjadi pita
+    baris dan rentang kolom (XY-cut satu tingkat).
+    Returns:
+        list: Kotak (x0, y0, x1, y1) dalam koordinat piksel, urut baca.
+    """
+    h, w = ink.shape
+    rows, cols = h // cell, w // cell
+    if rows == 0 or cols == 0:
+        return []
+
+    density = ink[:rows * cell, :cols * cell].reshape(rows, cell, cols, cell).mean(axis=(1, 3))
+    text_cells = (density >= min_density) & (density <= max_density)
+
+    regions = []
+    pad = cell // 2
+    previous_band_end = 0
+    for band_start, band_end in _runs(text_cells.any(axis=1)):
+        # Padding vertikal tidak boleh menumpuk dengan pita sebelumnya agar baris tidak ter-OCR dua kali.
+        y0 = max(previous_band_end, band_start * cell - pad)
+        y1 = min(h, band_end * cell + pad)
+        previous_band_end = y1
+        band_cols = text_cells[band_start:band_end].any(axis=0)
+        for col_start, col_end in _runs(band_cols, max_gap=2):
+            x0 = max(0, col_start * cell - cell)
+            x1 = min(w, col_end * cell + cell)
+            if (x1 - x0) >= cell * 2 and (y1 - y0) >= cell:
+                regions.append((x0, y0, x1, y1))
+    return regions
+
+
+def preprocess(pil_image, profile_name):
+    """
+    Menyiapkan gambar untuk OCR sesuai profil: grayscale, rescale ke tinggi baris
+    target, binarisasi, dan deteksi area teks.
+    Returns:
+        PreprocessResult: Gambar hasil preprocessing, daftar area yang perlu di-OCR,
+        dan faktor skala terhadap gambar input.
+    """
+    profile = PROFILES[profile_name]
+    if not profile['grayscale']:
+        width, height = pil_image.size
+        return PreprocessResult(pil_image, [(0, 0, width, height)], 1.0)
+
+    gray_image = pil_image.convert('L')
+    gray = np.asarray(gray_image)
+    threshold = otsu_threshold(gray)
+    ink = gray <= threshold
+    if ink.mean() > 0.5:
+        # Teks terang di atas latar gelap: balik agar tinta selalu gelap.
+        gray = 255 - gray
+        ink = ~ink
+        gray_image = Image.fromarray(gray)
+
+    scale = 1.0
+    if profile['target_line_height']:
+        line_height = estimate_line_height(ink)
+        if line_height:
+            ratio = profile['target_line_height'] / line_height
+            if ratio < 0.67 or ratio > 1.5:
+                scale = float(np.clip(ratio, 0.25, 3.0))
+    if profile['max_side']:
+        scale = min(scale, profile['max_side'] / float(max(gray.shape)))
+
+    if abs(scale - 1.0) > 0.01:
+        new_size = (max(1, int(round(gray.shape[1] * scale))), max(1, int(round(gray.shape[0] * scale))))
+        gray_image = gray_image.resize(new_size, Image.BILINEAR if scale < 1 else Image.BICUBIC)
+        gray = np.asarray(gray_image)
+        threshold = otsu_threshold(gray)
+
+    if profile['binarize'] == 'otsu':
+        binary = np.where(gray > threshold, 255, 0).astype(np.uint8)
+    elif profile['binarize'] == 'adaptive':
+        binary = adaptive_binarize(gray)
+    else:
+        binary = gray
+
+    processed = Image.fromarray(binary)
+    height, width = binary.shape
+    full_image = [(0, 0, width, height)]
+
+    if not profile['crop_regions']:
+        return PreprocessResult(processed, full_image, scale)
+
+    regions = detect_text_regions(gray <= threshold)
+    covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if not regions or len(regions) > MAX_REGIONS or covered > MAX_REGION_COVERAGE * width * height:
+        regions = full_image
+    logger.debug(f"Preprocess '{profile_name}': scale={scale:.2f}, regions={len(regions)}")
+    return PreprocessResult(processed, regions, scale)
+
+
+def parse_tsv(tsv_text, offset, image_size):
+    """
+    Mengurai keluaran TSV Tesseract (image_to_data) menjadi daftar kata.
+    Koordinat digeser sesuai posisi crop lalu dinormalisasi terhadap ukuran gambar.
+    """
+    x_offset, y_offset = offset
+    width, height = image_size
+    words = []
+    for row in tsv_text.splitlines():
+        parts = row.split('\t')
+        if len(parts) < 12 or parts[0] != '5':
+            continue
+        text = parts[11].strip()
+        if not text:
+            continue
+        try:
+            left, top, w, h = (int(v) for v in parts[6:10])
+            conf = float(parts[10])
+        except ValueError:
+            continue
+        words.append({
+            "text": text,
+            "confidence": conf,
+            "bbox": [(left + x_offset) / width, (top + y_offset) / height, w / width, h / height],
+            "line": (int(parts[2]), int(parts[3]), int(parts[4])),
+        })
+    return words
+
+
+def group_lines(words):
+    """Mengelompokkan kata per baris dan menghitung bbox gabungan setiap baris."""
+    lines = []
+    for word in words:
+        if lines and lines[-1]["_key"] == word["_key"]:
+            lines[-1]["_words"].append(word)
+        else:
+            lines.append({"_key": word["_key"], "_words": [word]})
+
+    result = []
+    for line in lines:
+        boxes = np.array([w["bbox"] for w in line["_words"]])
+        x0, y0 = boxes[:, 0].min(), boxes[:, 1].min()
+        x1, y1 = (boxes[:, 0] + boxes[:, 2]).max(), (boxes[:, 1] + boxes[:, 3]).max()
+        result.append({
+            "text": " ".join(w["text"] for w in line["_words"]),
+            "bbox": [float(x0), float(y0), float(x1 - x0), float(y1 - y0)],
+        })
+    return result
+
+
+def ocr_regions(prepared, recognize_fn, psm=None, with_boxes=False, parallelism=1):
+    """
+    Menjalankan OCR pada setiap area hasil preprocessing (opsional paralel) dan
+    menggabungkan hasilnya dalam urutan baca.
+    Args:
+        prepared (PreprocessResult): Hasil `preprocess`.
+        recognize_fn (callable): fn(image, psm, data) -> teks atau TSV.
+        psm (int, optional): Page segmentation mode untuk setiap area.
+        with_boxes (bool): Sertakan kotak kata dan baris dari `image_to_data`.
+        parallelism (int): Jumlah area yang di-OCR bersamaan.
+    Returns:
+        dict: {"text": str} ditambah "words" dan "lines" jika with_boxes.
+    """
+    image = prepared.image
+    crops = [
+        image if region == (0, 0, image.width, image.height) else image.crop(region)
+        for region in prepared.regions
+    ]
+
+    def recognize(crop):
+        return recognize_fn(crop, psm, with_boxes)
+
+    if parallelism > 1 and len(crops) > 1:
+        with ThreadPoolExecutor(max_workers=min(parallelism, len(crops))) as executor:
+            outputs = list(executor.map(recognize, crops))
+    else:
+        outputs = [recognize(crop) for crop in crops]
+
+    if not with_boxes:
+        return {"text": "\n".join(out.strip() for out in outputs if out and out.strip())}
+
+    words = []
+    for index, (region, tsv_text) in enumerate(zip(prepared.regions, outputs)):
+        for word in parse_tsv(tsv_text, region[:2], image.size):
+            word["_key"] = (index,) + word.pop("line")
+            words.append(word)
+
+    lines = group_lines(words)
+    for word in words:
+        del word["_key"]
+    return {
+        "text": "\n".join(line["text"] for line in lines),
+        "words": words,
+        "lines": lines,
+    }
@@ -2,6 +2,11 @@ import pytest
 import io
 from ocr_service.app import app
 
+@pytest.fixture(autouse=True)
+def pytesseract_backend(mocker):
+    # Test endpoint memakai jalur pytesseract (di-mock) terlepas dari tesserocr terpasang atau tidak.
+    mocker.patch('ocr_service.app.engine_pool', None)
+
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
@@ -11,12 +16,166 @@ def client():
 def test_scan_image_success(client, mocker):
     mock_tesseract = mocker.patch('ocr_service.app.pytesseract.image_to_string')
     mock_tesseract.return_value = 'Ini adalah teks dari gambar.'
-    mocker.patch('ocr_service.app.Image.open')
+    mocker.patch('ocr_service.app.ingest_image')
 
     data = {
-        'image': (io.BytesIO(b"fakeimagedata"), 'test.png')
+        'image': (io.BytesIO(b"\x89PNG\r\n\x1a\nfakeimagedata"), 'test.png')
     }
     rv = client.post('/scan', content_type='multipart/form-data', data=data)
 
     assert rv.status_code == 200
-    assert rv.json == {'scannedText': 'Ini adalah teks dari gambar.'}
\ No newline at end of file
+    assert rv.json == {'scannedText': 'Ini adalah teks dari gambar.'}
+
+def test_scan_image_uses_result_cache(client, mocker):
+    mock_tesseract = mocker.patch('ocr_service.app.pytesseract.image_to_string')
+    mock_tesseract.return_value = 'Teks yang sama.'
+    mocker.patch('ocr_service.app.ingest_image')
+
+    for _ in range(2):
+        data = {
+            'image': (io.BytesIO(b"\x89PNG\r\n\x1a\nsameimagedata"), 'same.png')
+        }
+        rv = client.post('/scan', content_type='multipart/form-data', data=data)
+        assert rv.status_code == 200
+        assert rv.json == {'scannedText': 'Teks yang sama.'}
+
+    mock_tesseract.assert_called_once()
+
+
+def test_probes_answer_from_cached_self_test(client, mocker):
+    mock_tesseract = mocker.patch('ocr_service.app.pytesseract.image_to_string')
+    monitor = app.extensions['self_test_monitor']
+    # Label layanan eksplisit: di bawah gunicorn `__name__` setiap layanan adalah 'app'.
+    assert monitor.service_name == 'ocr-service'
+    mocker.patch.object(monitor, 'ensure_started')
+    mocker.patch.object(monitor, 'check_fn')
+
+    assert client.get('/livez').json == {'status': 'alive'}
+
+    monitor.run_once()
+
+    rv = client.get('/readyz')
+    assert rv.status_code == 200
+    assert rv.json['status'] == 'ready'
+    assert rv.json['selfTest']['ok'] is True
+    assert client.get('/health').json == {'status': 'healthy'}
+    mock_tesseract.assert_not_called()
+
+
+def test_engine_pool_reuses_bounded_engines():
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import MagicMock
+    from prometheus_client import CollectorRegistry
+    from engine_pool import TesseractEnginePool
+
+    engines = []
+
+    def factory():
+        engine = MagicMock()
+        engine.GetUTF8Text.return_value = 'teks'
+        engines.append(engine)
+        return engine
+
+    registry = CollectorRegistry()
+    pool = TesseractEnginePool(factory, size=2, registry=registry)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(pool.image_to_string, [object()] * 8))
+
+    assert results == ['teks'] * 8
+    assert 1 <= len(engines) <= 2
+    assert registry.get_sample_value('ocr_engine_created_total') == len(engines)
+    assert registry.get_sample_value('ocr_engine_wait_seconds_count') == 8
+    assert sum(engine.SetImage.call_count for engine in engines) == 8
+
+
+def test_engine_pool_retries_failed_engine_init_after_backoff():
+    """Gagal membuat engine tidak menonaktifkan pool selamanya; pembuatan dicoba lagi setelah backoff."""
+    import time
+    from unittest.mock import MagicMock
+    from engine_pool import EngineUnavailableError, TesseractEnginePool
+
+    attempts = []
+
+    def factory():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RuntimeError("tessdata not found")
+        engine = MagicMock()
+        engine.GetUTF8Text.return_value = 'teks'
+        return engine
+
+    pool = TesseractEnginePool(factory, size=1, retry_backoff=0.05)
+    for _ in range(2):
+        with pytest.raises(EngineUnavailableError):
+            pool.image_to_string(object())
+    assert len(attempts) == 1
+
+    time.sleep(0.06)
+    assert pool.image_to_string(object()) == 'teks'
+    assert len(attempts) == 2 and pool.last_error is None
+
+
+def test_preprocess_crops_text_regions():
+    from PIL import Image, ImageDraw
+    from preprocess import preprocess
+
+    image = Image.new('RGB', (1200, 900), (200, 180, 120))
+    draw = ImageDraw.Draw(image)
+    for i in range(3):
+        draw.text((100, 100 + i * 20), "Teks percobaan untuk OCR", fill=(0, 0, 0))
+
+    prepared = preprocess(image, 'balanced')
+
+    assert prepared.image.mode == 'L'
+    assert len(prepared.regions) >= 1
+    assert prepared.regions != [(0, 0, prepared.image.width, prepared.image.height)]
+
+
+def test_scan_rejects_invalid_profile(client):
+    data = {
+        'image': (io.BytesIO(b"\x89PNG\r\n\x1a\nfakeimagedata"), 'test.png'),
+        'profile': 'ultra'
+    }
+    rv = client.post('/scan', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 400
+
+
+def test_scan_sheds_load_when_admission_queue_is_full(client, mocker):
+    limiter = app.extensions['admission_limiters']['scan_endpoint']
+    mock_tesseract = mocker.patch('ocr_service.app.pytesseract.image_to_string')
+    mocker.patch.object(limiter, 'max_queue', 0)
+    mocker.patch.object(limiter, '_active', limiter.max_concurrent)
+
+    data = {
+        'image': (io.BytesIO(b"\x89PNG\r\n\x1a\nbusyimagedata"), 'busy.png')
+    }
+    rv = client.post('/scan', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 429
+    assert int(rv.headers['Retry-After']) >= 1
+    assert 'busy' in rv.json['message']
+    mock_tesseract.assert_not_called()
+
+
+def test_scan_async_job_returns_id_then_result(client, mocker):
+    mock_tesseract = mocker.patch('ocr_service.app.pytesseract.image_to_string')
+    mock_tesseract.return_value = 'Teks asinkron.'
+    mocker.patch('ocr_service.app.ingest_image')
+
+    data = {
+        'image': (io.BytesIO(b"\x89PNG\r\n\x1a\nasyncimagedata"), 'async.png')
+    }
+    rv = client.post('/scan?async=true', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 202
+    job_id = rv.json['jobId']
+    assert rv.headers['Location'].endswith(f'/jobs/{job_id}')
+
+    # Worker job berjalan di background thread; long-poll sampai selesai.
+    job = client.get(f'/jobs/{job_id}?wait=5').json
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'scannedText': 'Teks asinkron.'}
+    assert job['attempts'] == 1
+    assert job['runSeconds'] >= 0
+    assert client.get('/jobs/unknown').status_code == 404
@@ -1,27 +1,64 @@
-from flask import request, jsonify
+from flask import Response, request, stream_with_context
 from werkzeug.exceptions import BadRequest, InternalServerError, UnsupportedMediaType
+import json
 import logging
 import os
+import time
 import numpy as np
-import whisper
-import ffmpeg
+from prometheus_client import Counter, Histogram
+from audio import SAMPLE_RATE, decode_audio, trim_silence
+from backends import RemoteWhisperBackend, create_backend
+from chunking import ChunkedTranscriber, plan_chunks, stitch_segments
+from decoding import DEFAULT_LANGUAGE, DEFAULT_PROFILE, decode_options, parse_decode_options
+from common.app_factory import create_app, register_self_test
+from common.inference_server import client_from_env
+from common.jobs import JobQueue, accepted_response, register_job_routes, wants_async
+from common.model_registry import ModelRegistry, register_model_routes
+from common.result_cache import ResultCache
+from common.serialization import negotiated_response
+from common.stages import StageTimer
+from common.uploads import AUDIO_KINDS, upload_view
 
-from common.app_factory import create_app
-
-log_format = '%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] - %(message)s'
-logging.basicConfig(level=logging.INFO, format=log_format)
 logger = logging.getLogger(__name__)
 
-app, metrics = create_app(__name__)
+app, metrics = create_app(__name__, service_name='voice-transcriber', admission_limits={
+    'transcribe_endpoint': {'max_concurrent': 1, 'max_queue': 2, 'queue_timeout': 60},
+}, upload_limits={
+    # Audio panjang juga dapat dikirim langsung sebagai job asinkron, jadi batasnya lebih longgar.
+    'transcribe_endpoint': {'max_bytes': 100 * 1024 * 1024, 'kinds': AUDIO_KINDS},
+})
 
 model = None
 MODEL_TYPE = os.environ.get("WHISPER_MODEL", "base")
+# openai (PyTorch fp32) | openai-int8 (kuantisasi dinamis) | faster-whisper (CTranslate2)
+BACKEND_NAME = os.environ.get("WHISPER_BACKEND", "openai").lower()
+COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
+inference_client = client_from_env('voice-transcriber', 'backends:create_inference_handlers', config={
+    'backend_name': BACKEND_NAME, 'model_type': MODEL_TYPE, 'compute_type': COMPUTE_TYPE,
+})
+
+def load_variant(variant, model_type):
+    """Loader registry: satu varian Whisper (mis. small dari WHISPER_MODELS)."""
+    if inference_client is not None:
+        # Mode inference-server: model dimuat sekali per container, bukan per worker gunicorn.
+        return RemoteWhisperBackend(inference_client, variant)
+    return create_backend(BACKEND_NAME, model_type, compute_type=COMPUTE_TYPE)
+
+# Varian model (WHISPER_MODELS, WHISPER_DEFAULT_MODEL, WHISPER_MODEL_MEMORY_BUDGET_MB, dan
+# WHISPER_MODEL_ROUTES dengan profil decoding sebagai rute, mis. "fast=tiny,accurate=small");
+# tanpa konfigurasi, satu-satunya varian adalah WHISPER_MODEL. Lihat common.model_registry.
+model_registry = ModelRegistry.from_env('whisper', load_variant, 'WHISPER', MODEL_TYPE, metrics=metrics)
+
 try:
-    logger.info(f"Loading Whisper model: {MODEL_TYPE}")
-    model = whisper.load_model(MODEL_TYPE)
-    logger.info(f"Whisper model '{MODEL_TYPE}' loaded successfully.")
+    with app.extensions['startup'].phase('weight_load'):
+        if inference_client is not None:
+            inference_client.ensure_server()
+        model_registry.load()
+    # Proxy varian default: tidak menahan instance lama setelah hot-swap.
+    model = model_registry.bound()
+    logger.info(f"Whisper model '{MODEL_TYPE}' loaded successfully with backend '{BACKEND_NAME}'.")
 except Exception as e:
-    logger.error(f"FATAL: Failed to load Whisper model '{MODEL_TYPE}': {e}", exc_info=True)
+    logger.error(f"FATAL: Failed to load Whisper model '{MODEL_TYPE}' (backend '{BACKEND_NAME}'): {e}", exc_info=True)
 
 try:
     dummy_audio_segment = np.zeros(16000, dtype=np.float32)
@@ -30,40 +67,249 @@ except Exception as e:
     dummy_audio_segment = None
     logger.error(f"Failed to create dummy audio segment for health check: {e}", exc_info=True)
 
-metrics.info('app_info', 'Voice Transcriber Service Information', version='1.0.0', model_type=MODEL_TYPE)
+APP_VERSION = '1.0.0'
+
+result_cache = ResultCache.from_env('voice_transcribe', metrics)
+stages = StageTimer('voice_transcriber', metrics)
+
+VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'
+VAD_PADDING_SECONDS = float(os.environ.get('VAD_PADDING_SECONDS', 0.2))
+VAD_MIN_GAP_SECONDS = float(os.environ.get('VAD_MIN_GAP_SECONDS', 1.0))
+VAD_KEEP_GAP_SECONDS = float(os.environ.get('VAD_KEEP_GAP_SECONDS', 0.3))
+
+audio_seconds = Counter(
+    'transcribe_audio_seconds_total', 'Durasi audio yang diproses, sebelum dan sesudah pemangkasan hening',
+    ['stage'], registry=metrics.registry
+)
+decoder_total = Counter(
+    'transcribe_decoder_total', 'Upload audio per decoder (wav/soundfile di dalam proses, ffmpeg sebagai fallback)',
+    ['decoder'], registry=metrics.registry
+)
+realtime_factor = Histogram(
+    'transcribe_realtime_factor', 'Waktu inferensi dibagi durasi audio yang ditranskripsi, per profil decoding',
+    ['profile'], registry=metrics.registry,
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+)
+
+metrics.info('app_info', 'Voice Transcriber Service Information', version=APP_VERSION, model_type=MODEL_TYPE, backend=BACKEND_NAME)
+
+STREAM_FORMATS = {'sse': 'text/event-stream', 'ndjson': 'application/x-ndjson'}
+
+
+def _transcribe_local(audio, **options):
+    return model.transcribe(audio, **options)
+
+def backend_for(variant):
+    """Backend transkripsi untuk varian; varian default lewat `model`."""
+    return model if variant == model_registry.default else model_registry.bound(variant)
+
+
+CHUNK_THRESHOLD_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_THRESHOLD_SECONDS', 60))
+CHUNK_SECONDS = float(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 30))
+THREADS_PER_WORKER = int(os.environ.get('TRANSCRIBE_THREADS_PER_WORKER', 1))
+# Anggaran CPU dibagi rata antar worker gunicorn, lalu antar proses pool.
+CPU_BUDGET = int(os.environ.get('TRANSCRIBE_CPU_BUDGET', os.cpu_count() or 1))
+GUNICORN_WORKERS = int(os.environ.get('GUNICORN_WORKERS', 2))
+POOL_SIZE = int(os.environ.get(
+    'TRANSCRIBE_POOL_SIZE', max(1, CPU_BUDGET // max(1, GUNICORN_WORKERS) // max(1, THREADS_PER_WORKER))
+))
+if inference_client is not None:
+    # Potongan dikirim ke inference-server bersama; tidak ada model tambahan per worker.
+    POOL_SIZE = 0
+
+chunked_transcriber = ChunkedTranscriber(
+    BACKEND_NAME, MODEL_TYPE, compute_type=COMPUTE_TYPE, pool_size=POOL_SIZE,
+    threads_per_worker=THREADS_PER_WORKER, local_transcribe=_transcribe_local
+)
+
+def requested_stream_format():
+    """Format streaming dari parameter `stream` (sse|ndjson) atau header Accept; None = JSON biasa."""
+    fmt = (request.args.get('stream') or request.form.get('stream') or '').lower()
+    if fmt:
+        if fmt not in STREAM_FORMATS:
+            raise BadRequest(f"Invalid stream format '{fmt}'. Use one of: {', '.join(sorted(STREAM_FORMATS))}.")
+        return fmt
+    best = request.accept_mimetypes.best_match(['application/json'] + list(STREAM_FORMATS.values()))
+    for name, mimetype in STREAM_FORMATS.items():
+        if best == mimetype:
+            return name
+    return None
+
+def format_event(fmt, event, payload):
+    data = json.dumps(payload, ensure_ascii=False)
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {data}\n\n"
+    return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+def stream_response(fmt, events):
+    return Response(
+        stream_with_context(format_event(fmt, event, payload) for event, payload in events),
+        mimetype=STREAM_FORMATS[fmt],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def with_model_header(response, variant):
+    """Varian yang dipakai dikirim di header agar bentuk body JSON tidak berubah."""
+    response.headers['X-Model-Variant'] = variant
+    return response
+
+def observe_realtime_factor(profile, inference_seconds, audio_samples):
+    if audio_samples:
+        realtime_factor.labels(profile=profile).observe(inference_seconds / (audio_samples / SAMPLE_RATE))
+
+def transcribe_chunked(audio_np, speech_segments, filename, cache_key, profile, language, variant):
+    """
+    Transkripsi audio panjang per potongan (dipotong di batas hening, diproses paralel).
+    Menghasilkan event (nama, payload): 'start', satu 'segment' per segmen Whisper
+    dengan timestamp audio asli, lalu 'done' berisi hasil lengkap (atau 'error').
+    Process pool hanya memuat WHISPER_MODEL; varian lain diproses berurutan di proses ini.
+    """
+    chunks = plan_chunks(audio_np, speech_segments, max_chunk_s=CHUNK_SECONDS)
+    local = None
+    if model_registry.spec(variant) != chunked_transcriber.model_type:
+        local = backend_for(variant).transcribe
+    logger.info(
+        f"Transcribing '{filename}' in {len(chunks)} chunk(s) with pool size {0 if local else POOL_SIZE} "
+        f"(profile={profile}, model={variant})."
+    )
+    yield 'start', {"durationSeconds": round(len(audio_np) / SAMPLE_RATE, 3), "chunks": len(chunks), "profile": profile}
+
+    segments, languages = [], []
+    started = time.perf_counter()
+    try:
+        for index, chunk, result in chunked_transcriber.transcribe(
+            audio_np, chunks, decode_options(profile, language), local_transcribe=local
+        ):
+            if result.get("language"):
+                languages.append(result["language"])
+            for segment in stitch_segments(index, chunk, result):
+                segments.append(segment)
+                yield 'segment', segment
+    except Exception as e:
+        logger.error(f"Error during chunked transcription for '{filename}': {e}", exc_info=True)
+        yield 'error', {"error": f"Transcription failed: {e}"}
+        return
+
+    response = {
+        "transcribedText": " ".join(segment["text"] for segment in segments),
+        "language": max(set(languages), key=languages.count) if languages else "unknown",
+        "segments": segments,
+        "profile": profile,
+    }
+    observe_realtime_factor(profile, time.perf_counter() - started, sum(end - start for start, end in chunks))
+    logger.info(f"Chunked transcription complete for '{filename}'. Segments: {len(segments)}")
+    result_cache.set(cache_key, response)
+    yield 'done', response
+
+def replay_cached(response):
+    for segment in response.get("segments", []):
+        yield 'segment', segment
+    yield 'done', response
+
+def transcribe_cache_key(audio_bytes, profile, language, variant, stream=False):
+    return result_cache.make_key(
+        audio_bytes, model=f"whisper-{model_registry.spec(variant)}-{BACKEND_NAME}", version=APP_VERSION,
+        params={"vad": VAD_ENABLED, "stream": stream, "profile": profile, "language": language}
+    )
 
-def convert_audio_to_pcm(input_bytes: bytes) -> np.ndarray:
+def prepare_audio(audio_bytes, filename):
     """
-    Mengkonversi byte audio input ke format PCM 16kHz mono float32 NumPy array
-    menggunakan FFmpeg.
+    Men-decode audio ke PCM 16 kHz lalu memangkas hening (jika VAD aktif).
+    Mengembalikan (audio_np, speech_segments, trimmed_audio); trimmed_audio kosong
+    berarti tidak ada ucapan.
     """
+    logger.info(f"Converting audio '{filename}' to required format...")
     try:
-        logger.debug("Starting audio conversion with FFmpeg...")
-        out, err = (
-            ffmpeg
-            .input('pipe:0')
-            .output('pipe:1', format='s16le', acodec='pcm_s16le', ac=1, ar='16k')
-            .run(input=input_bytes, capture_stdout=True, capture_stderr=True, quiet=True)
+        with stages.stage('decode', bytes=len(audio_bytes)) as span:
+            decoded = decode_audio(audio_bytes)
+            span.set_attribute('decoder', decoded.decoder)
+        audio_np = decoded.audio
+    except RuntimeError as conversion_err:
+         logger.error(f"Audio conversion failed for '{filename}': {conversion_err}", exc_info=True)
+         raise InternalServerError(f"Failed to process audio file: {conversion_err}")
+    decoder_total.labels(decoder=decoded.decoder).inc()
+    audio_seconds.labels(stage='decoded').inc(len(audio_np) / SAMPLE_RATE)
+
+    speech_segments = [(0, len(audio_np))]
+    trimmed_audio = audio_np
+    if VAD_ENABLED:
+        with stages.stage('vad'):
+            trimmed = trim_silence(
+                audio_np, padding_s=VAD_PADDING_SECONDS,
+                min_gap_s=VAD_MIN_GAP_SECONDS, keep_gap_s=VAD_KEEP_GAP_SECONDS
+            )
+        logger.info(
+            f"Silence trimming for '{filename}': {len(audio_np) / SAMPLE_RATE:.2f}s -> "
+            f"{len(trimmed.audio) / SAMPLE_RATE:.2f}s in {len(trimmed.segments)} segment(s)."
         )
-        logger.debug("FFmpeg conversion finished.")
+        speech_segments, trimmed_audio = trimmed.segments, trimmed.audio
+        if len(trimmed_audio) == 0:
+            logger.info(f"No speech detected in '{filename}', skipping transcription.")
+    audio_seconds.labels(stage='transcribed').inc(len(trimmed_audio) / SAMPLE_RATE)
+    return audio_np, speech_segments, trimmed_audio
 
-        if err:
-             logger.warning(f"FFmpeg stderr during conversion: {err.decode('utf-8', errors='ignore')}")
+def transcribe_audio(audio_bytes, filename, profile=DEFAULT_PROFILE, language=DEFAULT_LANGUAGE, variant=None):
+    """
+    Transkripsi lengkap (non-streaming) dan mengembalikan respons JSON (dict).
+    Dipakai oleh endpoint sinkron maupun worker job asinkron.
+    """
+    variant = variant or model_registry.default
+    cache_key = transcribe_cache_key(audio_bytes, profile, language, variant)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Result cache hit for '{filename}'.")
+        return cached
 
-        if not out:
-             raise ValueError("FFmpeg produced no output.")
+    audio_np, speech_segments, trimmed_audio = prepare_audio(audio_bytes, filename)
+    if len(trimmed_audio) == 0:
+        response = {"transcribedText": "", "language": "unknown", "profile": profile}
+        result_cache.set(cache_key, response)
+        return response
 
-        audio_np = np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
-        logger.debug(f"Audio converted to NumPy array, shape: {audio_np.shape}")
-        return audio_np
+    if len(trimmed_audio) > CHUNK_THRESHOLD_SECONDS * SAMPLE_RATE:
+        with stages.stage('inference', audio_seconds=round(len(trimmed_audio) / SAMPLE_RATE, 3), chunked=True,
+                          profile=profile, model=variant):
+            for event, payload in transcribe_chunked(
+                audio_np, speech_segments, filename, cache_key, profile, language, variant
+            ):
+                if event == 'error':
+                    raise InternalServerError(payload["error"])
+                if event == 'done':
+                    return payload
 
-    except ffmpeg.Error as e:
-        stderr_output = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
-        logger.error(f"FFmpeg error during audio conversion: {e}. Stderr: {stderr_output}", exc_info=True)
-        raise RuntimeError(f"FFmpeg failed: {stderr_output}") from e
-    except Exception as e:
-        logger.error(f"Error converting audio to PCM: {e}", exc_info=True)
-        raise RuntimeError(f"Audio conversion failed: {e}") from e
+    logger.info(f"Performing transcription on audio '{filename}' using model '{variant}' (profile={profile})...")
+    try:
+        with stages.stage('inference', audio_seconds=round(len(trimmed_audio) / SAMPLE_RATE, 3), profile=profile,
+                          model=variant):
+            started = time.perf_counter()
+            result = backend_for(variant).transcribe(trimmed_audio, **decode_options(profile, language))
+            observe_realtime_factor(profile, time.perf_counter() - started, len(trimmed_audio))
+        transcribed_text = result.get("text", "")
+        detected_language = result.get("language", "unknown")
+        logger.info(f"Transcription complete for '{filename}'. Detected language: {detected_language}. Text length: {len(transcribed_text)}")
+    except Exception as whisper_err:
+         logger.error(f"Error during Whisper transcription for '{filename}': {whisper_err}", exc_info=True)
+         raise InternalServerError(f"Transcription failed: {whisper_err}")
+
+    response = {
+         "transcribedText": transcribed_text.strip(),
+         "language": detected_language,
+         "profile": profile
+    }
+    result_cache.set(cache_key, response)
+    return response
+
+def run_transcribe_job(audio_bytes, params):
+    """Handler job transkripsi asinkron."""
+    if model is None:
+        raise RuntimeError("Transcription service is unavailable (model not loaded).")
+    return transcribe_audio(
+        audio_bytes, params["filename"], params["profile"], params["language"], params.get("model")
+    )
+
+transcribe_jobs = JobQueue.from_env('voice_transcribe', metrics)
+transcribe_jobs.set_handler(run_transcribe_job)
+register_job_routes(app, transcribe_jobs)
 
 @app.route('/transcribe', methods=['POST'])
 @metrics.counter('transcribe_requests_total', 'Total number of /transcribe requests')
@@ -72,8 +318,20 @@ def convert_audio_to_pcm(input_bytes: bytes) -> np.ndarray:
 def transcribe_endpoint():
     """
     Endpoint untuk mentranskripsi file audio yang diunggah.
-    Menerima file audio melalui form-data dengan key 'audio'.
-    Mengembalikan teks hasil transkripsi dalam format JSON.
+    Menerima file audio melalui form-data dengan key 'audio'. Field opsional:
+    'profile' (fast/balanced/accurate, default WHISPER_DECODE_PROFILE), 'language'
+    (kode bahasa, default WHISPER_LANGUAGE; 'auto' untuk deteksi otomatis) dan 'model'
+    (varian dari WHISPER_MODELS; default mengikuti WHISPER_MODEL_ROUTES per profil).
+    Varian yang dipakai dikirim di header X-Model-Variant.
+    Mengembalikan teks hasil transkripsi dalam format JSON (atau MessagePack jika
+    header Accept meminta application/msgpack).
+
+    Audio panjang (> TRANSCRIBE_CHUNK_THRESHOLD_SECONDS) ditranskripsi per potongan
+    secara paralel dan respons menyertakan 'segments' bertimestamp. Dengan `stream=sse`
+    atau `stream=ndjson` (atau header Accept yang sesuai), segmen dikirim bertahap
+    begitu setiap potongan selesai. Dengan `?async=true` (atau `Prefer: respond-async`)
+    audio dimasukkan ke antrean job dan respons 202 berisi id job untuk di-poll di
+    /jobs/<id> (opsional 'callback_url' untuk menerima hasil).
     """
     if model is None:
         logger.error("Model is not loaded, cannot process /transcribe request.")
@@ -94,33 +352,48 @@ def transcribe_endpoint():
     if not content_type or not content_type.lower() in allowed_content_types:
          logger.warning(f"Potentially unsupported content type received: {content_type}")
 
+    stream_format = requested_stream_format()
+    profile, language = parse_decode_options(request.form)
+    variant = model_registry.select(request.form.get('model'), route=profile)
+
+    if wants_async():
+        if stream_format:
+            raise BadRequest("Streaming is not available for asynchronous jobs; poll the job or use callback_url.")
+        record = transcribe_jobs.submit(
+            bytes(upload_view(file)),
+            params={"filename": file.filename, "profile": profile, "language": language, "model": variant},
+            callback_url=request.form.get('callback_url')
+        )
+        return accepted_response(record)
+
     try:
-        audio_bytes = file.read()
+        with stages.stage('read'):
+            audio_bytes = upload_view(file)
         logger.info(f"Received audio file '{file.filename}' ({len(audio_bytes)} bytes) for transcription.")
 
-        logger.info(f"Converting audio '{file.filename}' to required format...")
-        try:
-            audio_np = convert_audio_to_pcm(audio_bytes)
-        except RuntimeError as conversion_err:
-             logger.error(f"Audio conversion failed for '{file.filename}': {conversion_err}", exc_info=True)
-             raise InternalServerError(f"Failed to process audio file: {conversion_err}")
-
-        logger.info(f"Performing transcription on audio '{file.filename}' using model '{MODEL_TYPE}'...")
-        try:
-            result = model.transcribe(audio_np)
-            transcribed_text = result.get("text", "")
-            detected_language = result.get("language", "unknown")
-            logger.info(f"Transcription complete for '{file.filename}'. Detected language: {detected_language}. Text length: {len(transcribed_text)}")
-        except Exception as whisper_err:
-             logger.error(f"Error during Whisper transcription for '{file.filename}': {whisper_err}", exc_info=True)
-             raise InternalServerError(f"Transcription failed: {whisper_err}")
-
-        return jsonify({
-             "transcribedText": transcribed_text.strip(),
-             "language": detected_language
-        })
-
-    except (BadRequest, UnsupportedMediaType) as http_err:
+        if not stream_format:
+            response = transcribe_audio(audio_bytes, file.filename, profile, language, variant)
+            with stages.stage('serialize'):
+                return with_model_header(negotiated_response(response), variant)
+
+        cache_key = transcribe_cache_key(audio_bytes, profile, language, variant, stream=True)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Result cache hit for '{file.filename}'.")
+            return with_model_header(stream_response(stream_format, replay_cached(cached)), variant)
+
+        audio_np, speech_segments, trimmed_audio = prepare_audio(audio_bytes, file.filename)
+        del audio_bytes
+        if len(trimmed_audio) == 0:
+            response = {"transcribedText": "", "language": "unknown", "segments": [], "profile": profile}
+            result_cache.set(cache_key, response)
+            return with_model_header(stream_response(stream_format, replay_cached(response)), variant)
+        return with_model_header(stream_response(
+            stream_format,
+            transcribe_chunked(audio_np, speech_segments, file.filename, cache_key, profile, language, variant)
+        ), variant)
+
+    except (BadRequest, UnsupportedMediaType, InternalServerError) as http_err:
         raise http_err
 
     except Exception as e:
@@ -128,28 +401,16 @@ def transcribe_endpoint():
         raise InternalServerError("An unexpected error occurred during audio transcription.")
 
 
-@app.route('/health', methods=['GET'])
-@metrics.do_not_track()
-def health_check():
-    """
-    Endpoint health check.
-    Memeriksa model Whisper dimuat DAN dapat melakukan inferensi.
-    """
+def run_self_test():
+    """Self-test berkala: memastikan model Whisper dimuat DAN dapat melakukan inferensi."""
     if model is None:
-        logger.error("Health check failed: Whisper model is not loaded.")
-        return jsonify({"status": "unhealthy", "reason": "Whisper model not loaded"}), 503
-
+        raise RuntimeError("Whisper model not loaded")
     if dummy_audio_segment is None:
-         logger.error("Health check failed: Dummy audio segment not created.")
-         return jsonify({"status": "unhealthy", "reason": "Health check setup failed"}), 503
+        raise RuntimeError("Health check setup failed")
+    model.transcribe(dummy_audio_segment, **decode_options(DEFAULT_PROFILE, DEFAULT_LANGUAGE))
 
-    try:
-        _ = model.transcribe(dummy_audio_segment, language="id")
-        logger.debug("Health check Whisper inference successful.")
-        return jsonify({"status": "healthy"}), 200
-    except Exception as e:
-        logger.error(f"Health check failed: Whisper inference error: {e}", exc_info=True)
-        return jsonify({"status": "unhealthy", "reason": f"Whisper inference failed: {e}"}), 503
+register_self_test(app, run_self_test)
+register_model_routes(app, model_registry)
 
 if __name__ == '__main__':
     host = os.environ.get('HOST', '0.0.0.0')
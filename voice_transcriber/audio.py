@@ -0,0 +1,385 @@
+import logging
+import math
+import struct
+import threading
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+import ffmpeg
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from common.uploads import BufferReader, sniff_kind
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # OSError: paket terpasang tetapi libsndfile tidak ditemukan.
+    soundfile = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+READ_CHUNK_BYTES = 256 * 1024
+WRITE_CHUNK_BYTES = 256 * 1024
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+# Filter resampler: jumlah zero-crossing sinc per sisi dan beta jendela Kaiser (~ -80 dB stopband).
+RESAMPLE_ZERO_CROSSINGS = 16
+RESAMPLE_KAISER_BETA = 8.0
+RESAMPLE_BLOCK_ROWS = 4096
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class TrimResult(NamedTuple):
+    audio: np.ndarray
+    segments: List[Tuple[int, int]]
+    original_samples: int
+
+
+class DecodedAudio(NamedTuple):
+    audio: np.ndarray
+    decoder: str  # 'wav' | 'soundfile' | 'ffmpeg'
+    source_rate: int
+
+
+class UnsupportedAudioError(ValueError):
+    """Audio tidak dapat di-decode di dalam proses (format/encoding tidak didukung)."""
+
+
+def _feed_stdin(stdin, source):
+    """Menulis input ke stdin ffmpeg secara bertahap dari bytes atau file-like."""
+    try:
+        if hasattr(source, 'read'):
+            while True:
+                chunk = source.read(WRITE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+        else:
+            view = memoryview(source)
+            for offset in range(0, len(view), WRITE_CHUNK_BYTES):
+                stdin.write(view[offset:offset + WRITE_CHUNK_BYTES])
+    except (BrokenPipeError, ValueError):
+        # ffmpeg berhenti lebih awal (mis. input rusak); error dilaporkan lewat exit code.
+        pass
+    finally:
+        try:
+            stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+
+def _drain(stream, sink):
+    sink.append(stream.read())
+
+
+def convert_audio_to_pcm(source, expected_samples=None) -> np.ndarray:
+    """
+    Mengkonversi audio input ke PCM 16kHz mono float32 NumPy array menggunakan FFmpeg,
+    secara streaming.
+
+    Input ditulis ke ffmpeg oleh thread terpisah sementara keluaran `s16le` dibaca per
+    chunk dan langsung dikonversi ke satu buffer float32 yang dialokasikan di awal,
+    sehingga tidak ada salinan penuh keluaran int16 maupun array perantara.
+    Args:
+        source (bytes | file-like): Isi file audio.
+        expected_samples (int, optional): Perkiraan jumlah sampel untuk alokasi awal.
+    Returns:
+        np.ndarray: Sampel float32 dalam rentang [-1, 1).
+    Raises:
+        RuntimeError: Jika FFmpeg gagal atau tidak menghasilkan keluaran.
+    """
+    if expected_samples is None:
+        size = len(source) if not hasattr(source, 'read') else 0
+        # ~2 sampel per byte input cukup untuk codec kompresi umum (>= 64 kbps); buffer diperbesar bila kurang.
+        expected_samples = max(SAMPLE_RATE * 5, size * 2)
+
+    try:
+        logger.debug("Starting streaming audio conversion with FFmpeg...")
+        process = (
+            ffmpeg
+            .input('pipe:0')
+            .output('pipe:1', format='s16le', acodec='pcm_s16le', ac=1, ar='16k')
+            .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True, quiet=True)
+        )
+    except Exception as e:
+        logger.error(f"Failed to start FFmpeg: {e}", exc_info=True)
+        raise RuntimeError(f"Audio conversion failed: {e}") from e
+
+    writer = threading.Thread(target=_feed_stdin, args=(process.stdin, source), daemon=True)
+    stderr_sink = []
+    stderr_reader = threading.Thread(target=_drain, args=(process.stderr, stderr_sink), daemon=True)
+    writer.start()
+    stderr_reader.start()
+
+    buffer = np.empty(int(expected_samples), dtype=np.float32)
+    filled = 0
+    remainder = b''
+    try:
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            if remainder:
+                chunk = remainder + chunk
+                remainder = b''
+            if len(chunk) % 2:
+                remainder = chunk[-1:]
+                chunk = chunk[:-1]
+
+            samples = np.frombuffer(chunk, dtype='<i2')
+            needed = filled + len(samples)
+            if needed > len(buffer):
+                grown = np.empty(max(needed, int(len(buffer) * 1.5)), dtype=np.float32)
+                grown[:filled] = buffer[:filled]
+                buffer = grown
+            np.multiply(samples, INT16_SCALE, out=buffer[filled:needed])
+            filled = needed
+    finally:
+        process.stdout.close()
+        return_code = process.wait()
+        writer.join()
+        stderr_reader.join()
+
+    stderr_output = b''.join(stderr_sink).decode('utf-8', errors='ignore')
+    if return_code != 0:
+        logger.error(f"FFmpeg error during audio conversion (exit {return_code}). Stderr: {stderr_output}")
+        raise RuntimeError(f"FFmpeg failed: {stderr_output or f'exit code {return_code}'}")
+    if stderr_output:
+        logger.debug(f"FFmpeg stderr during conversion: {stderr_output}")
+    if filled == 0:
+        raise RuntimeError("Audio conversion failed: FFmpeg produced no output.")
+
+    if len(buffer) > filled * 1.25:
+        # Lepaskan kapasitas berlebih agar memori sesuai panjang audio sebenarnya.
+        buffer = buffer[:filled].copy()
+    else:
+        buffer = buffer[:filled]
+    logger.debug(f"Audio converted to NumPy array, shape: {buffer.shape}")
+    return buffer
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up, down):
+    """
+    Tabel koefisien (phase x tap) sinc berjendela Kaiser untuk resampling rasional up/down.
+    Cutoff di Nyquist rate yang lebih rendah sehingga downsampling tidak menimbulkan aliasing.
+    """
+    cutoff = min(1.0, up / down)
+    half = int(math.ceil(RESAMPLE_ZERO_CROSSINGS / cutoff))
+    offsets = np.arange(-half + 1, half + 1)
+    distance = (np.arange(up)[:, None] / up) - offsets[None, :]
+    window = np.i0(RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1.0 - (distance / half) ** 2, 0.0, None)))
+    taps = cutoff * np.sinc(cutoff * distance) * window / np.i0(RESAMPLE_KAISER_BETA)
+    taps /= taps.sum(axis=1, keepdims=True)
+    return half, taps.astype(np.float32)
+
+
+def resample(audio, source_rate, target_rate=SAMPLE_RATE):
+    """
+    Resampling polyphase (rasio rasional) tanpa loop per sampel. Keluaran dengan fase yang
+    sama (setiap `up` sampel) dihitung sekaligus sebagai perkalian matriks-vektor atas view
+    jendela input yang di-stride, sehingga tidak ada salinan input per tap.
+    """
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    g = math.gcd(int(source_rate), int(target_rate))
+    up, down = int(target_rate) // g, int(source_rate) // g
+    half, taps = _polyphase_filter(up, down)
+
+    padded = np.zeros(len(audio) + 2 * half - 1, dtype=np.float32)
+    padded[half - 1:half - 1 + len(audio)] = audio
+    windows = sliding_window_view(padded, 2 * half)
+
+    out = np.empty(-(-len(audio) * up // down), dtype=np.float32)
+    for first in range(min(up, len(out))):
+        base, phase = divmod(first * down, up)
+        rows = windows[base::down][:len(range(first, len(out), up))]
+        target = out[first::up]
+        # Blok kecil disalin ke memori kontigu agar perkalian memakai BLAS (lebih cepat dari view ber-stride).
+        for start in range(0, len(rows), RESAMPLE_BLOCK_ROWS):
+            block = np.ascontiguousarray(rows[start:start + RESAMPLE_BLOCK_ROWS])
+            target[start:start + len(block)] = block @ taps[phase]
+    return out
+
+
+def _to_mono(frames, scale=None):
+    """(n, channels) -> float32 mono; `scale` mengubah sampel integer ke rentang [-1, 1)."""
+    channels = frames.shape[1]
+    if channels == 1:
+        mono = frames[:, 0]
+        if scale is None:
+            # Selalu salinan: hasil tidak boleh mereferensikan buffer upload.
+            return mono.astype(np.float32)
+        return np.multiply(mono, scale, dtype=np.float32)
+    mono = frames.sum(axis=1, dtype=np.float32)
+    mono *= np.float32((scale if scale is not None else 1.0) / channels)
+    return mono
+
+
+def _wav_chunks(view):
+    position = 12
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        (size,) = struct.unpack_from('<I', view, position + 4)
+        # Writer streaming (mis. ffmpeg ke pipe) menulis ukuran data 0xFFFFFFFF: dipotong ke sisa buffer.
+        yield chunk_id, view[position + 8:position + 8 + size]
+        position += 8 + size + (size & 1)
+
+
+def decode_wav(source):
+    """
+    Decode WAV (PCM 8/16/24/32-bit atau float 32/64-bit, termasuk WAVE_FORMAT_EXTENSIBLE)
+    langsung dari buffer ke (float32 mono, sample rate) tanpa menyalin sampel mentah.
+    Raises:
+        UnsupportedAudioError: Jika header tidak valid atau encoding tidak didukung.
+    """
+    view = memoryview(source).cast('B')
+    if len(view) < 12 or view[:4] != b'RIFF' or view[8:12] != b'WAVE':
+        raise UnsupportedAudioError("Not a RIFF/WAVE file.")
+
+    fmt = data = None
+    for chunk_id, body in _wav_chunks(view):
+        if chunk_id == b'fmt ' and len(body) >= 16:
+            tag, channels, rate, _, block_align, bits = struct.unpack_from('<HHIIHH', body)
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                (tag,) = struct.unpack_from('<H', body, 24)
+            fmt = (tag, channels, rate, block_align, bits)
+        elif chunk_id == b'data':
+            data = body
+            break
+    if fmt is None or data is None:
+        raise UnsupportedAudioError("WAV file is missing the fmt or data chunk.")
+
+    tag, channels, rate, block_align, bits = fmt
+    if channels < 1 or rate < 1 or block_align != channels * ((bits + 7) // 8):
+        raise UnsupportedAudioError(f"Invalid WAV format (channels={channels}, rate={rate}, bits={bits}).")
+    data = data[:len(data) - len(data) % block_align]
+
+    if tag == WAVE_FORMAT_PCM and bits == 16:
+        frames, scale = np.frombuffer(data, dtype='<i2'), INT16_SCALE
+    elif tag == WAVE_FORMAT_PCM and bits == 8:
+        frames = np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0
+        scale = np.float32(1.0 / 128.0)
+    elif tag == WAVE_FORMAT_PCM and bits == 24:
+        padded = np.zeros((len(data) // 3, 4), dtype=np.uint8)
+        padded[:, 1:] = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        frames, scale = padded.view('<i4')[:, 0] >> 8, np.float32(1.0 / 8388608.0)
+    elif tag == WAVE_FORMAT_PCM and bits == 32:
+        frames, scale = np.frombuffer(data, dtype='<i4'), np.float32(1.0 / 2147483648.0)
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        frames, scale = np.frombuffer(data, dtype='<f4' if bits == 32 else '<f8'), None
+    else:
+        raise UnsupportedAudioError(f"Unsupported WAV encoding (format tag {tag:#06x}, {bits}-bit).")
+    return _to_mono(frames.reshape(-1, channels), scale), rate
+
+
+def decode_soundfile(source):
+    """Decode FLAC/OGG (Vorbis/Opus) lewat libsndfile ke (float32 mono, sample rate)."""
+    if soundfile is None:
+        raise UnsupportedAudioError("soundfile (libsndfile) is not installed.")
+    try:
+        with BufferReader(source) as reader:
+            frames, rate = soundfile.read(reader, dtype='float32', always_2d=True)
+    except (RuntimeError, TypeError, ValueError) as e:
+        # soundfile.LibsndfileError turunan RuntimeError.
+        raise UnsupportedAudioError(f"libsndfile cannot decode audio: {e}") from e
+    return _to_mono(frames), rate
+
+
+IN_PROCESS_DECODERS = {
+    'wav': ('wav', decode_wav),
+    'flac': ('soundfile', decode_soundfile),
+    'ogg': ('soundfile', decode_soundfile),
+}
+
+
+def decode_audio(source, expected_samples=None) -> DecodedAudio:
+    """
+    Decode audio ke PCM 16 kHz mono float32. WAV/FLAC/OGG (dikenali dari magic bytes)
+    di-decode dan di-resample di dalam proses; format lain (m4a/aac/webm/mp3, ...) atau
+    file yang gagal di-decode di dalam proses diteruskan ke FFmpeg.
+    Raises:
+        RuntimeError: Jika FFmpeg gagal atau tidak menghasilkan keluaran.
+    """
+    kind = None if hasattr(source, 'read') else sniff_kind(source[:32])
+    if kind in IN_PROCESS_DECODERS:
+        decoder, decode = IN_PROCESS_DECODERS[kind]
+        try:
+            samples, rate = decode(source)
+            if len(samples):
+                return DecodedAudio(resample(samples, rate), decoder, rate)
+            logger.debug(f"In-process {kind} decode produced no samples; falling back to FFmpeg.")
+        except UnsupportedAudioError as e:
+            logger.debug(f"In-process {kind} decode unavailable, falling back to FFmpeg: {e}")
+    return DecodedAudio(convert_audio_to_pcm(source, expected_samples), 'ffmpeg', SAMPLE_RATE)
+
+
+def frame_energy_db(audio, frame_samples):
+    """Energi RMS (dBFS) per frame non-overlap, dihitung tanpa loop Python."""
+    n_frames = len(audio) // frame_samples
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    power = np.einsum('ij,ij->i', frames, frames) / frame_samples
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def trim_silence(audio, sample_rate=SAMPLE_RATE, frame_ms=30, padding_s=0.2,
+                 min_gap_s=1.0, keep_gap_s=0.3, floor_db=-50.0):
+    """
+    Membuang hening di awal dan akhir serta memendekkan jeda panjang berdasarkan energi.
+
+    Ambang bicara adaptif: max(floor_db, min(noise_floor + 10 dB, puncak - 20 dB)),
+    dengan noise floor = persentil ke-10 energi frame. Frame bicara diperlebar sebesar
+    `padding_s` di kedua sisi; jeda lebih dari `min_gap_s` dipendekkan menjadi `keep_gap_s`.
+    Returns:
+        TrimResult: Audio hasil (view jika hanya awal/akhir yang dipotong), daftar segmen
+        (start, end) dalam sampel audio asli yang dipertahankan, dan panjang asli.
+        Audio kosong dan segmen kosong berarti tidak ada suara yang terdeteksi.
+    """
+    total = len(audio)
+    frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(audio, frame_samples)
+    if len(energy) == 0:
+        return TrimResult(audio, [(0, total)], total)
+
+    noise_floor = float(np.percentile(energy, 10))
+    peak = float(energy.max())
+    threshold = max(floor_db, min(noise_floor + 10.0, peak - 20.0))
+    speech = energy > threshold
+    if not speech.any():
+        return TrimResult(audio[:0], [], total)
+
+    pad_frames = int(round(padding_s * 1000 / frame_ms))
+    if pad_frames > 0:
+        kernel = np.ones(2 * pad_frames + 1, dtype=np.int32)
+        speech = np.convolve(speech.astype(np.int32), kernel, mode='same') > 0
+
+    padded = np.concatenate(([0], speech.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[0::2] * frame_samples, edges[1::2] * frame_samples
+    if edges[-1] == len(speech):
+        # Sertakan sisa sampel setelah frame penuh terakhir.
+        ends[-1] = total
+
+    min_gap = int(min_gap_s * sample_rate)
+    keep_half = int(keep_gap_s * sample_rate) // 2
+    segments = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if segments and start - segments[-1][1] <= min_gap:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            if segments:
+                segments[-1] = (segments[-1][0], min(start, segments[-1][1] + keep_half))
+                start = max(segments[-1][1], start - keep_half)
+            segments.append((start, end))
+
+    if len(segments) == 1:
+        start, end = segments[0]
+        return TrimResult(audio[start:end], segments, total)
+    return TrimResult(np.concatenate([audio[start:end] for start, end in segments]), segments, total)
@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('openai', 'openai-int8', 'faster-whisper')
+
+
+def resolve_model(source, model_type):
+    """
+    Path lokal model: checkpoint (.pt) atau direktori CTranslate2 yang ada dipakai langsung,
+    selain itu nama model (mis. 'base') diambil dari model store (common.model_store).
+    """
+    if os.path.isfile(model_type) or os.path.isfile(os.path.join(model_type, 'model.bin')):
+        return model_type
+    from common.model_store import ModelStore
+
+    return ModelStore.from_env().resolve(source, model_type)
+
+
+class OpenAIWhisperBackend:
+    """Backend openai-whisper (PyTorch fp32 di CPU)."""
+
+    name = 'openai'
+
+    def __init__(self, model_type):
+        import torch
+        import whisper
+
+        self.model_type = model_type
+        self.model = whisper.load_model(resolve_model('openai-whisper', model_type))
+        self.fp16 = torch.cuda.is_available() and next(self.model.parameters()).is_cuda
+
+    def transcribe(self, audio, **options):
+        # Di CPU, fp16 tidak didukung; set eksplisit agar whisper tidak fallback sambil memberi warning.
+        options.setdefault('fp16', self.fp16)
+        if options.get('beam_size') == 1:
+            # openai-whisper: beam_size None = decoder greedy (beam 1 tetap memakai BeamSearchDecoder).
+            options.pop('beam_size')
+        result = self.model.transcribe(audio, **options)
+        return {
+            "text": result.get("text", ""),
+            "language": result.get("language", "unknown"),
+            "segments": [
+                {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+                for seg in result.get("segments", [])
+            ],
+        }
+
+
+class QuantizedWhisperBackend(OpenAIWhisperBackend):
+    """openai-whisper dengan layer Linear dikuantisasi dinamis ke int8 (torch.quantization)."""
+
+    name = 'openai-int8'
+
+    def __init__(self, model_type):
+        import torch
+
+        super().__init__(model_type)
+        self.model = torch.ao.quantization.quantize_dynamic(
+            _plain_linears(self.model.cpu()), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.fp16 = False
+
+
+def _plain_linears(module):
+    """
+    Whisper memakai subclass `whisper.model.Linear`, sedangkan quantize_dynamic hanya menukar
+    tipe yang persis `torch.nn.Linear`; ganti subclass itu dengan nn.Linear berbobot sama.
+    """
+    import torch
+
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _plain_linears(child)
+    return module
+
+
+class FasterWhisperBackend:
+    """Backend CTranslate2 (faster-whisper) dengan bobot int8."""
+
+    name = 'faster-whisper'
+
+    # Nama opsi openai-whisper yang juga diterima faster-whisper dengan arti yang sama.
+    SUPPORTED_OPTIONS = {
+        'language', 'task', 'beam_size', 'best_of', 'temperature', 'initial_prompt',
+        'condition_on_previous_text', 'no_speech_threshold', 'compression_ratio_threshold',
+        'word_timestamps',
+    }
+
+    def __init__(self, model_type, compute_type='int8', cpu_threads=0):
+        from faster_whisper import WhisperModel
+
+        self.model_type = model_type
+        self.model = WhisperModel(
+            resolve_model('faster-whisper', model_type), device='cpu', compute_type=compute_type, cpu_threads=cpu_threads
+        )
+
+    def transcribe(self, audio, **options):
+        if 'logprob_threshold' in options:
+            options['log_prob_threshold'] = options.pop('logprob_threshold')
+        unsupported = set(options) - self.SUPPORTED_OPTIONS - {'log_prob_threshold'}
+        for key in unsupported:
+            options.pop(key)
+
+        segments, info = self.model.transcribe(audio, **options)
+        segments = [
+            {"start": float(seg.start), "end": float(seg.end), "text": seg.text}
+            for seg in segments
+        ]
+        return {
+            "text": "".join(seg["text"] for seg in segments),
+            "language": info.language or "unknown",
+            "segments": segments,
+        }
+
+
+class RemoteWhisperBackend:
+    """
+    Backend di proses inference-server bersama; audio dikirim lewat shared memory.
+    `variant` memilih varian model di registry server (None = default server).
+    """
+
+    name = 'remote'
+
+    def __init__(self, client, variant=None):
+        self.client = client
+        self.variant = variant
+
+    def transcribe(self, audio, **options):
+        if self.variant:
+            options['model'] = self.variant
+        return self.client.call('transcribe', [audio], **options)
+
+
+def create_inference_handlers(threads=1, backend_name='openai', model_type='base', compute_type='int8'):
+    """
+    Factory untuk proses inference-server: memuat varian default sekali (varian lain dari
+    WHISPER_MODELS dimuat lazy di registry server) dan mengembalikan op 'transcribe'.
+    Transkripsi dijalankan satu per satu (hook kv-cache openai-whisper tidak thread-safe)
+    memakai seluruh thread yang dialokasikan untuk server.
+    """
+    from common.model_registry import ModelRegistry
+
+    registry = ModelRegistry.from_env(
+        'whisper_inference_server',
+        lambda variant, spec: create_backend(backend_name, spec, compute_type=compute_type, cpu_threads=threads),
+        'WHISPER', model_type
+    )
+    registry.load()
+    lock = threading.Lock()
+
+    def transcribe(arrays, model=None, **options):
+        with lock, registry.acquire(registry.select(model)) as backend:
+            return backend.transcribe(arrays[0], **options)
+
+    return {'transcribe': transcribe}
+
+
+def create_backend(name, model_type, compute_type='int8', cpu_threads=0):
+    """
+    Membuat backend transkripsi berdasarkan nama. Semua backend mengembalikan dict
+    {"text", "language", "segments": [{"start", "end", "text"}]} dari `transcribe`.
+    Raises:
+        ValueError: Jika nama backend tidak dikenal.
+    """
+    name = (name or 'openai').lower()
+    logger.info(f"Loading Whisper backend '{name}' (model={model_type})")
+    if name == 'openai':
+        return OpenAIWhisperBackend(model_type)
+    if name == 'openai-int8':
+        return QuantizedWhisperBackend(model_type)
+    if name == 'faster-whisper':
+        return FasterWhisperBackend(model_type, compute_type=compute_type, cpu_threads=cpu_threads)
+    raise ValueError(f"Unknown Whisper backend '{name}'. Use one of: {', '.join(BACKENDS)}.")
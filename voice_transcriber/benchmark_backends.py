@@ -0,0 +1,126 @@
+"""
+Benchmark backend transkripsi Whisper: real-time factor (RTF) dan memori per backend
+pada kumpulan sampel yang sama.
+
+Setiap backend dijalankan di proses terpisah agar angka memori tidak saling
+mempengaruhi. RTF = waktu proses / durasi audio (lebih kecil lebih baik).
+
+Contoh:
+    python benchmark_backends.py --model base --samples a.m4a b.wav --repeat 3
+    python benchmark_backends.py --backends openai faster-whisper --synthetic-seconds 30
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+
+from audio import SAMPLE_RATE, decode_audio
+from backends import BACKENDS
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+def _peak_rss_mb():
+    # ru_maxrss dalam KiB di Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_backend(backend_name, model_type, threads, samples, repeat, result_queue):
+    try:
+        import torch
+        from backends import create_backend
+
+        torch.set_num_threads(threads)
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        backend = create_backend(backend_name, model_type, cpu_threads=threads)
+        load_seconds = time.perf_counter() - started
+        rss_loaded = _rss_mb()
+
+        backend.transcribe(samples[0][1][:SAMPLE_RATE], language='id')
+
+        runs = []
+        for name, audio in samples:
+            duration = len(audio) / SAMPLE_RATE
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = backend.transcribe(audio)
+                elapsed = time.perf_counter() - started
+                runs.append({
+                    "sample": name, "audioSeconds": round(duration, 3), "seconds": round(elapsed, 3),
+                    "rtf": round(elapsed / duration, 4), "text": result["text"].strip()[:80],
+                })
+
+        total_audio = sum(r["audioSeconds"] for r in runs)
+        total_seconds = sum(r["seconds"] for r in runs)
+        result_queue.put({
+            "backend": backend_name,
+            "loadSeconds": round(load_seconds, 2),
+            "modelRssMb": round(rss_loaded - rss_before, 1),
+            "peakRssMb": round(_peak_rss_mb(), 1),
+            "rtf": round(total_seconds / total_audio, 4),
+            "rtfP95": round(float(np.percentile([r["rtf"] for r in runs], 95)), 4),
+            "runs": runs,
+        })
+    except Exception as e:
+        result_queue.put({"backend": backend_name, "error": f"{type(e).__name__}: {e}"})
+
+
+def load_samples(paths, synthetic_seconds):
+    samples = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            samples.append((path, decode_audio(f.read()).audio))
+    if not samples:
+        rng = np.random.default_rng(0)
+        t = np.arange(int(synthetic_seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        tone = 0.2 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+        samples.append((f"synthetic-{synthetic_seconds:g}s", (tone + 0.01 * rng.standard_normal(len(t))).astype(np.float32)))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--samples', nargs='*', default=[], help='File audio (format apa pun yang didukung FFmpeg)')
+    parser.add_argument('--synthetic-seconds', type=float, default=30.0, help='Dipakai jika --samples kosong')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='Simpan hasil lengkap ke file JSON')
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples, args.synthetic_seconds)
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for backend_name in args.backends:
+        result_queue = ctx.Queue()
+        process = ctx.Process(
+            target=_run_backend,
+            args=(backend_name, args.model, args.threads, samples, args.repeat, result_queue),
+        )
+        process.start()
+        results.append(result_queue.get())
+        process.join()
+
+    print(f"{'backend':<16}{'load s':>8}{'model MB':>10}{'peak MB':>10}{'RTF':>8}{'RTF p95':>9}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['backend']:<16}  error: {r['error']}")
+            continue
+        print(f"{r['backend']:<16}{r['loadSeconds']:>8}{r['modelRssMb']:>10}{r['peakRssMb']:>10}{r['rtf']:>8}{r['rtfP95']:>9}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({"model": args.model, "threads": args.threads, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark decode audio: jalur di dalam proses (WAV/FLAC/OGG + resampler numpy) dibanding
+FFmpeg (satu proses per request) per durasi klip dan format sumber.
+
+Klip sintetis dibuat offline; FLAC/OGG hanya diuji jika soundfile terpasang dan jalur
+FFmpeg dilewati jika binary `ffmpeg` tidak tersedia. Angka adalah median latensi (ms).
+
+Contoh:
+    python benchmark_decode.py --seconds 1 5 30 90 --repeat 10
+    python benchmark_decode.py --formats wav-16k-mono wav-44k-stereo --json decode.json
+"""
+import argparse
+import io
+import json
+import shutil
+import time
+import wave
+
+import numpy as np
+
+from audio import SAMPLE_RATE, convert_audio_to_pcm, decode_audio, soundfile
+
+# nama -> (container, sample rate, channel)
+FORMATS = {
+    'wav-16k-mono': ('wav', 16000, 1),
+    'wav-44k-stereo': ('wav', 44100, 2),
+    'wav-48k-mono': ('wav', 48000, 1),
+    'flac-44k-stereo': ('flac', 44100, 2),
+    'ogg-48k-mono': ('ogg', 48000, 1),
+}
+
+
+def synthesize(seconds, rate, channels, seed=0):
+    """Nada harmonik termodulasi (mirip ucapan) + derau, float32 (frames, channels)."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 2 * np.pi * np.cumsum(140 + 40 * np.sin(2 * np.pi * 0.7 * t)) / rate
+    voiced = sum(np.sin(k * pitch) / k for k in range(1, 5)) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+    mono = 0.2 * voiced + 0.005 * rng.standard_normal(len(t))
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.float32)
+
+
+def encode(samples, rate, container):
+    buffer = io.BytesIO()
+    if container == 'wav':
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(samples.shape[1])
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+    else:
+        soundfile.write(buffer, samples, rate, format=container.upper())
+    return buffer.getvalue()
+
+
+def measure(fn, repeat):
+    fn()  # warm-up (tabel filter resampler, cache halaman)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(float(np.median(timings)) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', nargs='+', type=float, default=[1, 5, 30, 90])
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', dest='json_path', help='Simpan hasil lengkap ke file JSON')
+    args = parser.parse_args()
+
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    results = []
+    for name in args.formats:
+        container, rate, channels = FORMATS[name]
+        if container != 'wav' and soundfile is None:
+            print(f"skip {name}: soundfile is not installed")
+            continue
+        for seconds in args.seconds:
+            data = encode(synthesize(seconds, rate, channels), rate, container)
+            decoded = decode_audio(memoryview(data))
+            row = {
+                "format": name, "seconds": seconds, "bytes": len(data), "decoder": decoded.decoder,
+                "inProcessMs": measure(lambda: decode_audio(memoryview(data)), args.repeat),
+                "ffmpegMs": measure(lambda: convert_audio_to_pcm(data), args.repeat) if has_ffmpeg else None,
+                "samples": len(decoded.audio),
+            }
+            if row["ffmpegMs"]:
+                row["speedup"] = round(row["ffmpegMs"] / max(row["inProcessMs"], 1e-3), 1)
+            results.append(row)
+
+    print(f"{'format':<18}{'seconds':>8}{'decoder':>11}{'in-proc ms':>12}{'ffmpeg ms':>11}{'speedup':>9}")
+    for r in results:
+        ffmpeg_ms = f"{r['ffmpegMs']:.2f}" if r['ffmpegMs'] is not None else '-'
+        print(f"{r['format']:<18}{r['seconds']:>8g}{r['decoder']:>11}{r['inProcessMs']:>12.2f}{ffmpeg_ms:>11}"
+              f"{r.get('speedup', '-'):>9}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({"sampleRate": SAMPLE_RATE, "ffmpeg": has_ffmpeg, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from audio import SAMPLE_RATE, frame_energy_db
+
+logger = logging.getLogger(__name__)
+
+_worker_model = None
+
+
+def plan_chunks(audio, speech_segments, sample_rate=SAMPLE_RATE, max_chunk_s=30.0, cut_search_s=5.0):
+    """
+    Membagi audio menjadi jendela transkripsi yang dipotong di batas hening.
+
+    Segmen bicara (hasil `trim_silence`) dikemas berurutan selama panjang jendela
+    <= `max_chunk_s`. Segmen yang lebih panjang dari itu dipotong di frame berenergi
+    terendah dalam `cut_search_s` detik terakhir sebelum batas jendela.
+    Returns:
+        list: Pasangan (start, end) dalam sampel audio asli.
+    """
+    max_len = int(max_chunk_s * sample_rate)
+    search_len = min(int(cut_search_s * sample_rate), max_len // 2)
+    frame = int(0.03 * sample_rate)
+
+    pieces = []
+    for start, end in speech_segments:
+        while end - start > max_len:
+            window_start = start + max_len - search_len
+            energy = frame_energy_db(audio[window_start:start + max_len], frame)
+            cut = window_start + int(np.argmin(energy)) * frame if len(energy) else start + max_len
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= max_len:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def _init_worker(backend_name, model_type, compute_type, threads):
+    """Initializer proses pool: batasi thread torch lalu muat backend sekali per proses."""
+    global _worker_model
+    import torch
+    from backends import create_backend
+
+    torch.set_num_threads(threads)
+    _worker_model = create_backend(backend_name, model_type, compute_type=compute_type, cpu_threads=threads)
+
+
+def _result_to_dict(result):
+    return {
+        "text": result.get("text", ""),
+        "language": result.get("language"),
+        "segments": [
+            {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+            for seg in result.get("segments", [])
+        ],
+    }
+
+
+def _transcribe_in_worker(audio, options):
+    return _result_to_dict(_worker_model.transcribe(audio, **options))
+
+
+class ChunkedTranscriber:
+    """
+    Mentranskripsi potongan audio secara paralel di process pool berisi model Whisper
+    sendiri-sendiri, dengan jumlah proses x thread per proses sesuai anggaran CPU.
+
+    Pool dibuat secara lazy (dan dibuat ulang setelah fork) dengan start method `spawn`,
+    sehingga aman untuk `gunicorn --preload`. Jika `pool_size` 0, potongan diproses
+    berurutan di thread pemanggil memakai `local_transcribe`.
+    """
+
+    def __init__(self, backend_name, model_type, pool_size, threads_per_worker=1, compute_type='int8',
+                 local_transcribe=None):
+        self.backend_name = backend_name
+        self.model_type = model_type
+        self.compute_type = compute_type
+        self.pool_size = int(pool_size)
+        self.threads_per_worker = int(threads_per_worker)
+        self.local_transcribe = local_transcribe
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                logger.info(
+                    f"Starting transcription process pool ({self.pool_size} x {self.threads_per_worker} thread(s), "
+                    f"backend={self.backend_name}, model={self.model_type})."
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.backend_name, self.model_type, self.compute_type, self.threads_per_worker),
+                )
+                self._pid = pid
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def transcribe(self, audio, chunks, options=None, local_transcribe=None):
+        """
+        Mentranskripsi setiap potongan dan menghasilkan (index, chunk, result) secara
+        berurutan begitu potongan tersebut selesai, sehingga teks awal dapat dikirim
+        sebelum seluruh audio selesai diproses. `local_transcribe` memaksa pemrosesan
+        berurutan dengan fungsi tersebut (mis. varian model yang tidak dimuat di pool).
+        """
+        options = dict(options or {})
+        if self.pool_size <= 0 or local_transcribe is not None:
+            local_transcribe = local_transcribe or self.local_transcribe
+            for index, (start, end) in enumerate(chunks):
+                yield index, (start, end), _result_to_dict(local_transcribe(audio[start:end], **options))
+            return
+
+        executor = self._get_executor()
+        futures = [executor.submit(_transcribe_in_worker, audio[start:end], options) for start, end in chunks]
+        try:
+            for index, (chunk, future) in enumerate(zip(chunks, futures)):
+                yield index, chunk, future.result()
+        except BrokenProcessPool as e:
+            self._reset()
+            raise RuntimeError(f"Transcription worker process crashed: {e}") from e
+        finally:
+            # Klien terputus atau error: jangan lanjutkan potongan yang belum dimulai.
+            for future in futures:
+                future.cancel()
+
+
+def stitch_segments(index, chunk, result, sample_rate=SAMPLE_RATE):
+    """Menggeser timestamp segmen Whisper dari waktu potongan ke waktu audio asli."""
+    offset = chunk[0] / sample_rate
+    segments = result["segments"] or [
+        {"start": 0.0, "end": (chunk[1] - chunk[0]) / sample_rate, "text": result["text"]}
+    ]
+    return [
+        {
+            "chunk": index,
+            "start": round(offset + seg["start"], 3),
+            "end": round(offset + seg["end"], 3),
+            "text": seg["text"].strip(),
+        }
+        for seg in segments
+        if seg["text"].strip()
+    ]
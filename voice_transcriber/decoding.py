@@ -0,0 +1,89 @@
+"""
+Profil decoding Whisper: menukar latensi dengan kualitas per request atau per deployment.
+
+Default Whisper (deteksi bahasa, beam search, tangga fallback temperature yang dapat
+men-decode ulang satu segmen beberapa kali) mahal di CPU. Profil mengatur:
+- `beam_size` / `best_of`: 1 = greedy;
+- `temperature`: satu nilai (tanpa fallback) atau tuple tangga fallback;
+- `condition_on_previous_text`: teks segmen sebelumnya sebagai prompt (lebih koheren,
+  tetapi lebih lambat dan rawan pengulangan);
+- `no_speech_threshold`: segmen dengan probabilitas hening di atas ambang dilewati.
+Petunjuk bahasa (default 'id') melewati pass deteksi bahasa; 'auto' = deteksi.
+"""
+import os
+import re
+
+from werkzeug.exceptions import BadRequest
+
+PROFILES = {
+    'fast': {
+        'beam_size': 1, 'best_of': 1, 'temperature': 0.0,
+        'condition_on_previous_text': False, 'no_speech_threshold': 0.6,
+    },
+    'balanced': {
+        'beam_size': 2, 'best_of': 2, 'temperature': (0.0, 0.4, 0.8),
+        'condition_on_previous_text': False, 'no_speech_threshold': 0.6,
+    },
+    'accurate': {
+        'beam_size': 5, 'best_of': 5, 'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': True, 'no_speech_threshold': 0.6,
+    },
+}
+
+AUTO_LANGUAGE = 'auto'
+_LANGUAGE_CODE = re.compile(r'^[a-z]{2,3}$')
+
+
+def _supported_languages():
+    """Kode bahasa yang dikenal Whisper; None jika paket Whisper tidak terpasang (hanya format yang diperiksa)."""
+    try:
+        from whisper.tokenizer import LANGUAGES
+        return frozenset(LANGUAGES)
+    except ImportError:
+        pass
+    try:
+        from faster_whisper.tokenizer import _LANGUAGE_CODES
+        return frozenset(_LANGUAGE_CODES)
+    except ImportError:
+        return None
+
+
+SUPPORTED_LANGUAGES = _supported_languages()
+
+
+def is_supported_language(language):
+    """'auto' atau kode bahasa yang didukung Whisper (mis. 'id', 'en', 'haw')."""
+    if language == AUTO_LANGUAGE:
+        return True
+    if SUPPORTED_LANGUAGES is not None:
+        return language in SUPPORTED_LANGUAGES
+    return bool(_LANGUAGE_CODE.match(language))
+
+
+DEFAULT_PROFILE = os.environ.get('WHISPER_DECODE_PROFILE', 'balanced').lower()
+DEFAULT_LANGUAGE = os.environ.get('WHISPER_LANGUAGE', 'id').lower()
+
+if DEFAULT_PROFILE not in PROFILES:
+    raise ValueError(f"Unknown WHISPER_DECODE_PROFILE '{DEFAULT_PROFILE}'. Known: {', '.join(PROFILES)}.")
+if not is_supported_language(DEFAULT_LANGUAGE):
+    raise ValueError(f"Unsupported WHISPER_LANGUAGE '{DEFAULT_LANGUAGE}'. Use a Whisper language code or 'auto'.")
+
+
+def parse_decode_options(form):
+    """Memvalidasi opsi decoding per request: 'profile' dan 'language' (kode bahasa Whisper atau 'auto')."""
+    profile = (form.get('profile') or DEFAULT_PROFILE).lower()
+    if profile not in PROFILES:
+        raise BadRequest(f"Invalid profile '{profile}'. Allowed: {', '.join(PROFILES)}")
+
+    language = (form.get('language') or DEFAULT_LANGUAGE).lower()
+    if not is_supported_language(language):
+        raise BadRequest(f"Unsupported language '{language}'. Use a Whisper language code (e.g. 'id') or 'auto'.")
+    return profile, language
+
+
+def decode_options(profile, language):
+    """Kwargs `transcribe` backend untuk profil dan petunjuk bahasa tertentu."""
+    options = dict(PROFILES[profile])
+    if language != AUTO_LANGUAGE:
+        options['language'] = language
+    return options
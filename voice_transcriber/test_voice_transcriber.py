@@ -1,6 +1,9 @@
 import pytest
 import io
+import numpy as np
 from voice_transcriber.app import app
+from audio import convert_audio_to_pcm, trim_silence
+from decoding import DEFAULT_PROFILE
 
 @pytest.fixture
 def client():
@@ -11,16 +14,281 @@ def client():
 def test_transcribe_success(client, mocker):
     """Test successful audio transcription."""
     mock_model = mocker.patch('voice_transcriber.app.model')
-    mock_model.transcribe.return_value = {'text': 'Ini adalah hasil transkripsi.'}
+    mock_model.transcribe.return_value = {'text': 'Ini adalah hasil transkripsi.', 'language': 'id'}
 
-    mock_process = mocker.Mock()
-    mock_process.run.return_value = (b'fake_processed_audio_bytes', None)
-    mocker.patch('voice_transcriber.app.ffmpeg.input').return_value.output.return_value = mock_process
+    mocker.patch('audio.convert_audio_to_pcm', return_value=np.full(16000, 0.1, dtype=np.float32))
 
     data = {
-        'audio': (io.BytesIO(b"fakeaudiodata"), 'test.mp3')
+        'audio': (io.BytesIO(b"ID3fakeaudiodata"), 'test.mp3')
     }
     rv = client.post('/transcribe', content_type='multipart/form-data', data=data)
 
     assert rv.status_code == 200
-    assert rv.json == {'transcribedText': 'Ini adalah hasil transkripsi.'}
\ No newline at end of file
+    assert rv.json == {'transcribedText': 'Ini adalah hasil transkripsi.', 'language': 'id', 'profile': DEFAULT_PROFILE}
+
+def test_convert_audio_streams_into_float_buffer(mocker):
+    """Keluaran s16le dibaca per chunk (termasuk batas byte ganjil) ke buffer float32."""
+    pcm = np.array([0, 16384, -16384, 32767, -32768] * 1000, dtype='<i2').tobytes()
+
+    class OddChunks(io.BytesIO):
+        def read(self, size=-1):
+            return super().read(777)
+
+    process = mocker.Mock()
+    process.stdin = io.BytesIO()
+    process.stdout = OddChunks(pcm)
+    process.stderr = io.BytesIO(b'')
+    process.wait.return_value = 0
+    mocker.patch('audio.ffmpeg.input').return_value.output.return_value.run_async.return_value = process
+
+    audio = convert_audio_to_pcm(b'fakeaudiodata', expected_samples=100)
+
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(audio, np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0)
+
+
+def test_trim_silence_removes_edges_and_long_gaps():
+    """Hening di awal/akhir dibuang dan jeda panjang dipendekkan."""
+    rate = 16000
+    rng = np.random.default_rng(0)
+    speech = (0.3 * rng.standard_normal(rate)).astype(np.float32)
+    silence = np.zeros(3 * rate, dtype=np.float32)
+    audio = np.concatenate([silence, speech, silence, speech, silence])
+
+    result = trim_silence(audio, padding_s=0.1, min_gap_s=1.0, keep_gap_s=0.3)
+
+    assert len(result.segments) == 2
+    assert result.original_samples == len(audio)
+    assert 2 * rate <= len(result.audio) <= 2.8 * rate
+    assert trim_silence(silence).segments == []
+
+
+def test_plan_chunks_cuts_long_speech_at_quietest_point():
+    """Segmen bicara panjang dipotong di titik paling hening dalam jendela pencarian."""
+    rate = 16000
+    audio = np.full(70 * rate, 0.3, dtype=np.float32)
+    audio[27 * rate:int(27.3 * rate)] = 0.0
+
+    from chunking import plan_chunks
+    chunks = plan_chunks(audio, [(0, len(audio))], max_chunk_s=30, cut_search_s=5)
+
+    assert chunks[0][0] == 0 and 27 * rate <= chunks[0][1] <= int(27.3 * rate)
+    assert chunks[-1][1] == len(audio)
+    assert all(end - start <= 30 * rate for start, end in chunks)
+
+
+def test_transcribe_streams_segments_as_ndjson(client, mocker):
+    """Mode streaming mengirim segmen per potongan dengan timestamp audio asli, lalu hasil akhir."""
+    import json
+    from voice_transcriber import app as app_module
+
+    mocker.patch('voice_transcriber.app.model')
+    mocker.patch.object(app_module.chunked_transcriber, 'pool_size', 0)
+    mocker.patch.object(
+        app_module.chunked_transcriber, 'local_transcribe',
+        side_effect=lambda audio, **kw: {
+            'text': ' halo', 'language': 'id', 'segments': [{'start': 1.0, 'end': 2.0, 'text': ' halo'}]
+        }
+    )
+    rng = np.random.default_rng(0)
+    mocker.patch(
+        'audio.convert_audio_to_pcm',
+        return_value=(0.3 * rng.standard_normal(45 * 16000)).astype(np.float32)
+    )
+
+    data = {'audio': (io.BytesIO(b"ID3streamaudiodata"), 'long.mp3')}
+    rv = client.post('/transcribe?stream=ndjson', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 200
+    assert rv.mimetype == 'application/x-ndjson'
+    events = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    assert [e['event'] for e in events] == ['start', 'segment', 'segment', 'done']
+    assert events[0]['chunks'] == 2
+    assert events[1]['start'] == 1.0 and events[2]['start'] > 30.0
+    assert events[-1]['transcribedText'] == 'halo halo'
+    assert events[-1]['language'] == 'id'
+
+
+def test_faster_whisper_backend_shares_response_contract(mocker):
+    """Backend CTranslate2 mengembalikan bentuk hasil yang sama dan membuang opsi yang tidak didukung."""
+    from types import SimpleNamespace
+    from backends import FasterWhisperBackend, create_backend
+
+    backend = FasterWhisperBackend.__new__(FasterWhisperBackend)
+    backend.model = mocker.Mock()
+    backend.model.transcribe.return_value = (
+        iter([SimpleNamespace(start=0.0, end=1.5, text=' Halo'), SimpleNamespace(start=1.5, end=2.0, text=' dunia')]),
+        SimpleNamespace(language='id'),
+    )
+
+    result = backend.transcribe(np.zeros(16000, dtype=np.float32), language='id', fp16=False, logprob_threshold=-1.0)
+
+    assert result == {
+        "text": " Halo dunia", "language": "id",
+        "segments": [{"start": 0.0, "end": 1.5, "text": " Halo"}, {"start": 1.5, "end": 2.0, "text": " dunia"}],
+    }
+    assert backend.model.transcribe.call_args.kwargs == {'language': 'id', 'log_prob_threshold': -1.0}
+    with pytest.raises(ValueError):
+        create_backend('tensorrt', 'base')
+
+
+def test_int8_backend_quantizes_whisper_linear_layers(mocker):
+    """Layer `whisper.model.Linear` benar-benar ditukar ke Linear int8 dinamis dan model tetap jalan."""
+    torch = pytest.importorskip('torch')
+    whisper = pytest.importorskip('whisper')
+    from whisper.model import ModelDimensions, Whisper
+    from backends import QuantizedWhisperBackend
+
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=16, n_audio_state=32, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=16, n_text_state=32, n_text_head=2, n_text_layer=1,
+    )
+    mocker.patch('backends.resolve_model', return_value='tiny.pt')
+    mocker.patch.object(whisper, 'load_model', return_value=Whisper(dims))
+
+    backend = QuantizedWhisperBackend('tiny')
+
+    linears = [m for m in backend.model.modules() if isinstance(m, torch.nn.Linear)]
+    quantized = [m for m in backend.model.modules() if isinstance(m, torch.ao.nn.quantized.dynamic.Linear)]
+    assert quantized and not linears
+    with torch.no_grad():
+        logits = backend.model(torch.zeros(1, 80, 32), torch.zeros(1, 4, dtype=torch.long))
+    assert logits.shape == (1, 4, dims.n_vocab)
+
+
+def test_job_is_requeued_when_worker_lease_expires():
+    """Job yang ditinggalkan worker (lease habis) diulang, lalu gagal setelah batas percobaan."""
+    from common.jobs import JobQueue, LocalJobBackend
+
+    backend = LocalJobBackend(ttl_seconds=60, lease_seconds=60)
+    jobs = JobQueue('test_jobs', backend, max_attempts=2)
+    jobs.set_handler(lambda payload, params: {"length": len(payload)})
+    record = jobs.submit(b'audio', params={"filename": "a.wav"})
+
+    # Worker "mati" setelah mengklaim job: lease tidak pernah diperpanjang.
+    job_id = backend.claim(0)
+    saved = jobs.get(job_id)
+    saved.update(status='running', attempts=1)
+    backend.save(saved)
+    backend._leases[job_id] = 0
+    jobs.reap()
+
+    assert jobs.get(record['id'])['status'] == 'queued'
+    assert jobs.run_once() is True
+    job = jobs.get(record['id'])
+    assert job['status'] == 'succeeded'
+    assert job['attempts'] == 2
+    assert job['result'] == {"length": 5}
+
+
+def test_transcribe_applies_decode_profile_and_language_hint(client, mocker):
+    """Profil decoding diteruskan ke model, bahasa tidak dideteksi ulang, dan profil dilaporkan."""
+    mock_model = mocker.patch('voice_transcriber.app.model')
+    mock_model.transcribe.return_value = {'text': ' Selamat pagi.', 'language': 'id'}
+    mocker.patch('audio.convert_audio_to_pcm', return_value=np.full(16000, 0.1, dtype=np.float32))
+
+    data = {'audio': (io.BytesIO(b"ID3profileaudio"), 'pagi.mp3'), 'profile': 'fast'}
+    rv = client.post('/transcribe', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 200
+    assert rv.json == {'transcribedText': 'Selamat pagi.', 'language': 'id', 'profile': 'fast'}
+    options = [c.kwargs for c in mock_model.transcribe.call_args_list if c.kwargs.get('beam_size') == 1]
+    assert options and options[-1]['language'] == 'id'
+    assert options[-1]['temperature'] == 0.0
+    assert options[-1]['condition_on_previous_text'] is False
+
+    data = {'audio': (io.BytesIO(b"ID3profileaudio"), 'pagi.mp3'), 'profile': 'ultra'}
+    assert client.post('/transcribe', content_type='multipart/form-data', data=data).status_code == 400
+    mocker.patch('decoding.SUPPORTED_LANGUAGES', frozenset({'id', 'en'}))
+    data = {'audio': (io.BytesIO(b"ID3profileaudio"), 'pagi.mp3'), 'language': 'xx'}
+    assert client.post('/transcribe', content_type='multipart/form-data', data=data).status_code == 400
+
+
+def test_invalid_decode_defaults_fail_at_import(monkeypatch):
+    """Profil atau bahasa default yang salah ketik menggagalkan startup, bukan setiap request."""
+    import importlib
+    import decoding
+
+    for env in ({'WHISPER_DECODE_PROFILE': 'fastest'}, {'WHISPER_LANGUAGE': 'indonesia'}):
+        with monkeypatch.context() as patch:
+            for key, value in env.items():
+                patch.setenv(key, value)
+            with pytest.raises(ValueError, match=next(iter(env))):
+                importlib.reload(decoding)
+    importlib.reload(decoding)
+    assert decoding.DEFAULT_PROFILE in decoding.PROFILES
+
+
+def test_decode_audio_handles_wav_in_process_and_falls_back_to_ffmpeg(mocker):
+    """WAV 44.1 kHz stereo di-decode dan di-resample tanpa FFmpeg; m4a tetap lewat FFmpeg."""
+    import wave
+    from audio import decode_audio
+
+    rate = 44100
+    tone = np.sin(2 * np.pi * 440 * np.arange(rate) / rate)
+    stereo = np.stack([tone, tone], axis=1) * 0.5
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((stereo * 32767).astype('<i2').tobytes())
+    ffmpeg_decode = mocker.patch('audio.convert_audio_to_pcm', return_value=np.zeros(16000, dtype=np.float32))
+
+    decoded = decode_audio(memoryview(buffer.getvalue()))
+
+    assert (decoded.decoder, decoded.source_rate) == ('wav', rate)
+    assert decoded.audio.dtype == np.float32 and len(decoded.audio) == 16000
+    expected = 0.5 * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000)
+    np.testing.assert_allclose(decoded.audio[200:-200], expected[200:-200], atol=2e-3)
+    ffmpeg_decode.assert_not_called()
+
+    assert decode_audio(b'\0\0\0\x20ftypM4A fakeaudio').decoder == 'ffmpeg'
+    ffmpeg_decode.assert_called_once()
+
+
+def test_model_store_fetches_once_verifies_and_respects_offline(tmp_path):
+    """Artefak diunduh sekali ke store, diverifikasi checksum-nya, dan tidak diunduh saat offline."""
+    from common.model_store import ModelArtifactError, ModelStore
+
+    fetched = []
+
+    def fetch(name, directory):
+        fetched.append(name)
+        path = tmp_path / 'download' / f"{name}.pt"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'weights-' + name.encode())
+        return str(path)
+
+    with pytest.raises(ModelArtifactError):
+        ModelStore(str(tmp_path / 'store'), offline=True).resolve('openai-whisper', 'base', fetch=fetch)
+
+    store = ModelStore(str(tmp_path / 'store'))
+    path = store.resolve('openai-whisper', 'base', fetch=fetch)
+    assert open(path, 'rb').read() == b'weights-base'
+    assert store.resolve('openai-whisper', 'base', fetch=fetch) == path
+    assert fetched == ['base']
+    assert ModelStore(str(tmp_path / 'store'), offline=True).resolve('openai-whisper', 'base') == path
+
+    with open(path, 'wb') as f:
+        f.write(b'weights-BASE')
+    assert 'checksum' in store.verify_all()['openai-whisper/base']
+    with pytest.raises(ModelArtifactError):
+        ModelStore(str(tmp_path / 'store'), offline=True).resolve('openai-whisper', 'base')
+
+
+def test_startup_phases_are_exported_as_metrics(mocker):
+    from voice_transcriber.app import metrics
+
+    def phase(name):
+        return metrics.registry.get_sample_value('service_startup_phase_seconds', {'phase': name})
+
+    assert phase('imports') > 0
+    assert phase('app_factory') > 0
+    assert phase('weight_load') is not None
+
+    startup = app.extensions['startup']
+    mocker.patch.object(startup, '_warm_pid', None)
+    startup.mark_warm(0.25)
+    assert phase('warmup') == 0.25
+    assert phase('ready') >= phase('imports')
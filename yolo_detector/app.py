@@ -1,26 +1,76 @@
-from flask import request, jsonify
+from flask import Response, g, request, stream_with_context
 from werkzeug.exceptions import BadRequest, InternalServerError, UnsupportedMediaType
 from PIL import Image
-import io
+from prometheus_client import Counter
+import json
 import logging
 import os
+import threading
+import time
 
-from common.app_factory import create_app
-from detect import detect_objects_from_image, load_model
+from common.app_factory import create_app, register_self_test
+from common.image_ingest import InvalidImageError, ImageTooLargeError, ingest_image
+from common.model_registry import ModelRegistry, register_model_routes
+from common.result_cache import ResultCache
+from common.serialization import columnar_detections, columnar_header, negotiated_response
+from common.stages import StageTimer
+from common.uploads import upload_view
+from common.inference_server import client_from_env
+from detect import RemoteYOLO, detect_objects_from_image, detect_objects_from_images, load_model, predict_grouped
+from inference_params import DEFAULT_PRESET, PRESETS, adapt_to_load, parse_inference_params
+from batching import MicroBatcher
+from stream import FrameBuffer, FrameSession, FrameStreamError, IouTracker, read_frames
 
-log_format = '%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] - %(message)s'
-logging.basicConfig(level=logging.INFO, format=log_format)
 logger = logging.getLogger(__name__)
 
-app, metrics = create_app(__name__)
+app, metrics = create_app(__name__, service_name='yolo-detector', admission_limits={
+    # /detect digabung oleh micro-batcher, jadi boleh lebih banyak yang berjalan bersamaan.
+    'detect_endpoint': {'max_concurrent': 4, 'max_queue': 16, 'queue_timeout': 30},
+    'detect_batch_endpoint': {'max_concurrent': 1, 'max_queue': 4, 'queue_timeout': 30},
+    # Satu slot = satu koneksi kamera yang terbuka; tidak ada antrean untuk aliran baru.
+    'detect_stream_endpoint': {'max_concurrent': 4, 'max_queue': 0, 'queue_timeout': 1},
+}, upload_limits={
+    # Gateway menerima file hingga 25 MB; sisa 1 MB untuk overhead multipart.
+    'detect_endpoint': {'max_bytes': 26 * 1024 * 1024, 'kinds': {'jpeg', 'png', 'bmp', 'webp'}},
+    'detect_batch_endpoint': {'max_bytes': 64 * 1024 * 1024, 'kinds': {'jpeg', 'png', 'bmp', 'webp'}},
+})
 
+MODEL_NAME = os.environ.get('YOLO_MODEL', 'yolov8n.pt')
+# torch (ultralytics/PyTorch) | onnx (ONNX Runtime) | openvino
+MODEL_BACKEND = os.environ.get('YOLO_BACKEND', 'torch').lower()
+MODEL_IMGSZ = int(os.environ.get('YOLO_IMGSZ', 640))
+EXPORT_DIR = os.environ.get('YOLO_EXPORT_DIR')
+INFERENCE_THREADS = int(os.environ.get('YOLO_INFERENCE_THREADS', 0))
+APP_VERSION = '1.0.0'
+
+inference_client = client_from_env('yolo-detector', 'detect:create_inference_handlers', config={
+    'model_name': MODEL_NAME, 'backend': MODEL_BACKEND, 'imgsz': MODEL_IMGSZ, 'export_dir': EXPORT_DIR,
+})
+
+def load_variant(variant, weights):
+    """Loader registry: satu varian YOLO (mis. yolov8s=yolov8s.pt dari YOLO_MODELS)."""
+    if inference_client is not None:
+        # Mode inference-server: model dimuat sekali per container, bukan per worker gunicorn.
+        return RemoteYOLO(inference_client, variant)
+    loaded = load_model(weights, backend=MODEL_BACKEND, imgsz=MODEL_IMGSZ, export_dir=EXPORT_DIR, threads=INFERENCE_THREADS)
+    if loaded is None:
+        raise RuntimeError(f"load_model returned None for '{weights}'. Check detect.py.")
+    return loaded
+
+# Varian model (YOLO_MODELS, YOLO_DEFAULT_MODEL, YOLO_MODEL_MEMORY_BUDGET_MB, YOLO_MODEL_ROUTES);
+# tanpa konfigurasi, satu-satunya varian adalah YOLO_MODEL. Lihat common.model_registry.
+model_registry = ModelRegistry.from_env('yolo', load_variant, 'YOLO', MODEL_NAME, metrics=metrics)
+
+# Varian default (proxy registry, tidak menahan instance lama setelah hot-swap); None berarti
+# model gagal dimuat saat startup dan layanan tidak dapat melayani request.
 model = None
 try:
-    model = load_model()
-    if model:
-        logger.info("YOLO model loaded successfully.")
-    else:
-        logger.error("FATAL: load_model function returned None. Check detect.py.")
+    with app.extensions['startup'].phase('weight_load'):
+        if inference_client is not None:
+            inference_client.ensure_server()
+        model_registry.load()
+    model = model_registry.bound()
+    logger.info(f"YOLO model '{model_registry.default}' loaded successfully.")
 except Exception as e:
     logger.error(f"FATAL: Failed to load YOLO model during startup: {e}", exc_info=True)
 
@@ -31,7 +81,221 @@ except Exception as e:
     dummy_image = None
     logger.error(f"Failed to create dummy image for health check: {e}", exc_info=True)
 
-metrics.info('app_info', 'YOLO Detector Service Information', version='1.0.0')
+stages = StageTimer('yolo_detector', metrics)
+
+BATCHING_ENABLED = os.environ.get('YOLO_BATCHING_ENABLED', 'true').lower() == 'true'
+BATCH_MAX_SIZE = int(os.environ.get('YOLO_BATCH_MAX_SIZE', 8))
+BATCH_WINDOW_MS = float(os.environ.get('YOLO_BATCH_WINDOW_MS', 10))
+
+def detect_with_variant(items, variant):
+    """
+    Satu batch (gambar, InferenceParams) memakai varian `variant` yang dipinjam dari registry;
+    satu forward pass per kombinasi parameter di dalam batch.
+    """
+    with model_registry.acquire(variant) as loaded:
+        return predict_grouped(
+            items, lambda images, params: detect_objects_from_images(images, loaded, stages=stages, params=params)
+        )
+
+# Satu MicroBatcher per varian (dibuat saat varian pertama kali dipakai): satu batch = satu model.
+detection_batchers = {}
+detection_batchers_lock = threading.Lock()
+
+def batcher_for(variant):
+    with detection_batchers_lock:
+        if variant not in detection_batchers:
+            detection_batchers[variant] = MicroBatcher(
+                lambda items: detect_with_variant(items, variant),
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_WINDOW_MS,
+                name='yolo_detect' if variant == model_registry.default else f'yolo_detect_{variant}'
+            )
+        return detection_batchers[variant]
+
+if BATCHING_ENABLED and BATCH_MAX_SIZE > 1:
+    logger.info(f"Micro-batching enabled for /detect (max_batch_size={BATCH_MAX_SIZE}, window_ms={BATCH_WINDOW_MS}).")
+
+result_cache = ResultCache.from_env('yolo_detect', metrics)
+
+metrics.info('app_info', 'YOLO Detector Service Information', version=APP_VERSION, backend=MODEL_BACKEND)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp'}
+ALLOWED_FORMATS = {'PNG', 'JPEG', 'MPO', 'BMP', 'WEBP'}
+INGEST_MAX_SIDE = int(os.environ.get('YOLO_INGEST_MAX_SIDE', MODEL_IMGSZ))
+MAX_BATCH_IMAGES = int(os.environ.get('YOLO_MAX_BATCH_IMAGES', 16))
+
+STREAM_MAX_FRAME_BYTES = int(os.environ.get('YOLO_STREAM_MAX_FRAME_BYTES', 2 * 1024 * 1024))
+STREAM_MAX_FRAMES = int(os.environ.get('YOLO_STREAM_MAX_FRAMES', 36000))
+STREAM_MAX_PENDING = int(os.environ.get('YOLO_STREAM_MAX_PENDING', 8))
+STREAM_IDLE_TIMEOUT_SECONDS = float(os.environ.get('YOLO_STREAM_IDLE_TIMEOUT_SECONDS', 30))
+STREAM_DIFF_THRESHOLD = float(os.environ.get('YOLO_STREAM_DIFF_THRESHOLD', 0.02))
+STREAM_KEYFRAME_INTERVAL = int(os.environ.get('YOLO_STREAM_KEYFRAME_INTERVAL', 15))
+
+inference_presets = Counter(
+    'detect_inference_preset_total', 'Request deteksi menurut preset inferensi (adaptive=true jika dipilih karena beban)',
+    ['preset', 'adaptive'], registry=metrics.registry
+)
+stream_frames = Counter(
+    'detect_stream_frames_total', 'Frame aliran kamera menurut hasil (inferred, static, backlog, error)',
+    ['outcome'], registry=metrics.registry
+)
+
+def validate_image_file(file, endpoint):
+    """Memvalidasi nama file, content type, dan ekstensi dari file gambar yang diunggah."""
+    if not file.filename:
+        logger.warning(f"Request to {endpoint} submitted an empty filename.")
+        raise BadRequest("No selected file or empty filename provided.")
+
+    content_type = file.content_type
+    file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
+
+    if not content_type or not content_type.startswith('image/') or file_ext not in ALLOWED_EXTENSIONS:
+        logger.warning(f"Invalid content type or extension received: {content_type}, ext: {file_ext}")
+        raise UnsupportedMediaType(
+            f"Unsupported file type: '{content_type}' or extension: '{file_ext}'. "
+            f"Allowed extensions: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+def ingest_side(params):
+    """Sisi decode untuk imgsz request: YOLO_INGEST_MAX_SIDE diskalakan dengan imgsz / YOLO_IMGSZ."""
+    if not INGEST_MAX_SIDE or params is None:
+        return INGEST_MAX_SIDE
+    return max(1, round(INGEST_MAX_SIDE * params.imgsz / MODEL_IMGSZ))
+
+def decode_image(image_bytes, filename, max_side=INGEST_MAX_SIDE):
+    """
+    Memvalidasi dan men-decode byte gambar yang diunggah dalam satu kali jalan.
+    Gambar langsung di-decode mendekati resolusi input model (`max_side`, default
+    YOLO_INGEST_MAX_SIDE); bbox tetap dinormalisasi terhadap ukuran hasil decode
+    sehingga hasilnya tidak berubah.
+    """
+    try:
+        ingested = ingest_image(
+            image_bytes,
+            max_side=max_side or None,
+            mode='RGB',
+            allowed_formats=ALLOWED_FORMATS
+        )
+        logger.debug(
+            f"Image '{filename}' decoded at {ingested.image.size} (original {ingested.original_size})."
+        )
+    except ImageTooLargeError as img_err:
+        logger.warning(f"Image too large received ('{filename}'): {img_err}")
+        raise BadRequest(f"Image too large: {img_err}")
+    except InvalidImageError as img_err:
+        logger.warning(f"Invalid or corrupted image file received ('{filename}'): {img_err}")
+        raise BadRequest(f"Invalid or corrupted image file: {img_err}")
+
+    return ingested.image
+
+def cache_key_for(image_bytes, variant, params):
+    """Kunci cache hasil deteksi untuk payload gambar, versi varian model, dan parameter inferensi."""
+    return result_cache.make_key(
+        image_bytes, model=model_registry.spec(variant), version=APP_VERSION,
+        params={'ingest_max_side': ingest_side(params), 'backend': MODEL_BACKEND, **params._asdict()}
+    )
+
+def run_detection(images, variant=None, params=None):
+    """
+    Menjalankan deteksi untuk satu atau beberapa gambar dengan varian model `variant`
+    (None = default) dan parameter inferensi `params` (None = default model). Jika
+    micro-batching aktif, setiap gambar dimasukkan ke batcher varian tersebut sehingga
+    dapat digabung dengan request lain; jika tidak, seluruh gambar diproses dalam satu batch.
+    """
+    variant = variant or model_registry.default
+    if BATCHING_ENABLED and BATCH_MAX_SIZE > 1:
+        batcher = batcher_for(variant)
+        futures = [batcher.submit((img, params)) for img in images]
+        return [future.result() for future in futures]
+    with model_registry.acquire(variant) as loaded:
+        if len(images) == 1:
+            return [detect_objects_from_image(images[0], loaded, stages=stages, params=params)]
+        return detect_objects_from_images(images, loaded, stages=stages, params=params)
+
+def requested_variant(route):
+    """Varian model dari field/parameter 'model', atau aturan routing `route` (YOLO_MODEL_ROUTES)."""
+    return model_registry.select(request.values.get('model'), route=route)
+
+def class_ids(variant):
+    """{nama kelas (huruf kecil): id} dari varian model, untuk parameter 'classes' berupa nama."""
+    with model_registry.acquire(variant) as loaded:
+        return {str(name).lower(): int(class_id) for class_id, name in loaded.names.items()}
+
+# Endpoint yang bebannya dihitung mode adaptif; koneksi /detect/stream yang berumur panjang tidak.
+ADAPTIVE_LOAD_ENDPOINTS = ('detect_endpoint', 'detect_batch_endpoint')
+
+def detection_load():
+    """
+    Jumlah request /detect dan /detect/batch yang berjalan atau mengantre di proses ini,
+    tidak termasuk request pemanggil. Tanpa admission control: kedalaman antrean micro-batcher.
+    """
+    limiters = app.extensions.get('admission_limiters', {})
+    counted = [limiters[endpoint] for endpoint in ADAPTIVE_LOAD_ENDPOINTS if endpoint in limiters]
+    if not counted:
+        with detection_batchers_lock:
+            return sum(batcher.pending() for batcher in detection_batchers.values())
+    admission = g.get('admission')
+    own = 1 if admission is not None and admission[0] in counted else 0
+    return sum(limiter.in_flight() for limiter in counted) - own
+
+def requested_inference(values, variant):
+    """
+    Preset dan parameter inferensi request (lihat inference_params); tanpa pilihan eksplisit,
+    mode adaptif dapat memilih preset lebih murah jika request detect lain yang berjalan atau
+    mengantre di proses ini melewati ambang.
+    """
+    preset, params, explicit = parse_inference_params(values, class_names=lambda: class_ids(variant))
+    in_flight = detection_load()
+    preset, params, adapted = adapt_to_load(preset, params, explicit, in_flight)
+    if adapted:
+        logger.info(f"Adaptive inference: {in_flight} request(s) in flight, using preset '{preset}'.")
+    inference_presets.labels(preset=preset, adaptive=str(adapted).lower()).inc()
+    return preset, params
+
+def with_inference_headers(response, variant, preset):
+    """Varian model dan preset yang dipakai dikirim di header agar bentuk body JSON tidak berubah."""
+    response.headers['X-Model-Variant'] = variant
+    response.headers['X-Inference-Preset'] = preset
+    return response
+
+def detect_uploads(uploads, variant, params):
+    """
+    Mendeteksi objek untuk daftar upload (filename, image_bytes) dengan varian `variant`
+    dan parameter inferensi `params`.
+    Hasil diambil dari cache jika payload yang sama sudah pernah diproses; hanya
+    gambar yang belum ada di cache yang di-decode dan dijalankan melalui model.
+    """
+    keys = [cache_key_for(image_bytes, variant, params) for _, image_bytes in uploads]
+    results = [result_cache.get(key) for key in keys]
+
+    pending = [i for i, cached in enumerate(results) if cached is None]
+    if len(pending) < len(uploads):
+        logger.info(f"Result cache hit for {len(uploads) - len(pending)} of {len(uploads)} image(s).")
+
+    if pending:
+        with stages.stage('decode', images=len(pending)):
+            images = [decode_image(uploads[i][1], uploads[i][0], ingest_side(params)) for i in pending]
+        with stages.stage('inference', images=len(images), model=variant, imgsz=params.imgsz):
+            outputs = run_detection(images, variant, params)
+        for i, detections in zip(pending, outputs):
+            results[i] = detections
+            result_cache.set(keys[i], detections)
+
+    return results
+
+def compact_detections(detections):
+    """Bentuk kolomnar MessagePack untuk respons /detect."""
+    classes, (columns,) = columnar_detections([detections])
+    return {**columnar_header(classes), **columns}
+
+def compact_batch(payload):
+    """Bentuk kolomnar MessagePack untuk respons /detect/batch (satu tabel kelas untuk semua gambar)."""
+    results = payload["results"]
+    classes, columns = columnar_detections([result["detections"] for result in results])
+    return {
+        **columnar_header(classes),
+        "results": [{"filename": result["filename"], **column} for result, column in zip(results, columns)],
+    }
 
 @app.route('/detect', methods=['POST'])
 @metrics.counter('detect_requests_total', 'Total number of /detect requests')
@@ -40,8 +304,11 @@ metrics.info('app_info', 'YOLO Detector Service Information', version='1.0.0')
 def detect_endpoint():
     """
     Endpoint untuk mendeteksi objek dalam gambar yang diunggah.
-    Menerima file gambar melalui form-data dengan key 'image'.
-    Mengembalikan hasil deteksi dalam format JSON.
+    Menerima file gambar melalui form-data dengan key 'image' dan field opsional 'model'
+    (varian dari YOLO_MODELS), 'preset' serta override 'imgsz', 'classes' (nama atau id,
+    dipisah koma), 'conf', 'iou', 'max_det' (lihat inference_params). Mengembalikan hasil
+    deteksi dalam format JSON, atau MessagePack kolomnar jika header Accept meminta
+    application/msgpack. Preset yang dipakai dikirim di header X-Inference-Preset.
     """
     if model is None:
         logger.error("Model is not loaded, cannot process /detect request.")
@@ -52,41 +319,20 @@ def detect_endpoint():
         raise BadRequest("Missing 'image' file part in form-data.")
 
     file = request.files['image']
-
-    if not file.filename:
-        logger.warning("Request to /detect submitted an empty filename.")
-        raise BadRequest("No selected file or empty filename provided.")
-
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'bmp', 'webp'}
-    content_type = file.content_type
-    file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-
-    if not content_type or not content_type.startswith('image/') or file_ext not in allowed_extensions:
-        logger.warning(f"Invalid content type or extension received: {content_type}, ext: {file_ext}")
-        raise UnsupportedMediaType(
-            f"Unsupported file type: '{content_type}' or extension: '{file_ext}'. "
-            f"Allowed extensions: {', '.join(allowed_extensions)}"
-        )
+    validate_image_file(file, '/detect')
+    variant = requested_variant('detect')
+    preset, params = requested_inference(request.values, variant)
 
     try:
-        image_bytes = file.read()
+        with stages.stage('read'):
+            image_bytes = upload_view(file)
         logger.info(f"Received image '{file.filename}' ({len(image_bytes)} bytes) for detection.")
 
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            img.verify()
-            img = Image.open(io.BytesIO(image_bytes))
-            img.load()
-            logger.debug(f"Image '{file.filename}' successfully opened and verified.")
-        except (IOError, SyntaxError, ValueError) as img_err:
-            logger.warning(f"Invalid or corrupted image file received ('{file.filename}'): {img_err}")
-            raise BadRequest(f"Invalid or corrupted image file: {img_err}")
-
-        logger.info(f"Processing image '{file.filename}' for object detection...")
-        results = detect_objects_from_image(img, model)
+        results = detect_uploads([(file.filename, image_bytes)], variant, params)[0]
         logger.info(f"Detection complete for '{file.filename}'. Found {len(results)} objects.")
 
-        return jsonify(results)
+        with stages.stage('serialize'):
+            return with_inference_headers(negotiated_response(results, compact=compact_detections), variant, preset)
 
     except (BadRequest, UnsupportedMediaType) as http_err:
         raise http_err
@@ -95,28 +341,181 @@ def detect_endpoint():
         logger.error(f"Unexpected error during detection for file '{file.filename}': {e}", exc_info=True)
         raise InternalServerError("An unexpected error occurred during object detection.")
 
-@app.route('/health', methods=['GET'])
-@metrics.do_not_track()
-def health_check():
+@app.route('/detect/batch', methods=['POST'])
+@metrics.counter('detect_batch_requests_total', 'Total number of /detect/batch requests')
+@metrics.summary('detect_batch_request_duration_seconds', 'Latency of /detect/batch requests')
+@metrics.gauge('detect_batch_in_progress', 'Number of /detect/batch requests in progress')
+def detect_batch_endpoint():
     """
-    Endpoint health check.
-    Memeriksa model dimuat DAN dapat melakukan inferensi.
+    Endpoint untuk mendeteksi objek pada beberapa gambar dalam satu request.
+    Menerima beberapa file gambar melalui form-data dengan key 'images' (dan field 'model',
+    'preset', serta parameter inferensi opsional seperti /detect).
+    Mengembalikan hasil deteksi per gambar dengan urutan yang sama seperti upload.
     """
     if model is None:
-        logger.error("Health check failed: Model is not loaded.")
-        return jsonify({"status": "unhealthy", "reason": "Model not loaded"}), 503
-    
-    if dummy_image is None:
-         logger.error("Health check failed: Dummy image not created.")
-         return jsonify({"status": "unhealthy", "reason": "Health check setup failed"}), 503
+        logger.error("Model is not loaded, cannot process /detect/batch request.")
+        raise InternalServerError("Object detection service is unavailable (model not loaded).")
+
+    files = request.files.getlist('images')
+    if not files:
+        logger.warning("Request to /detect/batch missing 'images' file parts.")
+        raise BadRequest("Missing 'images' file parts in form-data.")
+
+    if len(files) > MAX_BATCH_IMAGES:
+        logger.warning(f"Request to /detect/batch exceeded image limit: {len(files)} > {MAX_BATCH_IMAGES}")
+        raise BadRequest(f"Too many images: {len(files)}. Maximum per request: {MAX_BATCH_IMAGES}.")
+
+    for file in files:
+        validate_image_file(file, '/detect/batch')
+    variant = requested_variant('batch')
+    preset, params = requested_inference(request.values, variant)
 
     try:
-        _ = model(dummy_image, verbose=False)
-        logger.debug("Health check inference successful.")
-        return jsonify({"status": "healthy"}), 200
+        with stages.stage('read', images=len(files)):
+            uploads = [(file.filename, upload_view(file)) for file in files]
+        logger.info(f"Received batch of {len(uploads)} image(s) ({sum(len(b) for _, b in uploads)} bytes) for detection.")
+
+        batch_results = detect_uploads(uploads, variant, params)
+        logger.info(f"Batch detection complete. Found {sum(len(r) for r in batch_results)} objects in total.")
+
+        with stages.stage('serialize'):
+            return with_inference_headers(negotiated_response({
+                "results": [
+                    {"filename": file.filename, "detections": detections}
+                    for file, detections in zip(files, batch_results)
+                ]
+            }, compact=compact_batch), variant, preset)
+
+    except (BadRequest, UnsupportedMediaType) as http_err:
+        raise http_err
+
     except Exception as e:
-        logger.error(f"Health check failed: Model inference error: {e}", exc_info=True)
-        return jsonify({"status": "unhealthy", "reason": f"Model inference failed: {e}"}), 503
+        logger.error(f"Unexpected error during batch detection: {e}", exc_info=True)
+        raise InternalServerError("An unexpected error occurred during object detection.")
+
+def _read_stream_frames(stream, buffer):
+    """Thread pembaca: memindahkan frame dari koneksi ke buffer secepat frame tiba."""
+    error = None
+    try:
+        for index, frame_bytes in enumerate(read_frames(stream, STREAM_MAX_FRAME_BYTES)):
+            if index >= STREAM_MAX_FRAMES:
+                raise FrameStreamError(f"Too many frames in one stream (max {STREAM_MAX_FRAMES}).")
+            buffer.put(index, frame_bytes)
+    except Exception as e:
+        error = e
+    buffer.close(error)
+
+def stream_frame_events(buffer, session):
+    """
+    Loop pemrosesan aliran: jika beberapa frame menunggu, hanya yang terbaru diproses dan
+    sisanya dijawab dengan posisi prediksi tracker (latensi tetap terbatas walau inferensi
+    lebih lambat dari kamera). Menghasilkan satu event 'frame' per frame, lalu 'done'.
+    """
+    counts = {"inferred": 0, "static": 0, "backlog": 0, "error": 0}
+
+    def frame_event(result, arrived):
+        outcome = "inferred" if result["inferred"] else result["reason"]
+        counts[outcome] += 1
+        stream_frames.labels(outcome=outcome).inc()
+        result["latencyMs"] = round((time.monotonic() - arrived) * 1000, 2)
+        return json.dumps({"event": "frame", **result}, ensure_ascii=False) + "\n"
+
+    while True:
+        taken = buffer.take(timeout=STREAM_IDLE_TIMEOUT_SECONDS)
+        if taken is None:
+            break
+        dropped, frames = taken
+        if not dropped and not frames:
+            buffer.close(FrameStreamError(f"No frame received for {STREAM_IDLE_TIMEOUT_SECONDS:g} seconds."))
+            break
+        now = time.monotonic()
+        for index in dropped:
+            yield frame_event(session.drop(index), now)
+        for index, _, arrived in frames[:-1]:
+            yield frame_event(session.drop(index), arrived)
+        if not frames:
+            continue
+
+        index, frame_bytes, arrived = frames[-1]
+        try:
+            result = session.process(index, frame_bytes, backlog=len(frames) - 1 + len(dropped))
+        except (BadRequest, InvalidImageError) as e:
+            # Frame rusak tidak menghentikan aliran; klien menerima event error untuk frame tersebut.
+            logger.warning(f"Invalid frame {index} in stream: {e}")
+            counts["error"] += 1
+            stream_frames.labels(outcome="error").inc()
+            message = e.description if isinstance(e, BadRequest) else f"Invalid or corrupted image frame: {e}"
+            yield json.dumps({"event": "error", "frame": index, "message": message}) + "\n"
+            continue
+        yield frame_event(result, arrived)
+
+    summary = {"frames": sum(counts.values()), **counts}
+    if session.avg_inference_seconds is not None:
+        summary["avgInferenceMs"] = round(session.avg_inference_seconds * 1000, 2)
+    if buffer.error is not None:
+        logger.warning(f"Frame stream ended with error: {buffer.error}")
+        summary["error"] = str(buffer.error)
+    logger.info(f"Frame stream finished: {summary}")
+    yield json.dumps({"event": "done", **summary}) + "\n"
+
+@app.route('/detect/stream', methods=['POST'])
+@metrics.counter('detect_stream_requests_total', 'Total number of /detect/stream requests')
+@metrics.gauge('detect_stream_in_progress', 'Number of open /detect/stream connections')
+def detect_stream_endpoint():
+    """
+    Endpoint deteksi untuk aliran frame kamera dalam satu koneksi HTTP chunked.
+    Body berisi rangkaian frame JPEG, masing-masing diawali panjang 4 byte (big-endian).
+    Respons NDJSON: satu event 'frame' per frame (deteksi dengan 'trackId'; 'inferred'
+    false jika frame dilewati karena hampir sama dengan frame sebelumnya atau tertinggal
+    backlog), lalu event 'done' berisi ringkasan. Varian model dipilih lewat `?model=`
+    atau rute 'stream' di YOLO_MODEL_ROUTES (mis. varian kecil untuk kamera); preset dan
+    parameter inferensi lewat query string (`?preset=navigation&conf=0.4`).
+    """
+    if model is None:
+        logger.error("Model is not loaded, cannot process /detect/stream request.")
+        raise InternalServerError("Object detection service is unavailable (model not loaded).")
+    # Body berisi frame mentah: hanya query string yang dibaca, jangan mem-parse form.
+    variant = model_registry.select(request.args.get('model'), route='stream')
+    preset, params = requested_inference(request.args, variant)
+
+    def detect_frame(frame_bytes):
+        with stages.stage('decode'):
+            image = decode_image(frame_bytes, 'stream-frame', ingest_side(params))
+        with stages.stage('inference', model=variant, imgsz=params.imgsz):
+            return run_detection([image], variant, params)[0]
+
+    session = FrameSession(
+        detect_frame, diff_threshold=STREAM_DIFF_THRESHOLD, keyframe_interval=STREAM_KEYFRAME_INTERVAL,
+        tracker=IouTracker()
+    )
+    buffer = FrameBuffer(max_pending=STREAM_MAX_PENDING)
+    threading.Thread(
+        target=_read_stream_frames, args=(request.stream, buffer), name='yolo-stream-reader', daemon=True
+    ).start()
+    logger.info(f"Frame stream opened (model={variant}, preset={preset}).")
+
+    return Response(
+        stream_with_context(stream_frame_events(buffer, session)),
+        mimetype='application/x-ndjson',
+        headers={
+            'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Model-Variant': variant,
+            'X-Inference-Preset': preset,
+        },
+    )
+
+def run_self_test():
+    """
+    Self-test berkala: memastikan model dimuat DAN dapat melakukan inferensi
+    melalui jalur deteksi yang sama dengan request sungguhan.
+    """
+    if model is None:
+        raise RuntimeError("Model not loaded")
+    if dummy_image is None:
+        raise RuntimeError("Health check setup failed")
+    run_detection([dummy_image], params=PRESETS[DEFAULT_PRESET])
+
+register_self_test(app, run_self_test)
+register_model_routes(app, model_registry)
 
 if __name__ == '__main__':
     host = os.environ.get('HOST', '0.0.0.0')
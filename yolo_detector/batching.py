@@ -0,0 +1,133 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    'inference_batch_size',
+    'Jumlah item yang digabung dalam satu forward pass',
+    ['batcher'],
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+)
+BATCH_QUEUE_WAIT = Histogram(
+    'inference_batch_queue_wait_seconds',
+    'Waktu tunggu item di antrean sebelum diproses dalam batch',
+    ['batcher'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+class MicroBatcher:
+    """
+    Penjadwal micro-batching di depan sebuah model.
+    Item yang datang dalam jendela waktu `max_wait_ms` (hingga `max_batch_size`)
+    digabung dan diproses dengan satu panggilan `batch_fn(items)`, lalu setiap
+    pemanggil menerima hasilnya sendiri melalui `Future`.
+
+    Worker thread dijalankan secara lazy dan dibuat ulang setelah fork, sehingga
+    aman dipakai bersama `gunicorn --preload`.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=10, name="default"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, item) -> Future:
+        """Memasukkan satu item ke antrean dan mengembalikan Future hasilnya."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def pending(self):
+        """Jumlah item yang menunggu di antrean (belum diambil worker)."""
+        return self._queue.qsize()
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Proses hasil fork tidak mewarisi worker thread; mulai dengan antrean baru.
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run, name=f"microbatcher-{self.name}", daemon=True
+            )
+            self._thread.start()
+            logger.info(
+                f"MicroBatcher '{self.name}' started (pid={pid}, max_batch_size={self.max_batch_size}, "
+                f"max_wait_ms={self.max_wait * 1000:.1f})"
+            )
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"MicroBatcher '{self.name}' failed to process batch: {e}", exc_info=True)
+
+    def _process(self, batch):
+        now = time.perf_counter()
+        active = []
+        for item, future, enqueued_at in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            BATCH_QUEUE_WAIT.labels(batcher=self.name).observe(now - enqueued_at)
+            active.append((item, future))
+
+        if not active:
+            return
+
+        BATCH_SIZE.labels(batcher=self.name).observe(len(active))
+        logger.debug(f"MicroBatcher '{self.name}' running batch of {len(active)} item(s).")
+
+        try:
+            outputs = self.batch_fn([item for item, _ in active])
+            if len(outputs) != len(active):
+                raise RuntimeError(
+                    f"batch_fn returned {len(outputs)} results for {len(active)} inputs"
+                )
+        except Exception as e:
+            for _, future in active:
+                future.set_exception(e)
+            return
+
+        for (_, future), output in zip(active, outputs):
+            future.set_result(output)
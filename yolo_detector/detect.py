@@ -1,95 +1,259 @@
-from ultralytics import YOLO
+from contextlib import contextmanager
 from PIL import Image
 import logging
+import threading
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
-def load_model(model_name="yolov8n.pt"):
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+def load_model(model_name="yolov8n.pt", backend="torch", imgsz=640, export_dir=None, threads=0):
     """
-    Memuat model YOLOv8 berdasarkan nama atau path.
-    Library YOLO akan mencoba mengunduh jika nama model diberikan dan belum ada.
+    Memuat model YOLOv8 berdasarkan nama atau path. Nama model diambil dari model store
+    lokal (lihat common.model_store), bukan diunduh oleh ultralytics ke direktori kerja.
+    Dengan backend 'onnx' atau 'openvino', model diekspor sekali ke cache disk
+    (kunci: hash bobot + imgsz) lalu dijalankan tanpa torch/ultralytics.
     Mengembalikan objek model atau None jika gagal.
     """
     try:
-        logger.info(f"Loading YOLO model: {model_name}")
-        model = YOLO(model_name)
+        logger.info(f"Loading YOLO model: {model_name} (backend={backend})")
+        if backend == 'torch':
+            from exported_model import resolve_weights
+            from ultralytics import YOLO
+
+            model = YOLO(resolve_weights(model_name))
+        elif backend in BACKENDS:
+            from exported_model import DEFAULT_EXPORT_DIR, load_exported_model
+
+            model = load_exported_model(
+                model_name, backend, imgsz=imgsz, export_dir=export_dir or DEFAULT_EXPORT_DIR, threads=threads
+            )
+        else:
+            raise ValueError(f"Unknown YOLO backend '{backend}'. Use one of: {', '.join(BACKENDS)}.")
         logger.info(f"YOLO model '{model_name}' successfully loaded and initialized.")
         return model
     except Exception as e:
         logger.error(f"Error loading YOLO model '{model_name}': {e}", exc_info=True)
         return None
 
-def detect_objects_from_image(pil_image: Image.Image, model: YOLO):
+class RemoteYOLO:
     """
-    Mendeteksi objek dalam gambar PIL menggunakan model YOLO yang sudah dimuat.
+    Model YOLO di proses inference-server bersama (lihat common.inference_server).
+    Dipanggil seperti `ultralytics.YOLO`; gambar dikirim lewat shared memory dan yang
+    kembali hanya array kotak, sehingga `_parse_result` tetap dipakai di worker HTTP.
+    `variant` memilih varian model di registry server (None = default server).
+    """
+
+    def __init__(self, client, variant=None):
+        from exported_model import Boxes, Result
+
+        self._boxes, self._result = Boxes, Result
+        self.client = client
+        self._options = {'model': variant} if variant else {}
+        self.names = {int(k): v for k, v in client.call('info', **self._options)['names'].items()}
+
+    def __call__(self, pil_images, verbose=False, **options):
+        arrays = [np.asarray(img.convert('RGB')) for img in pil_images]
+        return [
+            self._result(self._boxes(*boxes))
+            for boxes in self.client.call('predict', arrays, **self._options, **options)
+        ]
+
+def predict_grouped(items, predict):
+    """
+    Menjalankan satu batch micro-batcher berisi (gambar, opsi) dengan satu pemanggilan
+    `predict(images, opsi)` per kombinasi opsi yang berbeda (opsi harus hashable).
+    Mengembalikan hasil dengan urutan yang sama seperti `items`.
+    """
+    groups = {}
+    for index, (_, options) in enumerate(items):
+        groups.setdefault(options, []).append(index)
+    results = [None] * len(items)
+    for options, indices in groups.items():
+        for index, result in zip(indices, predict([items[i][0] for i in indices], options)):
+            results[index] = result
+    return results
+
+def create_inference_handlers(threads=1, model_name="yolov8n.pt", backend="torch", imgsz=640, export_dir=None,
+                              batch_max_size=8, batch_window_ms=10):
+    """
+    Factory untuk proses inference-server: memuat varian default sekali dan mengembalikan op
+    'info' dan 'predict'. Varian lain (YOLO_MODELS) dimuat lazy di registry server; gambar
+    dari semua worker HTTP untuk varian yang sama digabung oleh satu MicroBatcher.
+    """
+    from batching import MicroBatcher
+    from common.model_registry import ModelRegistry
+
+    def load_variant(variant, weights):
+        model = load_model(weights, backend=backend, imgsz=imgsz, export_dir=export_dir, threads=threads)
+        if model is None:
+            raise RuntimeError(f"Failed to load YOLO model '{weights}'")
+        return model
+
+    registry = ModelRegistry.from_env('yolo_inference_server', load_variant, 'YOLO', model_name)
+    registry.load()
+    batchers = {}
+    batchers_lock = threading.Lock()
+
+    def predict_batch(variant, images, options):
+        with registry.acquire(variant) as model:
+            return [
+                (
+                    _to_numpy(r.boxes.xyxy).astype(np.float32).reshape(-1, 4),
+                    _to_numpy(r.boxes.conf).astype(np.float32).reshape(-1),
+                    _to_numpy(r.boxes.cls).astype(np.float32).reshape(-1),
+                )
+                for r in model(images, verbose=False, **dict(options))
+            ]
+
+    def batcher_for(variant):
+        with batchers_lock:
+            if variant not in batchers:
+                batchers[variant] = MicroBatcher(
+                    lambda items: predict_grouped(items, lambda images, options: predict_batch(variant, images, options)),
+                    max_batch_size=batch_max_size,
+                    max_wait_ms=batch_window_ms,
+                    name='yolo_inference_server' if variant == registry.default else f'yolo_inference_server_{variant}'
+                )
+            return batchers[variant]
+
+    def info(arrays, model=None):
+        with registry.acquire(model) as loaded:
+            return {"names": dict(loaded.names)}
+
+    def predict(arrays, model=None, **options):
+        batcher = batcher_for(registry.select(model))
+        # Opsi inferensi (imgsz, classes, ...) datang sebagai JSON; list dijadikan tuple agar hashable.
+        key = tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in options.items()))
+        futures = [batcher.submit((Image.fromarray(array), key)) for array in arrays]
+        return [future.result() for future in futures]
+
+    return {'info': info, 'predict': predict}
+
+def _to_numpy(values):
+    """Mengubah tensor (torch) atau array-like menjadi numpy array di CPU."""
+    if hasattr(values, "cpu"):
+        values = values.cpu()
+    if hasattr(values, "numpy"):
+        return values.numpy()
+    return np.asarray(values)
+
+def _parse_result(r, width, height, names):
+    """
+    Mengubah satu objek hasil YOLO menjadi daftar dictionary deteksi.
+    Normalisasi dan clamping bbox dilakukan sekaligus pada seluruh array
+    `boxes.xyxy`, `boxes.conf`, dan `boxes.cls`, bukan per box.
+    """
+    boxes = r.boxes
+    if boxes is None or len(boxes) == 0:
+        logger.debug("No boxes found in this result.")
+        return []
+
+    if width == 0 or height == 0:
+        logger.warning("Image dimensions are zero, cannot normalize bounding box.")
+        return []
+
+    try:
+        xyxy = _to_numpy(boxes.xyxy).astype(np.float64, copy=False).reshape(-1, 4)
+        confidences = _to_numpy(boxes.conf).astype(np.float64, copy=False).reshape(-1)
+        class_ids = _to_numpy(boxes.cls).astype(np.int64).reshape(-1)
+    except (AttributeError, TypeError, ValueError) as parse_err:
+        logger.warning(f"Error parsing detection box data: {parse_err}", exc_info=True)
+        return []
+
+    if not (len(xyxy) == len(confidences) == len(class_ids)):
+        logger.warning(
+            f"Incomplete box data skipped: xyxy={len(xyxy)}, conf={len(confidences)}, cls={len(class_ids)}"
+        )
+        return []
+
+    normalized = np.empty_like(xyxy)
+    normalized[:, 0] = xyxy[:, 0] / width
+    normalized[:, 1] = xyxy[:, 1] / height
+    normalized[:, 2] = (xyxy[:, 2] - xyxy[:, 0]) / width
+    normalized[:, 3] = (xyxy[:, 3] - xyxy[:, 1]) / height
+    np.clip(normalized, 0.0, 1.0, out=normalized)
+
+    unique_ids, inverse = np.unique(class_ids, return_inverse=True)
+    unique_names = [names.get(int(class_id), f"Unknown_ID_{int(class_id)}") for class_id in unique_ids]
+    class_names = [unique_names[i] for i in inverse.reshape(-1).tolist()]
+
+    detections = [
+        {"class": class_name, "confidence": confidence, "bbox": bbox}
+        for class_name, confidence, bbox in zip(class_names, confidences.tolist(), normalized.tolist())
+    ]
+    logger.debug(f"Parsed {len(detections)} detections.")
+    return detections
+
+@contextmanager
+def _untimed(stage, **attributes):
+    yield
+
+def detect_objects_from_images(pil_images, model, stages=None, params=None):
+    """
+    Mendeteksi objek pada beberapa gambar PIL sekaligus dalam satu forward pass (batch).
     Args:
-        pil_image (PIL.Image.Image): Objek gambar PIL yang sudah divalidasi.
-        model (YOLO): Objek model YOLO yang sudah dimuat.
+        pil_images (list[PIL.Image.Image]): Daftar gambar PIL yang sudah divalidasi.
+        model (YOLO | ExportedYOLO): Objek model YOLO yang sudah dimuat.
+        stages (StageTimer, optional): Pencatat durasi tahap 'forward' dan 'postprocess'.
+        params (InferenceParams, optional): imgsz/classes/conf/iou/max_det; None = default model.
     Returns:
-        list: Daftar dictionary berisi hasil deteksi (class, confidence, bbox).
-              Mengembalikan list kosong jika tidak ada objek terdeteksi.
+        list: Satu daftar hasil deteksi per gambar, dengan urutan yang sama seperti input.
     Raises:
-        TypeError: Jika input pil_image bukan objek PIL Image.
+        TypeError: Jika salah satu input bukan objek PIL Image.
         ValueError: Jika model tidak valid atau belum dimuat.
         RuntimeError: Jika terjadi error tak terduga selama proses inferensi.
     """
-    if not isinstance(pil_image, Image.Image):
-        logger.error("Invalid input: detect_objects_from_image expects a PIL Image object.")
+    if not all(isinstance(img, Image.Image) for img in pil_images):
+        logger.error("Invalid input: detect_objects_from_images expects PIL Image objects.")
         raise TypeError("Input must be a PIL Image object")
     if not model:
         logger.error("Model is not available for detection.")
         raise ValueError("YOLO model is not loaded or invalid.")
+    if not pil_images:
+        return []
 
-    detections = []
+    stage = stages.stage if stages is not None else _untimed
+    options = params.as_kwargs() if params is not None else {}
     try:
-        logger.debug("Running YOLO model inference...")
-        results = model(pil_image, verbose=False)
+        logger.debug(f"Running YOLO model inference on batch of {len(pil_images)} image(s)...")
+        with stage('forward', batch_size=len(pil_images), **({'imgsz': params.imgsz} if params is not None else {})):
+            results = model(list(pil_images), verbose=False, **options)
         logger.debug("Model inference completed.")
 
-        for r in results:
-            if r.boxes is None:
-                logger.debug("No boxes found in this result.")
-                continue
-
-            width, height = pil_image.size
-            if width == 0 or height == 0:
-                 logger.warning("Image dimensions are zero, cannot normalize bounding box.")
-                 continue
-
-            for box in r.boxes:
-                if box.xyxy is None or len(box.xyxy) == 0 or \
-                   box.conf is None or len(box.conf) == 0 or \
-                   box.cls is None or len(box.cls) == 0:
-                    logger.warning(f"Incomplete box data skipped: {box}")
-                    continue
-
-                try:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    confidence = box.conf[0].item()
-                    class_id = int(box.cls[0].item())
-                    class_name = model.names.get(class_id, f"Unknown_ID_{class_id}")
-
-                    normalized_bbox = [
-                        max(0.0, float(x1) / width),
-                        max(0.0, float(y1) / height),
-                        min(1.0, float(x2 - x1) / width),
-                        min(1.0, float(y2 - y1) / height)
-                    ]
-                    normalized_bbox = [max(0.0, min(1.0, val)) for val in normalized_bbox]
-
-                    detections.append({
-                        "class": class_name,
-                        "confidence": float(confidence),
-                        "bbox": normalized_bbox
-                    })
-                    logger.debug(f"Detected: {class_name} (Conf: {confidence:.2f})")
-
-                except (IndexError, TypeError, KeyError, ValueError) as parse_err:
-                     logger.warning(f"Error parsing detection box data: {parse_err}. Box data: {box}", exc_info=True)
-                     continue
+        if len(results) != len(pil_images):
+            raise RuntimeError(f"Model returned {len(results)} results for {len(pil_images)} images")
+
+        batch_detections = []
+        with stage('postprocess'):
+            for pil_image, r in zip(pil_images, results):
+                width, height = pil_image.size
+                batch_detections.append(_parse_result(r, width, height, model.names))
 
     except Exception as e:
         logger.error(f"Error during YOLO model inference: {e}", exc_info=True)
         raise RuntimeError(f"An error occurred during model prediction: {e}") from e
 
-    return detections
\ No newline at end of file
+    return batch_detections
+
+def detect_objects_from_image(pil_image: Image.Image, model, stages=None, params=None):
+    """
+    Mendeteksi objek dalam gambar PIL menggunakan model YOLO yang sudah dimuat.
+    Args:
+        pil_image (PIL.Image.Image): Objek gambar PIL yang sudah divalidasi.
+        model (YOLO | ExportedYOLO): Objek model YOLO yang sudah dimuat.
+        params (InferenceParams, optional): Parameter inferensi per request.
+    Returns:
+        list: Daftar dictionary berisi hasil deteksi (class, confidence, bbox).
+              Mengembalikan list kosong jika tidak ada objek terdeteksi.
+    Raises:
+        TypeError: Jika input pil_image bukan objek PIL Image.
+        ValueError: Jika model tidak valid atau belum dimuat.
+        RuntimeError: Jika terjadi error tak terduga selama proses inferensi.
+    """
+    if not isinstance(pil_image, Image.Image):
+        logger.error("Invalid input: detect_objects_from_image expects a PIL Image object.")
+        raise TypeError("Input must be a PIL Image object")
+
+    return detect_objects_from_images([pil_image], model, stages=stages, params=params)[0]
@@ -0,0 +1,285 @@
+"""
+Backend inferensi YOLO berbasis model hasil ekspor (ONNX Runtime atau OpenVINO).
+
+Model diekspor sekali dari bobot PyTorch (saat pertama dipakai atau saat build image),
+disimpan di cache disk dengan kunci hash bobot + ukuran input, lalu dijalankan tanpa
+torch/ultralytics. Hasil inferensi dibungkus dalam objek yang meniru `Results.boxes`
+ultralytics sehingga `detect._parse_result` menghasilkan skema deteksi yang sama.
+
+Ekspor saat build:
+    python exported_model.py --model yolov8n.pt --format onnx --imgsz 640
+"""
+import abc
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('onnx', 'openvino')
+DEFAULT_EXPORT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'yolo-export')
+LETTERBOX_FILL = 114
+
+
+def file_digest(path, length=16):
+    """Hash SHA-256 (dipersingkat) dari isi file bobot model."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:length]
+
+
+def resolve_weights(model_name):
+    """
+    Mengembalikan path lokal bobot: path yang ada dipakai langsung, selain itu diambil dari
+    model store (common.model_store; diunduh lewat ultralytics hanya jika store tidak offline).
+    """
+    if os.path.exists(model_name):
+        return model_name
+    from common.model_store import ModelStore
+
+    return ModelStore.from_env().resolve('ultralytics', model_name)
+
+
+def export_path(weights_path, export_format, imgsz, export_dir=DEFAULT_EXPORT_DIR):
+    """Path artefak ekspor di cache: <nama>-<hash>-<imgsz>.onnx atau direktori _openvino_model."""
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    base = os.path.join(export_dir, f"{stem}-{file_digest(weights_path)}-{imgsz}")
+    return f"{base}.onnx" if export_format == 'onnx' else f"{base}_openvino_model"
+
+
+def ensure_exported(model_name, export_format='onnx', imgsz=640, export_dir=DEFAULT_EXPORT_DIR):
+    """
+    Memastikan model sudah diekspor ke format yang diminta dan mengembalikan path-nya.
+    Ekspor dilindungi file lock sehingga beberapa worker gunicorn tidak mengekspor
+    bersamaan; hasil dipindahkan ke cache secara atomik.
+    Raises:
+        ValueError: Jika format ekspor tidak dikenal.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+
+    weights_path = resolve_weights(model_name)
+    target = export_path(weights_path, export_format, imgsz, export_dir)
+    if os.path.exists(f"{target}.json"):
+        return target
+
+    os.makedirs(export_dir, exist_ok=True)
+    with open(os.path.join(export_dir, '.export.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(f"{target}.json"):
+            return target
+
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting YOLO model '{weights_path}' to {export_format} (imgsz={imgsz}) -> {target}")
+        work_dir = tempfile.mkdtemp(dir=export_dir)
+        try:
+            # Ultralytics menulis hasil ekspor di samping file bobot, jadi ekspor dari salinan di direktori kerja.
+            local_weights = os.path.join(work_dir, os.path.basename(weights_path))
+            shutil.copyfile(weights_path, local_weights)
+            model = YOLO(local_weights)
+            exported = model.export(format=export_format, imgsz=imgsz, dynamic=True, verbose=False)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(exported, target)
+            # Metadata ditulis terakhir: keberadaannya menandakan ekspor lengkap.
+            with open(f"{target}.json", 'w') as f:
+                json.dump({
+                    "names": {int(k): v for k, v in model.names.items()},
+                    "imgsz": imgsz,
+                    "stride": int(max(model.model.stride)),
+                    "source": os.path.basename(weights_path),
+                }, f)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return target
+
+
+class Boxes(NamedTuple):
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class Result(NamedTuple):
+    boxes: Boxes
+
+
+def letterbox(pil_image, imgsz, stride=None):
+    """
+    Resize dengan rasio tetap lalu padding (seperti LetterBox ultralytics). Tanpa `stride`
+    hasilnya imgsz x imgsz; dengan `stride`, padding hanya sampai kelipatan stride
+    (mode persegi panjang yang dipakai ultralytics untuk inferensi PyTorch).
+    """
+    width, height = pil_image.size
+    gain = min(imgsz / width, imgsz / height)
+    new_w, new_h = int(round(width * gain)), int(round(height * gain))
+    canvas_w, canvas_h = imgsz, imgsz
+    if stride:
+        canvas_w = new_w + (imgsz - new_w) % stride
+        canvas_h = new_h + (imgsz - new_h) % stride
+    pad_x, pad_y = (canvas_w - new_w) / 2, (canvas_h - new_h) / 2
+    left, top = int(round(pad_x - 0.1)), int(round(pad_y - 0.1))
+
+    image = pil_image.convert('RGB')
+    if (new_w, new_h) != (width, height):
+        image = image.resize((new_w, new_h), Image.BILINEAR)
+    canvas = np.full((canvas_h, canvas_w, 3), LETTERBOX_FILL, dtype=np.uint8)
+    canvas[top:top + new_h, left:left + new_w] = np.asarray(image)
+    return canvas, gain, (left, top)
+
+
+def nms(boxes, scores, iou_threshold):
+    """Non-maximum suppression greedy; IoU dihitung vektor terhadap semua kandidat tersisa."""
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while len(order):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        xx1 = np.maximum(boxes[best, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[best, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[best, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[best, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class ExportedYOLO(abc.ABC):
+    """
+    Model YOLO hasil ekspor dengan antarmuka pemanggilan seperti `ultralytics.YOLO`:
+    `model(images, verbose=False)` mengembalikan satu hasil per gambar dan `model.names`
+    memetakan id kelas ke nama. Default conf/iou/max_det mengikuti `predict` ultralytics;
+    seperti `predict`, imgsz/conf/iou/max_det/classes dapat ditimpa per pemanggilan.
+    """
+
+    def __init__(self, path, conf=0.25, iou=0.7, max_det=300):
+        with open(f"{path}.json") as f:
+            metadata = json.load(f)
+        self.path = path
+        self.names = {int(k): v for k, v in metadata["names"].items()}
+        self.imgsz = int(metadata["imgsz"])
+        self.stride = int(metadata.get("stride", 32))
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+    @abc.abstractmethod
+    def _infer(self, batch):
+        """Forward pass runtime: batch float32 NCHW -> keluaran mentah (N, 4 + kelas, anchor)."""
+
+    def __call__(self, pil_images, verbose=False, imgsz=None, conf=None, iou=None, max_det=None, classes=None):
+        if isinstance(pil_images, Image.Image):
+            pil_images = [pil_images]
+        # Seperti ultralytics: jika semua gambar berukuran sama, padding minimal (kelipatan stride).
+        same_shape = len({img.size for img in pil_images}) == 1
+        stride = self.stride if same_shape else None
+        prepared = [letterbox(img, imgsz or self.imgsz, stride) for img in pil_images]
+        batch = np.stack([canvas for canvas, _, _ in prepared]).transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        batch *= 1.0 / 255.0
+
+        outputs = self._infer(batch)
+        options = {
+            'conf': self.conf if conf is None else conf,
+            'iou': self.iou if iou is None else iou,
+            'max_det': self.max_det if max_det is None else max_det,
+            'classes': None if classes is None else np.asarray(classes, dtype=np.int64),
+        }
+        return [
+            self._postprocess(output, gain, pad, img.size, **options)
+            for output, (_, gain, pad), img in zip(outputs, prepared, pil_images)
+        ]
+
+    def _postprocess(self, output, gain, pad, size, conf, iou, max_det, classes=None):
+        # output: (4 + jumlah kelas, jumlah anchor) -> baris per anchor.
+        predictions = output.T
+        scores_all = predictions[:, 4:]
+        class_ids = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(class_ids)), class_ids]
+        mask = scores > conf
+        if classes is not None:
+            # Filter kelas sebelum NMS, seperti argumen `classes` ultralytics.
+            mask &= np.isin(class_ids, classes)
+        predictions, scores, class_ids = predictions[mask], scores[mask], class_ids[mask]
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        if len(boxes):
+            # NMS per kelas: geser kotak sesuai id kelas agar kelas berbeda tidak saling menekan.
+            offsets = class_ids[:, None].astype(np.float32) * 7680.0
+            keep = nms(boxes + offsets, scores, iou)[:max_det]
+            boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+        width, height = size
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / gain).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / gain).clip(0, height)
+        return Result(Boxes(boxes, scores, class_ids.astype(np.float32)))
+
+
+class OnnxYOLO(ExportedYOLO):
+    """Inferensi melalui ONNX Runtime (CPUExecutionProvider)."""
+
+    def __init__(self, path, threads=0, **kwargs):
+        import onnxruntime as ort
+
+        super().__init__(path, **kwargs)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOYOLO(ExportedYOLO):
+    """Inferensi melalui OpenVINO Runtime di CPU."""
+
+    def __init__(self, path, threads=0, **kwargs):
+        import openvino as ov
+
+        super().__init__(path, **kwargs)
+        xml_files = [name for name in os.listdir(path) if name.endswith('.xml')]
+        config = {'INFERENCE_NUM_THREADS': threads} if threads else {}
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(os.path.join(path, xml_files[0])), 'CPU', config)
+
+    def _infer(self, batch):
+        return self.compiled(batch)[0]
+
+
+def load_exported_model(model_name, export_format='onnx', imgsz=640, export_dir=DEFAULT_EXPORT_DIR, threads=0):
+    """Mengekspor (jika belum ada di cache) lalu memuat model dengan runtime yang sesuai."""
+    path = ensure_exported(model_name, export_format, imgsz, export_dir)
+    if export_format == 'onnx':
+        return OnnxYOLO(path, threads=threads)
+    return OpenVINOYOLO(path, threads=threads)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Ekspor model YOLO ke cache backend ONNX/OpenVINO.")
+    parser.add_argument('--model', default=os.environ.get('YOLO_MODEL', 'yolov8n.pt'))
+    parser.add_argument('--format', default=os.environ.get('YOLO_BACKEND', 'onnx'), choices=EXPORT_FORMATS)
+    parser.add_argument('--imgsz', type=int, default=int(os.environ.get('YOLO_IMGSZ', 640)))
+    parser.add_argument('--export-dir', default=os.environ.get('YOLO_EXPORT_DIR', DEFAULT_EXPORT_DIR))
+    args = parser.parse_args()
+    print(ensure_exported(args.model, args.format, args.imgsz, args.export_dir))
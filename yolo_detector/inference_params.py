@@ -0,0 +1,158 @@
+"""
+Parameter inferensi YOLO per request: menukar akurasi dengan latensi per fitur klien.
+
+- `imgsz`: sisi input model (kelipatan 32); lebih kecil = forward pass lebih cepat;
+- `classes`: hanya kelas ini yang dipertahankan, difilter di dalam NMS (bukan setelah serialisasi);
+- `conf` / `iou`: ambang confidence dan IoU NMS;
+- `max_det`: jumlah deteksi maksimum per gambar.
+
+Request memilih preset server (`preset`) dan boleh menimpa tiap parameter. Preset tambahan
+dapat didefinisikan lewat env YOLO_PRESETS (JSON nama -> parameter). Mode adaptif
+(YOLO_ADAPTIVE_PRESET) memakai preset yang lebih murah saat request yang sedang berjalan
+atau mengantre melebihi YOLO_ADAPTIVE_INFLIGHT_THRESHOLD, hanya untuk request yang tidak
+memilih preset atau parameter sendiri.
+"""
+import json
+import os
+from typing import NamedTuple, Optional, Tuple
+
+from werkzeug.exceptions import BadRequest
+
+MODEL_IMGSZ = int(os.environ.get('YOLO_IMGSZ', 640))
+MIN_IMGSZ = 128
+MAX_IMGSZ = int(os.environ.get('YOLO_MAX_IMGSZ', 1280))
+MAX_DET_LIMIT = 300
+IMGSZ_STRIDE = 32
+
+
+class InferenceParams(NamedTuple):
+    imgsz: int
+    conf: float
+    iou: float
+    max_det: int
+    classes: Optional[Tuple[int, ...]] = None
+
+    def as_kwargs(self):
+        """Kwargs pemanggilan model (ultralytics `predict` maupun ExportedYOLO)."""
+        options = {'imgsz': self.imgsz, 'conf': self.conf, 'iou': self.iou, 'max_det': self.max_det}
+        if self.classes is not None:
+            options['classes'] = list(self.classes)
+        return options
+
+
+# ID kelas COCO: person, bicycle, car, motorcycle, bus, truck, traffic light, stop sign.
+NAVIGATION_CLASSES = (0, 1, 2, 3, 5, 7, 9, 11)
+
+PRESETS = {
+    # Default ultralytics.
+    'default': InferenceParams(MODEL_IMGSZ, 0.25, 0.7, 300),
+    'navigation': InferenceParams(480, 0.3, 0.7, 50, NAVIGATION_CLASSES),
+    'people': InferenceParams(416, 0.35, 0.7, 30, (0,)),
+    'lite': InferenceParams(320, 0.35, 0.7, 30),
+}
+
+
+def _coerce(name, value, cast, low, high):
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"Invalid '{name}' parameter. Must be a number.")
+    if not low <= value <= high:
+        raise BadRequest(f"Invalid '{name}' parameter. Must be between {low} and {high}.")
+    return value
+
+
+def _parse_imgsz(value):
+    imgsz = _coerce('imgsz', value, int, MIN_IMGSZ, MAX_IMGSZ)
+    if imgsz % IMGSZ_STRIDE:
+        raise BadRequest(f"Invalid 'imgsz' parameter. Must be a multiple of {IMGSZ_STRIDE}.")
+    return imgsz
+
+
+def _parse_classes(value, class_names):
+    """
+    'person,car' atau '0,2' -> tuple id kelas terurut. `class_names()` -> {nama: id} model;
+    id di luar kelas model ditolak (tanpa `class_names`, mis. preset env, id tidak diperiksa).
+    """
+    tokens = [token.strip() for token in str(value).split(',') if token.strip()]
+    if not tokens:
+        raise BadRequest("Invalid 'classes' parameter. Provide class names or ids separated by commas.")
+    names = class_names() if class_names is not None else None
+    ids = set()
+    for token in tokens:
+        if token.isdigit():
+            if names is not None and int(token) not in names.values():
+                raise BadRequest(f"Unknown class id {token} in 'classes' parameter.")
+            ids.add(int(token))
+            continue
+        if names is None or token.lower() not in names:
+            raise BadRequest(f"Unknown class '{token}' in 'classes' parameter.")
+        ids.add(names[token.lower()])
+    return tuple(sorted(ids))
+
+
+PARSERS = {
+    'imgsz': lambda value, _: _parse_imgsz(value),
+    'conf': lambda value, _: _coerce('conf', value, float, 0.0, 1.0),
+    'iou': lambda value, _: _coerce('iou', value, float, 0.0, 1.0),
+    'max_det': lambda value, _: _coerce('max_det', value, int, 1, MAX_DET_LIMIT),
+    'classes': _parse_classes,
+}
+
+
+def _load_env_presets():
+    """Preset tambahan dari YOLO_PRESETS, mis. {"vehicles": {"imgsz": 416, "classes": [2, 3, 5, 7]}} (id kelas)."""
+    raw = os.environ.get('YOLO_PRESETS')
+    if not raw:
+        return
+    for name, overrides in json.loads(raw).items():
+        base = PRESETS['default']._asdict()
+        for key, value in overrides.items():
+            if key not in PARSERS:
+                raise ValueError(f"Unknown YOLO preset parameter '{key}' in preset '{name}'.")
+            if key == 'classes' and isinstance(value, list):
+                value = ','.join(str(item) for item in value)
+            try:
+                base[key] = PARSERS[key](value, None)
+            except BadRequest as e:
+                raise ValueError(f"Invalid YOLO preset '{name}': {e.description}") from e
+        PRESETS[name.lower()] = InferenceParams(**base)
+
+
+_load_env_presets()
+
+DEFAULT_PRESET = os.environ.get('YOLO_INFERENCE_PRESET', 'default').lower()
+ADAPTIVE_PRESET = os.environ.get('YOLO_ADAPTIVE_PRESET', '').lower() or None
+ADAPTIVE_INFLIGHT_THRESHOLD = int(os.environ.get('YOLO_ADAPTIVE_INFLIGHT_THRESHOLD', 4))
+
+for _preset in (DEFAULT_PRESET, ADAPTIVE_PRESET):
+    if _preset is not None and _preset not in PRESETS:
+        raise ValueError(f"Unknown YOLO preset '{_preset}'. Known: {', '.join(PRESETS)}.")
+
+
+def parse_inference_params(values, class_names=None):
+    """
+    Memvalidasi parameter inferensi per request: 'preset' lalu override 'imgsz', 'classes',
+    'conf', 'iou', 'max_det'. `class_names()` mengembalikan {nama kelas: id} model.
+    Mengembalikan (nama preset atau 'custom', InferenceParams, eksplisit).
+    """
+    preset = (values.get('preset') or '').lower()
+    if preset and preset not in PRESETS:
+        raise BadRequest(f"Invalid preset '{preset}'. Allowed: {', '.join(PRESETS)}")
+    params = PRESETS[preset or DEFAULT_PRESET]
+    overrides = {
+        key: parser(values.get(key), class_names) for key, parser in PARSERS.items() if values.get(key)
+    }
+    if overrides:
+        return 'custom', params._replace(**overrides), True
+    return preset or DEFAULT_PRESET, params, bool(preset)
+
+
+def adapt_to_load(preset, params, explicit, in_flight):
+    """
+    Mode adaptif: preset YOLO_ADAPTIVE_PRESET saat `in_flight` melewati ambang, kecuali
+    request memilih preset/parameter sendiri. Mengembalikan (preset, params, diadaptasi).
+    """
+    if explicit or ADAPTIVE_PRESET is None or in_flight <= ADAPTIVE_INFLIGHT_THRESHOLD:
+        return preset, params, False
+    return ADAPTIVE_PRESET, PRESETS[ADAPTIVE_PRESET], True
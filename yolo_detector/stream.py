@@ -0,0 +1,234 @@
+"""
+Deteksi pada aliran frame kamera (lihat endpoint /detect/stream).
+
+Frame dikirim dalam satu koneksi HTTP chunked sebagai rangkaian `[panjang 4 byte
+big-endian][JPEG]`. Untuk setiap frame, sesi memutuskan apakah perlu inferensi:
+frame yang hampir sama dengan frame terakhir yang diinferensi (selisih thumbnail
+grayscale 32x32, di-decode murah lewat mode draft JPEG) dilewati dan deteksinya
+diteruskan oleh tracker IoU sederhana. Jika frame menumpuk (inferensi lebih lambat
+dari kamera), hanya frame terbaru yang diproses dan ambang selisih dinaikkan.
+"""
+import collections
+import io
+import struct
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from common.image_ingest import InvalidImageError
+
+FRAME_HEADER = struct.Struct('>I')
+SIGNATURE_SIZE = 32
+
+
+class FrameStreamError(ValueError):
+    """Aliran frame tidak valid (frame terpotong atau melebihi batas ukuran)."""
+
+
+def read_frames(stream, max_frame_bytes):
+    """Membaca frame ber-prefix panjang dari file-like sampai EOF."""
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            raise FrameStreamError("Truncated frame header.")
+        (length,) = FRAME_HEADER.unpack(header)
+        if length == 0 or length > max_frame_bytes:
+            raise FrameStreamError(f"Invalid frame size {length} (max {max_frame_bytes} bytes).")
+        chunks, remaining = [], length
+        while remaining:
+            chunk = stream.read(remaining)
+            if not chunk:
+                raise FrameStreamError("Truncated frame payload.")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        yield b''.join(chunks)
+
+
+def frame_signature(frame_bytes):
+    """Thumbnail grayscale 32x32 (float32, 0..1) untuk perbandingan antar frame."""
+    try:
+        image = Image.open(io.BytesIO(frame_bytes))
+        # JPEG: decode langsung pada skala 1/8 (jauh lebih murah dari decode penuh).
+        image.draft('L', (SIGNATURE_SIZE * 2, SIGNATURE_SIZE * 2))
+        thumb = image.convert('L').resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BILINEAR)
+    except (IOError, SyntaxError, ValueError) as e:
+        raise InvalidImageError(f"Cannot decode frame: {e}")
+    return np.asarray(thumb, dtype=np.float32) * (1.0 / 255.0)
+
+
+def frame_difference(a, b):
+    """Rata-rata selisih absolut dua signature (0 = identik, 1 = berlawanan total)."""
+    return float(np.mean(np.abs(a - b)))
+
+
+def _iou(a, b):
+    """IoU dua bbox ternormalisasi [x, y, w, h]."""
+    ix = max(0.0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IouTracker:
+    """
+    Tracker ringan: deteksi baru dicocokkan (greedy, per kelas) ke track yang ada
+    berdasarkan IoU; kecepatan bbox per frame dihaluskan (EMA) sehingga posisi pada
+    frame yang tidak diinferensi dapat diprediksi.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=2, max_predict_frames=30, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_predict_frames = max_predict_frames
+        self.smoothing = smoothing
+        self._tracks = {}
+        self._next_id = 1
+
+    def update(self, detections, frame_index):
+        """Memperbarui track dengan deteksi hasil inferensi; mengembalikan deteksi + trackId."""
+        candidates = sorted(
+            ((_iou(track["bbox"], det["bbox"]), track_id, i)
+             for track_id, track in self._tracks.items()
+             for i, det in enumerate(detections) if det["class"] == track["class"]),
+            reverse=True
+        )
+        matched_tracks, matched_dets = set(), {}
+        for iou, track_id, i in candidates:
+            if iou < self.iou_threshold:
+                break
+            if track_id in matched_tracks or i in matched_dets:
+                continue
+            matched_tracks.add(track_id)
+            matched_dets[i] = track_id
+
+        results = []
+        for i, det in enumerate(detections):
+            track_id = matched_dets.get(i)
+            if track_id is None:
+                track_id = self._next_id
+                self._next_id += 1
+                self._tracks[track_id] = {"class": det["class"], "velocity": [0.0] * 4}
+            else:
+                track = self._tracks[track_id]
+                frames = max(1, frame_index - track["frame"])
+                step = [(new - old) / frames for new, old in zip(det["bbox"], track["bbox"])]
+                track["velocity"] = [
+                    self.smoothing * s + (1 - self.smoothing) * v for s, v in zip(step, track["velocity"])
+                ]
+            track = self._tracks[track_id]
+            track.update(bbox=list(det["bbox"]), confidence=det["confidence"], frame=frame_index, missed=0)
+            results.append({**det, "trackId": track_id})
+
+        for track_id in list(self._tracks):
+            if track_id not in matched_tracks and self._tracks[track_id]["frame"] != frame_index:
+                self._tracks[track_id]["missed"] += 1
+                if self._tracks[track_id]["missed"] > self.max_missed:
+                    del self._tracks[track_id]
+        return results
+
+    def predict(self, frame_index):
+        """Deteksi yang diteruskan ke frame tanpa inferensi (posisi diekstrapolasi)."""
+        results = []
+        for track_id, track in self._tracks.items():
+            if track["missed"]:
+                continue
+            frames = min(frame_index - track["frame"], self.max_predict_frames)
+            x, y, w, h = (p + v * frames for p, v in zip(track["bbox"], track["velocity"]))
+            x, y = min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+            w, h = min(max(w, 0.0), 1.0 - x), min(max(h, 0.0), 1.0 - y)
+            results.append({
+                "class": track["class"], "confidence": track["confidence"],
+                "bbox": [x, y, w, h], "trackId": track_id,
+            })
+        return results
+
+
+class FrameSession:
+    """
+    Keputusan per frame untuk satu aliran: inferensi, lewati (frame statis), atau
+    buang (tertinggal oleh backlog). `detect_fn(frame_bytes)` mengembalikan deteksi
+    dalam skema /detect.
+    """
+
+    def __init__(self, detect_fn, diff_threshold=0.02, keyframe_interval=15, tracker=None):
+        self.detect_fn = detect_fn
+        self.diff_threshold = diff_threshold
+        self.keyframe_interval = keyframe_interval
+        self.tracker = tracker or IouTracker()
+        self.last_signature = None
+        self.last_inferred = None
+        self.avg_inference_seconds = None
+
+    def threshold_for(self, backlog):
+        """Ambang selisih efektif: naik seiring backlog agar lebih banyak frame dilewati."""
+        return self.diff_threshold * (1 + backlog)
+
+    def drop(self, frame_index):
+        return {"frame": frame_index, "inferred": False, "reason": "backlog",
+                "detections": self.tracker.predict(frame_index)}
+
+    def process(self, frame_index, frame_bytes, backlog=0):
+        signature = frame_signature(frame_bytes)
+        if self.last_signature is not None and frame_index - self.last_inferred < self.keyframe_interval:
+            difference = frame_difference(signature, self.last_signature)
+            if difference < self.threshold_for(backlog):
+                return {"frame": frame_index, "inferred": False, "reason": "static",
+                        "difference": round(difference, 4), "detections": self.tracker.predict(frame_index)}
+
+        started = time.perf_counter()
+        detections = self.detect_fn(frame_bytes)
+        elapsed = time.perf_counter() - started
+        self.avg_inference_seconds = elapsed if self.avg_inference_seconds is None else (
+            0.8 * self.avg_inference_seconds + 0.2 * elapsed
+        )
+        self.last_signature, self.last_inferred = signature, frame_index
+        return {"frame": frame_index, "inferred": True, "detections": self.tracker.update(detections, frame_index)}
+
+
+class FrameBuffer:
+    """
+    Buffer frame antara thread pembaca koneksi dan loop pemrosesan. `take()` mengembalikan
+    semua frame yang menunggu; pemanggil memproses yang terbaru dan membuang sisanya.
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._frames = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.error = None
+        self.dropped_on_arrival = []
+
+    def put(self, index, frame_bytes):
+        with self._cond:
+            self._frames.append((index, frame_bytes, time.monotonic()))
+            while len(self._frames) > self.max_pending:
+                self.dropped_on_arrival.append(self._frames.popleft()[0])
+            self._cond.notify()
+
+    def close(self, error=None):
+        with self._cond:
+            self._closed = True
+            self.error = error
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        """
+        Menunggu frame; mengembalikan (index frame terbuang, list (index, bytes, waktu tiba)),
+        ([], []) jika timeout, atau None jika aliran selesai.
+        """
+        with self._cond:
+            while not self._frames and not self._closed:
+                if not self._cond.wait(timeout):
+                    return [], []
+            dropped, self.dropped_on_arrival = self.dropped_on_arrival, []
+            if not self._frames:
+                return (dropped, []) if dropped else None
+            frames = list(self._frames)
+            self._frames.clear()
+            return dropped, frames
@@ -9,26 +9,384 @@ def client():
         yield client
 
 def test_health_check(client, mocker):
-    mocker.patch('yolo_detector.app.YOLO', return_value='mock_model')
+    """Probe dijawab dari self-test yang menjalankan jalur deteksi sungguhan (di sini di-mock)."""
+    monitor = app.extensions['self_test_monitor']
+    mocker.patch.object(monitor, 'ensure_started')
+    mocker.patch('yolo_detector.app.model')
+    mock_run = mocker.patch('yolo_detector.app.run_detection', return_value=[[]])
+
+    monitor.run_once()
+    rv = client.get('/readyz')
+    assert rv.status_code == 200 and rv.json['status'] == 'ready'
+    assert client.get('/health').json == {"status": "healthy"}
+    mock_run.assert_called_once()
+
+    mock_run.side_effect = RuntimeError("inference failed")
+    monitor.run_once()
     rv = client.get('/health')
-    assert rv.status_code == 200
-    assert rv.json == {"status": "OK", "message": "Model is loaded."}
+    assert rv.status_code == 503
+    assert rv.json['status'] == 'unhealthy' and 'inference failed' in rv.json['reason']
 
-def test_detect_no_file(client):
+def test_detect_no_file(client, mocker):
+    mocker.patch('yolo_detector.app.model')
     rv = client.post('/detect')
     assert rv.status_code == 400
-    assert 'error' in rv.json
+    assert 'image' in rv.json['message']
 
 def test_detect_success(client, mocker):
-    mocker.patch('yolo_detector.app.YOLO', return_value='mock_model')
+    from contextlib import contextmanager
+    from yolo_detector.app import model_registry
+
+    @contextmanager
+    def acquire(variant=None):
+        yield 'mock_model'
+
+    mocker.patch('yolo_detector.app.model')
+    mocker.patch('yolo_detector.app.BATCHING_ENABLED', False)
+    mocker.patch.object(model_registry, 'acquire', side_effect=acquire)
+    mocker.patch('yolo_detector.app.decode_image')
     mock_detect = mocker.patch('yolo_detector.app.detect_objects_from_image')
     mock_detect.return_value = [{'class': 'person', 'confidence': 0.9}]
 
     data = {
-        'image': (io.BytesIO(b"fakeimagedata"), 'test.jpg')
+        'image': (io.BytesIO(b"\xff\xd8\xfffakeimagedata"), 'test.jpg')
     }
     rv = client.post('/detect', content_type='multipart/form-data', data=data)
 
     assert rv.status_code == 200
     assert rv.json == [{'class': 'person', 'confidence': 0.9}]
-    mock_detect.assert_called_once()
\ No newline at end of file
+    assert rv.headers['X-Model-Variant'] == model_registry.default
+    mock_detect.assert_called_once()
+    assert mock_detect.call_args.args[1] == 'mock_model'
+
+def test_micro_batcher_groups_concurrent_requests():
+    from concurrent.futures import ThreadPoolExecutor
+    from batching import MicroBatcher
+
+    batch_sizes = []
+
+    def batch_fn(items):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=50, name='test')
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda x: batcher.submit(x).result(timeout=5), range(4)))
+
+    assert results == [0, 2, 4, 6]
+    assert sum(batch_sizes) == 4
+    assert max(batch_sizes) > 1
+
+
+def test_detect_batch_success(client, mocker):
+    mocker.patch('yolo_detector.app.model')
+    mock_run = mocker.patch('yolo_detector.app.run_detection')
+    mock_run.return_value = [[{'class': 'person', 'confidence': 0.9}], []]
+    mocker.patch('yolo_detector.app.decode_image')
+
+    data = {
+        'images': [(io.BytesIO(b"\xff\xd8\xfffakeimagedata1"), 'a.jpg'), (io.BytesIO(b"\x89PNG\r\n\x1a\nfakeimagedata2"), 'b.png')]
+    }
+    rv = client.post('/detect/batch', content_type='multipart/form-data', data=data)
+
+    assert rv.status_code == 200
+    assert rv.json == {'results': [
+        {'filename': 'a.jpg', 'detections': [{'class': 'person', 'confidence': 0.9}]},
+        {'filename': 'b.png', 'detections': []},
+    ]}
+
+
+def test_onnx_backend_matches_pytorch_boxes(tmp_path):
+    """Backend ONNX Runtime menghasilkan deteksi yang sama dengan jalur PyTorch."""
+    pytest.importorskip('onnx')
+    pytest.importorskip('onnxruntime')
+    import numpy as np
+    import torch
+    from PIL import Image, ImageDraw
+    from ultralytics import YOLO
+    from detect import detect_objects_from_image
+    from exported_model import export_path, load_exported_model
+
+    image = Image.new('RGB', (640, 480), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((50, 60, 200, 220), fill='red')
+    draw.ellipse((250, 100, 420, 300), fill='blue')
+
+    # Bobot acak (tanpa unduhan); statistik BatchNorm dikalibrasi agar skor kelas bervariasi.
+    torch.manual_seed(0)
+    yolo = YOLO('yolov8n.yaml')
+    for module in yolo.model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.momentum = 1.0
+    pixels = torch.from_numpy(np.asarray(image).copy()).permute(2, 0, 1)[None].float() / 255
+    yolo.model.train()
+    with torch.no_grad():
+        yolo.model(torch.cat([pixels, torch.rand(1, 3, 480, 640)]))
+        for branch in yolo.model.model[-1].cv3:
+            branch[-1].bias.add_(7.0)
+    yolo.model.eval()
+    weights = str(tmp_path / 'tiny.pt')
+    yolo.save(weights)
+
+    expected = detect_objects_from_image(image, YOLO(weights))
+    onnx_model = load_exported_model(weights, 'onnx', imgsz=640, export_dir=str(tmp_path / 'export'))
+    actual = detect_objects_from_image(image, onnx_model)
+
+    assert onnx_model.path == export_path(weights, 'onnx', 640, str(tmp_path / 'export'))
+    assert len(expected) > 0
+    assert [d['class'] for d in actual] == [d['class'] for d in expected]
+    np.testing.assert_allclose([d['confidence'] for d in actual], [d['confidence'] for d in expected], atol=1e-3)
+    np.testing.assert_allclose([d['bbox'] for d in actual], [d['bbox'] for d in expected], atol=1e-3)
+
+
+def test_remote_yolo_over_shared_memory_inference_server(tmp_path):
+    """Gambar dikirim ke inference-server lewat shared memory dan hasilnya diurai seperti model lokal."""
+    import threading
+    import time
+    import numpy as np
+    from PIL import Image
+    from common.inference_server import InferenceClient, serve
+    from detect import RemoteYOLO, detect_objects_from_image
+
+    received = []
+
+    def predict(arrays):
+        received.extend((a.shape, a.dtype.str, int(a[0, 0, 0])) for a in arrays)
+        return [(np.array([[10, 20, 60, 80]], np.float32), np.array([0.9], np.float32), np.array([1], np.float32))
+                for _ in arrays]
+
+    socket_path = str(tmp_path / 'yolo.sock')
+    handlers = {'info': lambda arrays: {"names": {0: 'person', 1: 'bicycle'}}, 'predict': predict}
+    threading.Thread(target=serve, args=(socket_path, handlers), daemon=True).start()
+    for _ in range(50):
+        if (tmp_path / 'yolo.sock').exists():
+            break
+        time.sleep(0.05)
+
+    client = InferenceClient(socket_path, factory='unused:unused')
+    detections = detect_objects_from_image(Image.new('RGB', (100, 200), color=(7, 0, 0)), RemoteYOLO(client))
+
+    assert received == [((200, 100, 3), '|u1', 7)]
+    assert detections == [{"class": "bicycle", "confidence": pytest.approx(0.9), "bbox": [0.1, 0.1, 0.5, 0.3]}]
+
+
+def test_tracker_keeps_ids_and_extrapolates_motion():
+    from stream import IouTracker
+
+    tracker = IouTracker()
+    first = tracker.update([{'class': 'person', 'confidence': 0.9, 'bbox': [0.10, 0.2, 0.2, 0.4]}], 0)
+    second = tracker.update([{'class': 'person', 'confidence': 0.8, 'bbox': [0.14, 0.2, 0.2, 0.4]}], 2)
+    assert first[0]['trackId'] == second[0]['trackId']
+
+    predicted = tracker.predict(4)
+    assert predicted[0]['trackId'] == first[0]['trackId']
+    assert predicted[0]['bbox'][0] > 0.14
+
+
+def test_detect_stream_skips_static_frames_and_reports_each_frame(client, mocker):
+    import json
+    import struct
+    import time
+    from PIL import Image
+
+    def jpeg(color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), color).save(buffer, format='JPEG')
+        data = buffer.getvalue()
+        return struct.pack('>I', len(data)) + data
+
+    class PacedStream(io.BytesIO):
+        """Mensimulasikan kamera: setiap frame baru tersedia setelah jeda singkat."""
+        def read(self, size=-1):
+            position = self.tell()
+            if position in boundaries:
+                time.sleep(0.2)
+            end = min(b for b in boundaries + [len(body)] if b > position) if position < len(body) else position
+            return super().read(end - position if size is None or size < 0 else min(size, end - position))
+
+        def readinto(self, buffer):
+            data = self.read(len(buffer))
+            buffer[:len(data)] = data
+            return len(data)
+
+    mocker.patch('yolo_detector.app.model')
+    mock_run = mocker.patch('yolo_detector.app.run_detection')
+    mock_run.return_value = [[{'class': 'car', 'confidence': 0.7, 'bbox': [0.1, 0.1, 0.3, 0.3]}]]
+
+    frames = [jpeg('black'), jpeg('black'), jpeg('white')]
+    boundaries = [sum(len(f) for f in frames[:i]) for i in range(len(frames))]
+    body = b''.join(frames)
+    rv = client.post('/detect/stream', input_stream=PacedStream(body), content_type='application/octet-stream')
+    assert rv.status_code == 200
+    events = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+
+    frames = [e for e in events if e['event'] == 'frame']
+    assert [(f['frame'], f['inferred']) for f in frames] == [(0, True), (1, False), (2, True)]
+    assert frames[1]['reason'] == 'static'
+    # Frame yang dilewati tetap menerima deteksi dari tracker dengan id yang sama.
+    assert [f['detections'][0]['trackId'] for f in frames] == [1, 1, 1]
+    assert events[-1] == {**events[-1], 'event': 'done', 'frames': 3, 'inferred': 2, 'static': 1}
+
+
+def test_detect_batch_msgpack_columnar(client, mocker):
+    import msgpack
+
+    mocker.patch('yolo_detector.app.model')
+    mock_run = mocker.patch('yolo_detector.app.run_detection')
+    mock_run.return_value = [
+        [{'class': 'person', 'confidence': 0.91234, 'bbox': [0.1, 0.2, 0.30001, 0.4]},
+         {'class': 'dog', 'confidence': 0.5, 'bbox': [0.5, 0.5, 0.25, 0.25]}],
+        [{'class': 'person', 'confidence': 0.75, 'bbox': [0.0, 0.0, 1.0, 1.0]}],
+    ]
+    mocker.patch('yolo_detector.app.decode_image')
+
+    data = {
+        'images': [(io.BytesIO(b"\xff\xd8\xffcolumnar-1"), 'a.jpg'), (io.BytesIO(b"\xff\xd8\xffcolumnar-2"), 'b.jpg')]
+    }
+    rv = client.post('/detect/batch', content_type='multipart/form-data', data=data,
+                     headers={'Accept': 'application/msgpack'})
+
+    assert rv.status_code == 200
+    assert rv.mimetype == 'application/msgpack'
+    assert 'Accept' in rv.headers['Vary']
+    payload = msgpack.unpackb(rv.data)
+    assert payload['classes'] == ['person', 'dog']
+    assert payload['results'][0] == {
+        'filename': 'a.jpg', 'classId': [0, 1], 'confidence': [912, 500],
+        'bbox': [1000, 2000, 3000, 4000, 5000, 5000, 2500, 2500],
+    }
+    assert payload['results'][1]['classId'] == [0]
+
+
+def test_model_registry_loads_lazily_evicts_lru_and_hot_swaps(client, mocker):
+    """Varian dimuat saat dipakai, varian LRU dilepas saat melewati anggaran, dan swap tidak memutus request."""
+    from prometheus_client import CollectorRegistry
+    from werkzeug.exceptions import BadRequest
+    from common import model_registry as mr
+
+    rss = [0]
+    mocker.patch.object(mr, '_rss_bytes', side_effect=lambda: rss[0])
+    loaded, unloaded = [], []
+
+    def loader(variant, spec):
+        loaded.append(spec)
+        rss[0] += 100
+        return {'spec': spec}
+
+    prom = CollectorRegistry()
+    registry = mr.ModelRegistry(
+        'test', loader, {'n': 'n-v1', 's': 's-v1', 'm': 'm-v1'}, default='n', memory_budget_bytes=250,
+        routes={'stream': 's'}, unloader=unloaded.append, registry=prom
+    )
+    assert loaded == []
+    registry.load()
+    assert registry.select(route='stream') == 's' and registry.select('m', route='stream') == 'm'
+    with pytest.raises(BadRequest):
+        registry.select('xl')
+
+    with registry.acquire('s') as model:
+        assert model == {'spec': 's-v1'}
+    with registry.acquire('m'):
+        pass
+    assert unloaded == [{'spec': 's-v1'}]
+
+    with registry.acquire('n') as old:
+        registry.swap('n', 'n-v2')
+        with registry.acquire('n') as new:
+            assert new == {'spec': 'n-v2'}
+        assert old == {'spec': 'n-v1'} and {'spec': 'n-v1'} not in unloaded
+    assert {'spec': 'n-v1'} in unloaded
+    assert registry.status()['variants']['n'] == {'spec': 'n-v2', 'resident': True, 'sizeBytes': 100, 'inUse': 0}
+
+    labels = {'registry': 'test', 'variant': 's'}
+    assert prom.get_sample_value('model_registry_evictions_total', {**labels, 'reason': 'budget'}) == 1
+    assert prom.get_sample_value('model_registry_requests_total', {**labels, 'result': 'miss'}) == 1
+    assert prom.get_sample_value('model_registry_loads_total', {'registry': 'test', 'variant': 'n', 'outcome': 'ok'}) == 2
+    assert prom.get_sample_value('model_registry_resident_bytes', labels) == 0
+
+    assert client.get('/models').json['yolo']['default'] == 'yolov8n'
+    assert client.post('/models/yolo/yolov8n', json={'spec': 'yolov8s.pt'}).status_code == 403
+
+    from flask import Flask
+    from common.app_factory import register_error_handlers
+    for workers, expected in (('2', 409), ('1', 200)):
+        mocker.patch.dict('os.environ', {'MODEL_ADMIN_TOKEN': 'secret', 'GUNICORN_WORKERS': workers})
+        admin = Flask('admin')
+        register_error_handlers(admin)
+        mr.register_model_routes(admin, registry)
+        admin_client = admin.test_client()
+        assert admin_client.post('/models/test/m', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+        rv = admin_client.post('/models/test/m', headers={'X-Admin-Token': 'secret'}, json={'spec': 'm-v2'})
+        assert rv.status_code == expected
+    assert registry.status()['variants']['m']['spec'] == 'm-v2'
+    mocker.patch('yolo_detector.app.model')
+    rv = client.post('/detect', data={'image': (io.BytesIO(b"\xff\xd8\xff"), 'a.jpg'), 'model': 'xl'},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 400 and 'yolov8n' in rv.json['message']
+
+
+def test_inference_params_filter_inside_inference_and_adapt_under_load(client, mocker, tmp_path):
+    """Parameter per request divalidasi, difilter di postprocess model, dan preset murah dipakai saat beban tinggi."""
+    import json
+    import numpy as np
+    from PIL import Image
+    from werkzeug.exceptions import BadRequest
+    import inference_params
+    from detect import detect_objects_from_image
+    from exported_model import ExportedYOLO
+    from inference_params import PRESETS, adapt_to_load, parse_inference_params
+
+    (tmp_path / 'fake.onnx.json').write_text(json.dumps({'names': {'0': 'person', '1': 'car', '2': 'dog'}, 'imgsz': 64}))
+    shapes = []
+
+    class FakeYOLO(ExportedYOLO):
+        def _infer(self, batch):
+            shapes.append(batch.shape)
+            # Tiga anchor (cx, cy, w, h, skor per kelas): person 0.9, car 0.8, dog 0.3.
+            output = np.array([[10, 30, 50], [10, 30, 50], [8, 8, 8], [8, 8, 8],
+                               [0.9, 0, 0], [0, 0.8, 0], [0, 0, 0.3]], np.float32)
+            return np.stack([output] * len(batch))
+
+    model = FakeYOLO(str(tmp_path / 'fake.onnx'))
+    image = Image.new('RGB', (64, 64))
+    assert [d['class'] for d in detect_objects_from_image(image, model)] == ['person', 'car', 'dog']
+
+    preset, params, explicit = parse_inference_params(
+        {'preset': 'lite', 'classes': 'car,0', 'conf': '0.5'}, class_names=lambda: {'person': 0, 'car': 1, 'dog': 2}
+    )
+    assert (preset, explicit, params.classes, params.imgsz) == ('custom', True, (0, 1), PRESETS['lite'].imgsz)
+    params = params._replace(classes=(1, 2), imgsz=96)
+    assert [d['class'] for d in detect_objects_from_image(image, model, params=params)] == ['car']
+    assert shapes[-1][2:] == (96, 96)
+    assert len(detect_objects_from_image(image, model, params=PRESETS['default']._replace(max_det=1))) == 1
+    for invalid in ({'imgsz': '100'}, {'conf': '2'}, {'max_det': 'x'}, {'preset': 'ultra'}, {'classes': 'unicorn'},
+                    {'classes': '99'}):
+        with pytest.raises(BadRequest):
+            parse_inference_params(invalid, class_names=lambda: {'person': 0})
+
+    mocker.patch.object(inference_params, 'ADAPTIVE_PRESET', 'lite')
+    mocker.patch.object(inference_params, 'ADAPTIVE_INFLIGHT_THRESHOLD', 0)
+    assert adapt_to_load('default', PRESETS['default'], False, 1) == ('lite', PRESETS['lite'], True)
+    assert adapt_to_load('people', PRESETS['people'], True, 5)[0] == 'people'
+
+    mocker.patch('yolo_detector.app.model')
+    mocker.patch('yolo_detector.app.decode_image')
+    mock_run = mocker.patch('yolo_detector.app.run_detection', return_value=[[]])
+    rv = client.post('/detect', data={'image': (io.BytesIO(b"\xff\xd8\xffpreset-1"), 'a.jpg'), 'preset': 'people'},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 200 and rv.headers['X-Inference-Preset'] == 'people'
+    assert mock_run.call_args.args[2] == PRESETS['people']
+    # Request pemanggil dan koneksi /detect/stream tidak dihitung sebagai beban.
+    limiters = app.extensions['admission_limiters']
+    limiters['detect_stream_endpoint'].acquire()
+    rv = client.post('/detect', data={'image': (io.BytesIO(b"\xff\xd8\xffpreset-2"), 'b.jpg')},
+                     content_type='multipart/form-data')
+    assert rv.headers['X-Inference-Preset'] == 'default'
+    limiters['detect_batch_endpoint'].acquire()
+    try:
+        rv = client.post('/detect', data={'image': (io.BytesIO(b"\xff\xd8\xffpreset-3"), 'c.jpg')},
+                         content_type='multipart/form-data')
+    finally:
+        limiters['detect_batch_endpoint'].release()
+        limiters['detect_stream_endpoint'].release()
+    assert rv.headers['X-Inference-Preset'] == 'lite' and mock_run.call_args.args[2] == PRESETS['lite']